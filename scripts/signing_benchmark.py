@@ -0,0 +1,49 @@
+"""Measures the number of payment claim signatures per second for each signing backend.
+
+Usage (with the SDK installed, e.g. `pip install -e .`):
+    python scripts/signing_benchmark.py [seconds per backend]
+"""
+import os
+import sys
+import time
+
+from eth_account.messages import defunct_hash_message
+import web3
+
+from snet.sdk.signer import SIGNERS
+
+
+def eth_account_sign(private_key: bytes):
+    # What the SDK did before the signers: the key is parsed on every call
+    w3 = web3.Web3()
+    return lambda message: w3.eth.account._sign_hash(defunct_hash_message(message), private_key)
+
+
+def benchmark(sign, duration: float) -> float:
+    message = web3.Web3.solidity_keccak(
+        ["string", "address", "uint256", "uint256", "uint256"],
+        ["__MPE_claim_message", "0x" + "11" * 20, 42, 0, 0]
+    )
+    signatures = 0
+    started_at = time.perf_counter()
+    while time.perf_counter() - started_at < duration:
+        sign(message)
+        signatures += 1
+    return signatures / (time.perf_counter() - started_at)
+
+
+def main():
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 2
+    private_key = os.urandom(32)
+    backends = {"eth_account (_sign_hash)": eth_account_sign(private_key)}
+    for backend, signer_class in SIGNERS.items():
+        try:
+            backends[backend] = signer_class(private_key).sign_message
+        except ImportError as e:
+            print(f"{backend}: skipped ({e})")
+    for backend, sign in backends.items():
+        print(f"{backend}: {benchmark(sign, duration):.0f} signatures/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -30,5 +30,8 @@ setup(
     license='MIT',
     python_requires='>=3.10',
     install_requires=requirements,
+    extras_require={
+        'coincurve': ['coincurve>=20.0.0'],
+    },
     include_package_data=True
 )
@@ -2,6 +2,7 @@ import importlib
 import os
 import sys
 import warnings
+from contextlib import nullcontext
 from enum import Enum
 
 import google.protobuf.internal.api_implementation
@@ -23,12 +24,18 @@ with warnings.catch_warnings():
 
 from snet.contracts import get_contract_object
 from snet.sdk.account import Account
+from snet.sdk.batching_provider import BatchingHTTPProvider, DEFAULT_BATCH_WINDOW
+from snet.sdk.block_clock import BlockClock
 from snet.sdk.config import Config
 from snet.sdk.client_lib_generator import ClientLibGenerator
 from snet.sdk.mpe.mpe_contract import MPEContract
 from snet.sdk.mpe.payment_channel_provider import PaymentChannelProvider
+from snet.sdk.multicall import Multicall
 from snet.sdk.payment_strategies.default_payment_strategy import *
 from snet.sdk.service_client import ServiceClient
+from snet.sdk.aio.payment_strategies import (AsyncPaymentStrategy,
+                                             get_async_payment_strategy)
+from snet.sdk.aio.service_client import AsyncServiceClient
 from snet.sdk.storage_provider.storage_provider import StorageProvider
 from snet.sdk.custom_typing import ModuleName, ServiceStub
 from snet.sdk.utils.utils import (
@@ -60,19 +67,43 @@ class SnetSDK:
         eth_rpc_endpoint = self._sdk_config["eth_rpc_endpoint"]
         eth_rpc_request_kwargs = self._sdk_config.get("eth_rpc_request_kwargs")
 
-        provider = web3.HTTPProvider(endpoint_uri=eth_rpc_endpoint,
-                                     request_kwargs=eth_rpc_request_kwargs)
+        if self._sdk_config.get("eth_rpc_batching", False):
+            # The requests issued at the same time can be sent in one
+            # JSON-RPC batch, see batch()
+            provider = BatchingHTTPProvider(
+                endpoint_uri=eth_rpc_endpoint,
+                request_kwargs=eth_rpc_request_kwargs,
+                batch_window=self._sdk_config.get("eth_rpc_batch_window", None)
+            )
+        else:
+            provider = web3.HTTPProvider(endpoint_uri=eth_rpc_endpoint,
+                                         request_kwargs=eth_rpc_request_kwargs)
 
         self.web3 = web3.Web3(provider)
+        self._async_web3 = None
+        self.block_clock = BlockClock(
+            self.web3,
+            self._sdk_config.get("block_clock_max_staleness", 30),
+            self._sdk_config.get("block_clock_poll_interval", 12),
+            self._sdk_config.get("average_block_time", 12)
+        )
+
+        # The contract reads needed at once are aggregated by Multicall3
+        self.multicall = Multicall(
+            self.web3,
+            self._sdk_config.get("multicall_contract_address", None)
+        )
 
         # Get MPE contract address from config if specified;
         # mostly for local testing
         _mpe_contract_address = self._sdk_config.get("mpe_contract_address",
                                                      None)
         if _mpe_contract_address is None:
-            self.mpe_contract = MPEContract(self.web3)
+            self.mpe_contract = MPEContract(self.web3,
+                                            multicall=self.multicall)
         else:
-            self.mpe_contract = MPEContract(self.web3, _mpe_contract_address)
+            self.mpe_contract = MPEContract(self.web3, _mpe_contract_address,
+                                            self.multicall)
 
         # Get Registry contract address from config if specified;
         # mostly for local testing
@@ -91,14 +122,21 @@ class SnetSDK:
 
         if self._metadata_provider is None:
             self._metadata_provider = StorageProvider(self._sdk_config,
-                                                      self.registry_contract)
+                                                      self.registry_contract,
+                                                      self.multicall)
 
         self.account = Account(self.web3, sdk_config, self.mpe_contract)
         self.payment_channel_provider = PaymentChannelProvider(
             self.web3,
-            self.mpe_contract
+            self.mpe_contract,
+            self.block_clock
         )
 
+    def batch(self, window: float = DEFAULT_BATCH_WINDOW):
+        if isinstance(self.web3.provider, BatchingHTTPProvider):
+            return self.web3.provider.batch(window)
+        return nullcontext(self.web3.provider)
+
     def create_service_client(self,
                               org_id: str,
                               service_id: str,
@@ -108,6 +146,73 @@ class SnetSDK:
                               options=None,
                               concurrent_calls: int = 1):
 
+        self._prepare_client_library(org_id, service_id)
+        options = self._get_service_client_options(options, concurrent_calls)
+
+        if payment_strategy is None:
+            payment_strategy = payment_strategy_type.value()
+
+        service_metadata = self._metadata_provider.enhance_service_metadata(
+            org_id, service_id
+        )
+        group = self._get_service_group_details(service_metadata, group_name)
+
+        service_stubs = self.get_service_stub()
+
+        pb2_module = self.get_module_by_keyword(keyword="pb2.py")
+        _service_client = ServiceClient(org_id, service_id, service_metadata,
+                                        group, service_stubs,
+                                        payment_strategy,
+                                        options, self.mpe_contract,
+                                        self.account, self.web3, pb2_module,
+                                        self.payment_channel_provider,
+                                        self.lib_generator.protodir,
+                                        self.lib_generator.training_added(),
+                                        self.block_clock)
+        return _service_client
+
+    def create_async_service_client(self,
+                                    org_id: str,
+                                    service_id: str,
+                                    group_name: str=None,
+                                    payment_strategy: AsyncPaymentStrategy = None,
+                                    payment_strategy_type: PaymentStrategyType=PaymentStrategyType.DEFAULT,
+                                    options=None,
+                                    concurrent_calls: int = 1) -> AsyncServiceClient:
+
+        self._prepare_client_library(org_id, service_id)
+        options = self._get_service_client_options(options, concurrent_calls)
+
+        if payment_strategy is None:
+            payment_strategy = get_async_payment_strategy(payment_strategy_type.value)()
+
+        service_metadata = self._metadata_provider.enhance_service_metadata(
+            org_id, service_id
+        )
+        group = self._get_service_group_details(service_metadata, group_name)
+
+        service_stubs = self.get_service_stub()
+
+        pb2_module = self.get_module_by_keyword(keyword="pb2.py")
+        return AsyncServiceClient(org_id, service_id, service_metadata,
+                                  group, service_stubs,
+                                  payment_strategy,
+                                  options, self.mpe_contract,
+                                  self.account, self.web3,
+                                  self._get_async_web3(), pb2_module,
+                                  self.payment_channel_provider,
+                                  self.lib_generator.protodir,
+                                  self.block_clock)
+
+    def _get_async_web3(self) -> web3.AsyncWeb3:
+        if self._async_web3 is None:
+            provider = web3.AsyncHTTPProvider(
+                endpoint_uri=self._sdk_config["eth_rpc_endpoint"]
+            )
+            self._async_web3 = web3.AsyncWeb3(provider)
+        return self._async_web3
+
+    def _prepare_client_library(self, org_id: str, service_id: str) -> None:
         # Create and instance of the Config object,
         # so we can create an instance of ClientLibGenerator
         self.lib_generator = ClientLibGenerator(self._metadata_provider,
@@ -129,31 +234,13 @@ class SnetSDK:
                 print("Generating client library...")
                 self.lib_generator.generate_client_library()
 
+    def _get_service_client_options(self, options: dict | None,
+                                    concurrent_calls: int) -> dict:
         if options is None:
             options = dict()
         options['concurrency'] = self._sdk_config.get("concurrency", True)
         options['concurrent_calls'] = concurrent_calls
-
-        if payment_strategy is None:
-            payment_strategy = payment_strategy_type.value()
-
-        service_metadata = self._metadata_provider.enhance_service_metadata(
-            org_id, service_id
-        )
-        group = self._get_service_group_details(service_metadata, group_name)
-
-        service_stubs = self.get_service_stub()
-
-        pb2_module = self.get_module_by_keyword(keyword="pb2.py")
-        _service_client = ServiceClient(org_id, service_id, service_metadata,
-                                        group, service_stubs,
-                                        payment_strategy,
-                                        options, self.mpe_contract,
-                                        self.account, self.web3, pb2_module,
-                                        self.payment_channel_provider,
-                                        self.lib_generator.protodir,
-                                        self.lib_generator.training_added())
-        return _service_client
+        return options
 
     def get_service_stub(self) -> list[ServiceStub]:
         path_to_pb_files = str(self.lib_generator.protodir)
@@ -222,3 +309,20 @@ class SnetSDK:
             raise Exception(f"Organization with id={org_id} doesn't exist!")
         org_service_list = list(map(bytes32_to_str, org_service_list))
         return org_service_list
+
+    def get_services_lists(self, org_ids: list[str] | None = None) -> dict:
+        # The services of all the organizations are listed in one
+        # aggregated call
+        if org_ids is None:
+            org_ids = self.get_organization_list()
+        replies = self.multicall.call(
+            self.registry_contract.functions
+            .listServicesForOrganization(type_converter("bytes32")(org_id))
+            for org_id in org_ids
+        )
+        services_lists = {}
+        for org_id, (found, org_service_list) in zip(org_ids, replies):
+            if not found:
+                raise Exception(f"Organization with id={org_id} doesn't exist!")
+            services_lists[org_id] = list(map(bytes32_to_str, org_service_list))
+        return services_lists
@@ -1,10 +1,12 @@
 import json
+import threading
 
 import web3
 
 from snet.contracts import get_contract_object
 from snet.sdk.config import Config
 from snet.sdk.mpe.mpe_contract import MPEContract
+from snet.sdk.signer import Signer, create_signer
 from snet.sdk.utils.utils import (get_address_from_private,
                                   normalize_private_key)
 
@@ -53,7 +55,14 @@ class Account:
             self.signer_private_key = self.private_key
         self.address = get_address_from_private(self.private_key)
         self.signer_address = get_address_from_private(self.signer_private_key)
+        # The key object is loaded once and reused for all the signatures
+        self.signer: Signer = create_signer(self.signer_private_key,
+                                            config.get("signing_backend"))
         self.nonce = 0
+        # The transactions of the account are sent from several threads (the
+        # calls and the background top-ups), so a nonce is taken and the
+        # transaction is broadcast under one lock
+        self.__transaction_lock = threading.Lock()
 
     def _get_nonce(self):
         nonce = self.web3.eth.get_transaction_count(self.address)
@@ -75,17 +84,18 @@ class Account:
         return int(gas_price)
 
     def _send_signed_transaction(self, contract_fn, *args):
-        transaction = contract_fn(*args).build_transaction({
-            "chainId": int(self.web3.net.version),
-            "gas": DEFAULT_GAS,
-            "gasPrice": self._get_gas_price(),
-            "nonce": self._get_nonce()
-        })
-        signed_txn = self.web3.eth.account.sign_transaction(
-            transaction, private_key=self.private_key)
-        return self.web3.to_hex(
-            self.web3.eth.send_raw_transaction(signed_txn.raw_transaction)
-        )
+        with self.__transaction_lock:
+            transaction = contract_fn(*args).build_transaction({
+                "chainId": int(self.web3.net.version),
+                "gas": DEFAULT_GAS,
+                "gasPrice": self._get_gas_price(),
+                "nonce": self._get_nonce()
+            })
+            signed_txn = self.web3.eth.account.sign_transaction(
+                transaction, private_key=self.private_key)
+            return self.web3.to_hex(
+                self.web3.eth.send_raw_transaction(signed_txn.raw_transaction)
+            )
 
     def send_transaction(self, contract_fn, *args):
         txn_hash = self._send_signed_transaction(contract_fn, *args)
@@ -102,8 +112,16 @@ class Account:
     def escrow_balance(self):
         return self.mpe_contract.balance(self.address)
 
-    def deposit_to_escrow_account(self, amount_in_cogs):
-        already_approved = self.allowance()
+    def escrow_balance_and_allowance(self):
+        # Both are read in one aggregated call
+        return tuple(self.mpe_contract.multicall.call([
+            self.mpe_contract.contract.functions.balances(self.address),
+            self._allowance_function()
+        ]))
+
+    def deposit_to_escrow_account(self, amount_in_cogs, already_approved=None):
+        if already_approved is None:
+            already_approved = self.allowance()
         if amount_in_cogs > already_approved:
             self.approve_transfer(amount_in_cogs)
         return self.mpe_contract.deposit(self, amount_in_cogs)
@@ -114,7 +132,10 @@ class Account:
                                      amount_in_cogs)
 
     def allowance(self):
+        return self._allowance_function().call()
+
+    def _allowance_function(self):
         return self.token_contract.functions.allowance(
             self.address,
             self.mpe_contract.contract.address
-        ).call()
+        )
@@ -0,0 +1,8 @@
+from snet.sdk.aio.payment_strategies import (
+    AsyncPaymentStrategy,
+    AsyncFreeCallPaymentStrategy,
+    AsyncPaidCallPaymentStrategy,
+    AsyncPrePaidPaymentStrategy,
+    AsyncDefaultPaymentStrategy
+)
+from snet.sdk.aio.service_client import AsyncServiceClient
@@ -0,0 +1,41 @@
+"""Base class for grpc.aio interceptors that operate on all RPC types."""
+
+import grpc
+
+
+class _GenericAsyncClientInterceptor(
+        grpc.aio.UnaryUnaryClientInterceptor,
+        grpc.aio.UnaryStreamClientInterceptor,
+        grpc.aio.StreamUnaryClientInterceptor,
+        grpc.aio.StreamStreamClientInterceptor):
+
+    def __init__(self, interceptor_function):
+        self._fn = interceptor_function
+
+    async def intercept_unary_unary(self, continuation, client_call_details,
+                                    request):
+        new_details, postprocess = await self._fn(client_call_details, False, False)
+        call = await continuation(new_details, request)
+        return postprocess(call) if postprocess else call
+
+    async def intercept_unary_stream(self, continuation, client_call_details,
+                                     request):
+        new_details, postprocess = await self._fn(client_call_details, False, True)
+        call = await continuation(new_details, request)
+        return postprocess(call) if postprocess else call
+
+    async def intercept_stream_unary(self, continuation, client_call_details,
+                                     request_iterator):
+        new_details, postprocess = await self._fn(client_call_details, True, False)
+        call = await continuation(new_details, request_iterator)
+        return postprocess(call) if postprocess else call
+
+    async def intercept_stream_stream(self, continuation, client_call_details,
+                                      request_iterator):
+        new_details, postprocess = await self._fn(client_call_details, True, True)
+        call = await continuation(new_details, request_iterator)
+        return postprocess(call) if postprocess else call
+
+
+def create(intercept_call):
+    return _GenericAsyncClientInterceptor(intercept_call)
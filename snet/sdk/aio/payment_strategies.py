@@ -0,0 +1,317 @@
+import asyncio
+import importlib
+
+import grpc
+
+from snet.sdk.concurrency_manager import ConcurrencyManager
+from snet.sdk.payment_strategies.default_payment_strategy import DefaultPaymentStrategy
+from snet.sdk.payment_strategies.freecall_payment_strategy import FreeCallPaymentStrategy
+from snet.sdk.payment_strategies.paidcall_payment_strategy import PaidCallPaymentStrategy
+from snet.sdk.payment_strategies.payment_strategy import PaymentStrategy
+from snet.sdk.payment_strategies.prepaid_payment_strategy import PrePaidPaymentStrategy
+from snet.sdk.utils.utils import RESOURCES_PATH, add_to_path
+
+
+class AsyncPaymentStrategy(object):
+
+    async def get_payment_metadata(self, service_client):
+        pass
+
+    def get_price(self, service_client):
+        pass
+
+    def record_call_result(self, service_client, payment_metadata, code):
+        pass
+
+
+class AsyncFreeCallPaymentStrategy(FreeCallPaymentStrategy, AsyncPaymentStrategy):
+
+    async def get_free_calls_available(self, service_client) -> int:
+        if not self._user_address:
+            self._user_address = service_client.account.signer_address
+
+        current_block_number = await service_client.get_current_block_number()
+
+        if not self._free_call_token:
+            self._load_free_call_token(service_client)
+        if (not self._free_call_token or
+                not self._token_expiration_block or
+                current_block_number > self._token_expiration_block):
+            self._free_call_token, self._token_expiration_block = await self.get_free_call_token_details(
+                service_client, current_block_number
+            )
+            self._save_free_call_token(service_client)
+
+        with add_to_path(str(RESOURCES_PATH.joinpath("proto"))):
+            state_service_pb2 = importlib.import_module("state_service_pb2")
+            state_service_pb2_grpc = importlib.import_module("state_service_pb2_grpc")
+
+        signature, _ = self.generate_signature(service_client, current_block_number)
+        request = state_service_pb2.FreeCallStateRequest(
+            address=self._user_address,
+            free_call_token=self._free_call_token,
+            signature=signature,
+            current_block=current_block_number
+        )
+
+        channel = service_client.get_grpc_base_channel()
+        stub = state_service_pb2_grpc.FreeCallStateServiceStub(channel)
+
+        try:
+            response = await stub.GetFreeCallsAvailable(request)
+            free_calls_available = response.free_calls_available
+        except grpc.RpcError as e:
+            if self._user_address:
+                print(f"Warning: {e.details()}")
+            free_calls_available = 0
+        self._reconcile_free_calls(free_calls_available)
+        return free_calls_available
+
+    async def get_free_calls_left(self, service_client) -> int:
+        free_calls_left = self._get_local_free_calls_left()
+        if free_calls_left is None:
+            return await self.get_free_calls_available(service_client)
+        return free_calls_left
+
+    async def get_payment_metadata(self, service_client) -> list:
+        if await self.get_free_calls_left(service_client) <= 0:
+            raise Exception(f"Free calls limit for address {self._user_address} has expired. Please use another payment strategy")
+        current_block_number = await service_client.get_current_block_number()
+        signature, _ = self.generate_signature(service_client, current_block_number)
+        metadata = [("snet-free-call-auth-token-bin", self._free_call_token),
+                    ("snet-payment-type", "free-call"),
+                    ("snet-free-call-user-address", self._user_address),
+                    ("snet-current-block-number", str(current_block_number)),
+                    ("snet-payment-channel-signature-bin", signature)]
+
+        return metadata
+
+    async def get_free_call_token_details(self, service_client, current_block_number=None) -> tuple[bytes, int]:
+        if not current_block_number:
+            current_block_number = await service_client.get_current_block_number()
+        signature, _ = self.generate_signature(service_client, current_block_number, with_token=False)
+
+        with add_to_path(str(RESOURCES_PATH.joinpath("proto"))):
+            state_service_pb2 = importlib.import_module("state_service_pb2")
+            state_service_pb2_grpc = importlib.import_module("state_service_pb2_grpc")
+
+        request = state_service_pb2.GetFreeCallTokenRequest(
+            address=self._user_address,
+            signature=signature,
+            current_block=current_block_number
+        )
+
+        channel = service_client.get_grpc_base_channel()
+        stub = state_service_pb2_grpc.FreeCallStateServiceStub(channel)
+        response = await stub.GetFreeCallToken(request)
+
+        return response.token, response.token_expiration_block
+
+
+class AsyncPaidCallPaymentStrategy(PaidCallPaymentStrategy, AsyncPaymentStrategy):
+
+    def __init__(self, block_offset=240, call_allowance=1, funding_manager=None, pre_signer=None):
+        super().__init__(block_offset, call_allowance, funding_manager, pre_signer)
+        # One coroutine at a time syncs the channels and opens or tops up the
+        # channel, so the first calls don't open a channel each
+        self._channel_lock = asyncio.Lock()
+
+    async def get_payment_metadata(self, service_client):
+        channel = await self.select_channel(service_client)
+        return self._get_payment_metadata_for_channel(service_client, channel)
+
+    async def select_channel(self, service_client):
+        default_expiration = await service_client.default_channel_expiration()
+        payment_channel = self._get_ledger_channel(service_client, default_expiration)
+        if payment_channel is not None:
+            self._schedule_top_up(payment_channel, self.get_price(service_client), default_expiration)
+            return payment_channel
+
+        async with self._channel_lock:
+            # The channel may have been selected while this call waited
+            payment_channel = self._get_ledger_channel(service_client, default_expiration)
+            if payment_channel is not None:
+                return payment_channel
+            return await self._select_channel(service_client, default_expiration)
+
+    async def _select_channel(self, service_client, default_expiration):
+        await service_client.load_open_channels()
+        await service_client.update_channel_states()
+        payment_channels = service_client.payment_channels
+        service_call_price = self.get_price(service_client)
+
+        if len(payment_channels) < 1:
+            mpe_balance = await service_client.escrow_balance()
+            if service_call_price > mpe_balance:
+                payment_channel = await service_client.deposit_and_open_channel(service_call_price,
+                                                                                default_expiration + self.block_offset)
+            else:
+                payment_channel = await service_client.open_channel(service_call_price,
+                                                                    default_expiration + self.block_offset)
+            service_client.payment_channels = service_client.payment_channels + [payment_channel]
+            await service_client.update_channel_states()
+        else:
+            payment_channel = payment_channels[0]
+
+        self._schedule_top_up(payment_channel, service_call_price, default_expiration)
+        if (not self._has_sufficient_funds(payment_channel, service_call_price) or
+                not self._is_valid(payment_channel, default_expiration)):
+            # Funding transactions wait for a receipt, so they are kept
+            # off the event loop
+            await asyncio.to_thread(self._top_up_channel, payment_channel,
+                                    service_call_price, default_expiration)
+
+        return payment_channel
+
+
+class AsyncConcurrencyManager(ConcurrencyManager):
+    def __init__(self, concurrent_calls: int = 1, renewal_threshold: float | None = None,
+                 target_renewal_interval: float | None = None, min_concurrent_calls: int = 1,
+                 max_concurrent_calls: int | None = None):
+        super().__init__(concurrent_calls, renewal_threshold, target_renewal_interval,
+                         min_concurrent_calls, max_concurrent_calls)
+        # The token accounting is the parent's; only the renewals, which
+        # await the daemon, are serialized by an asyncio lock
+        self._renewal_lock = asyncio.Lock()
+        self._prefetch_task = None
+
+    async def get_token(self, service_client, channel, service_call_price):
+        call_price = service_client.get_price()
+        token = self.reserve_call(call_price)
+        if token is not None:
+            self.schedule_prefetch(service_client, channel, service_call_price)
+            return token
+        async with self._renewal_lock:
+            # The token may have been renewed while this call waited
+            token = self.reserve_call(call_price)
+            if token is not None:
+                return token
+            token_reply = await self._get_token(service_client, channel, service_call_price,
+                                                new_token=self._has_token())
+            return self._swap_token(token_reply, call_price)
+
+    def schedule_prefetch(self, service_client, channel, service_call_price):
+        if (self.renewal_threshold is None or self._prefetch_task is not None or
+                not self._prefetch_due(service_call_price)):
+            return
+        self._prefetch_task = asyncio.ensure_future(
+            self._prefetch_token(service_client, channel, service_call_price)
+        )
+
+    async def _prefetch_token(self, service_client, channel, service_call_price):
+        try:
+            async with self._renewal_lock:
+                if not self._prefetch_due(service_call_price):
+                    return
+                if channel.state["available_amount"] < service_call_price:
+                    return
+                token_reply = await self._get_token(service_client, channel, service_call_price, new_token=True)
+                self._swap_token(token_reply)
+        except Exception as e:
+            print(f"Warning: prefetch of the prepaid token failed: {e!r}")
+        finally:
+            self._prefetch_task = None
+
+    async def _get_token(self, service_client, channel, service_call_price, new_token=False):
+        if not new_token:
+            amount = channel.state["last_signed_amount"]
+            if amount != 0:
+                try:
+                    token_reply = await self._get_token_for_amount(service_client, channel, amount)
+                    if token_reply.planned_amount - token_reply.used_amount > 0:
+                        return token_reply
+                except grpc.RpcError as e:
+                    if e.details() != "Unable to retrieve planned Amount ":
+                        raise
+
+        amount = channel.state["last_signed_amount"] + service_call_price
+        token_reply = await self._get_token_for_amount(service_client, channel, amount)
+        channel.record_claim(amount)
+        return token_reply
+
+    async def _get_token_for_amount(self, service_client, channel, amount):
+        with add_to_path(str(RESOURCES_PATH.joinpath("proto"))):
+            token_service_pb2_grpc = importlib.import_module("token_service_pb2_grpc")
+        stub = token_service_pb2_grpc.TokenServiceStub(service_client.get_grpc_base_channel())
+        current_block_number = await service_client.get_current_block_number()
+        request = self._get_token_request(service_client, channel, amount, current_block_number)
+        return await stub.GetToken(request)
+
+
+class AsyncPrePaidPaymentStrategy(AsyncPaidCallPaymentStrategy):
+
+    def __init__(self, concurrent_calls: int = 1, block_offset: int = 240, call_allowance: int = 1,
+                 funding_manager=None, token_renewal_threshold: float | None = None,
+                 target_renewal_interval: float | None = None, min_concurrent_calls: int = 1,
+                 max_concurrent_calls: int | None = None):
+        super().__init__(block_offset, call_allowance, funding_manager)
+        self.concurrency_manager = AsyncConcurrencyManager(concurrent_calls, token_renewal_threshold,
+                                                           target_renewal_interval, min_concurrent_calls,
+                                                           max_concurrent_calls)
+
+    def get_price(self, service_client):
+        return service_client.get_price() * self.concurrency_manager.concurrent_calls
+
+    def set_concurrent_calls(self, concurrent_calls):
+        self.concurrency_manager.concurrent_calls = concurrent_calls
+
+    async def get_payment_metadata(self, service_client):
+        channel = await self.select_channel(service_client)
+        token = await self.concurrency_manager.get_token(service_client, channel, self.get_price(service_client))
+        metadata = [
+            ("snet-payment-type", "prepaid-call"),
+            ("snet-payment-channel-id", str(channel.channel_id)),
+            ("snet-payment-channel-nonce", str(channel.state["nonce"])),
+            ("snet-prepaid-auth-token-bin", bytes(token, 'UTF-8'))
+        ]
+        return metadata
+
+    async def get_concurrency_token_and_channel(self, service_client):
+        channel = await self.select_channel(service_client)
+        token = await self.concurrency_manager.get_token(service_client, channel, self.get_price(service_client))
+        return token, channel
+
+
+class AsyncDefaultPaymentStrategy(DefaultPaymentStrategy, AsyncPaymentStrategy):
+
+    def __init__(self, free_calls_recheck_interval: float = 600, funding_manager=None, pre_signer=None,
+                 token_renewal_threshold: float | None = None, target_renewal_interval: float | None = None,
+                 min_concurrent_calls: int = 1, max_concurrent_calls: int | None = None):
+        super().__init__(free_calls_recheck_interval, funding_manager, pre_signer, token_renewal_threshold,
+                         target_renewal_interval, min_concurrent_calls, max_concurrent_calls)
+        self.free_call_payment_strategy = AsyncFreeCallPaymentStrategy()
+        self.paid_call_payment_strategy = AsyncPaidCallPaymentStrategy(funding_manager=funding_manager,
+                                                                       pre_signer=pre_signer)
+
+    async def get_payment_metadata(self, service_client):
+        if self._free_calls_recheck_due():
+            free_calls_available = await self.free_call_payment_strategy.get_free_calls_left(service_client)
+            self._record_free_calls_available(free_calls_available)
+            if free_calls_available > 0:
+                return await self.free_call_payment_strategy.get_payment_metadata(service_client)
+        return await self._get_paid_payment_strategy(service_client).get_payment_metadata(service_client)
+
+    def _create_prepaid_payment_strategy(self, concurrent_calls):
+        return AsyncPrePaidPaymentStrategy(
+            concurrent_calls, funding_manager=self.funding_manager,
+            token_renewal_threshold=self.token_renewal_threshold,
+            target_renewal_interval=self.target_renewal_interval,
+            min_concurrent_calls=self.min_concurrent_calls,
+            max_concurrent_calls=self.max_concurrent_calls
+        )
+
+    async def get_concurrency_token_and_channel(self, service_client):
+        payment_strategy = self._get_prepaid_payment_strategy(service_client)
+        return await payment_strategy.get_concurrency_token_and_channel(service_client)
+
+
+ASYNC_PAYMENT_STRATEGIES = {
+    PaidCallPaymentStrategy: AsyncPaidCallPaymentStrategy,
+    FreeCallPaymentStrategy: AsyncFreeCallPaymentStrategy,
+    PrePaidPaymentStrategy: AsyncPrePaidPaymentStrategy,
+    DefaultPaymentStrategy: AsyncDefaultPaymentStrategy,
+}
+
+
+def get_async_payment_strategy(payment_strategy_class: type[PaymentStrategy]) -> type[AsyncPaymentStrategy]:
+    return ASYNC_PAYMENT_STRATEGIES[payment_strategy_class]
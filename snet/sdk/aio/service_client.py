@@ -0,0 +1,281 @@
+import asyncio
+import base64
+import importlib
+from pathlib import Path
+from typing import Any, AsyncIterable, Iterable
+
+from eth_typing import BlockNumber
+import grpc
+import web3
+
+from snet.sdk.account import Account
+from snet.sdk.aio import generic_client_interceptor
+from snet.sdk.aio.payment_strategies import AsyncPrePaidPaymentStrategy
+from snet.sdk.block_clock import BlockClock
+from snet.sdk.mpe.claim_message import ClaimMessageEncoder
+from snet.sdk.mpe.mpe_contract import MPEContract
+from snet.sdk.mpe.payment_channel import PaymentChannel
+from snet.sdk.mpe.payment_channel_provider import PaymentChannelProvider
+from snet.sdk.resources.root_certificate import certificate
+from snet.sdk.service_client import (RpcDescriptor, RpcMethod,
+                                     build_rpc_descriptors, build_rpc_index,
+                                     get_group_endpoints,
+                                     resolve_request_class)
+from snet.sdk.storage_provider.service_metadata import MPEServiceMetadata
+from snet.sdk.custom_typing import ModuleName, ServiceStub
+from snet.sdk.utils.call_utils import (create_async_intercept_call_func,
+                                       get_grpc_channel_options,
+                                       get_grpc_compression,
+                                       parse_grpc_endpoint)
+from snet.sdk.utils.utils import RESOURCES_PATH, add_to_path
+
+
+class AsyncServiceClient:
+    def __init__(
+        self,
+        org_id: str,
+        service_id: str,
+        service_metadata: MPEServiceMetadata,
+        group: dict,
+        service_stubs: list[ServiceStub],
+        payment_strategy,
+        options: dict,
+        mpe_contract: MPEContract,
+        account: Account,
+        sdk_web3: web3.Web3,
+        async_web3: web3.AsyncWeb3,
+        pb2_module: ModuleName,
+        payment_channel_provider: PaymentChannelProvider,
+        path_to_pb_files: Path,
+        block_clock: BlockClock = None
+    ):
+        self.org_id = org_id
+        self.service_id = service_id
+        self.service_metadata = service_metadata
+        self.group = group
+        self.payment_strategy = payment_strategy
+        if isinstance(payment_strategy, AsyncPrePaidPaymentStrategy):
+            self.payment_strategy.set_concurrent_calls(options["concurrent_calls"])
+        self.options = options
+        self.mpe_contract = mpe_contract
+        self.mpe_address = mpe_contract.contract.address
+        self.__claim_message_encoder = None
+        self.account = account
+        self.sdk_web3 = sdk_web3
+        self.async_web3 = async_web3
+        self.block_clock = block_clock
+        self.async_mpe_contract = async_web3.eth.contract(
+            abi=mpe_contract.contract.abi,
+            address=self.mpe_address
+        )
+        self.pb2_module = (importlib.import_module(pb2_module)
+                                if isinstance(pb2_module, str)
+                                else pb2_module)
+        self.payment_channel_provider = payment_channel_provider
+        self.path_to_pb_files = path_to_pb_files
+
+        self.expiry_threshold: int = self.group["payment"]["payment_expiration_threshold"]
+        self.__base_grpc_channel = self._get_grpc_channel()
+        _intercept_call_func = create_async_intercept_call_func(
+            self.payment_strategy.get_payment_metadata, self,
+            getattr(self.payment_strategy, "record_call_result", None)
+        )
+        self.grpc_channel = self._get_grpc_channel(
+            interceptors=[generic_client_interceptor.create(_intercept_call_func)]
+        )
+        self.service_stubs = service_stubs
+        self.__rpc_descriptors = build_rpc_descriptors(self.pb2_module)
+        self.__rpc_index: dict[str, RpcMethod] = {}
+        self.__rpc_index_channel: grpc.aio.Channel | None = None
+        self.payment_channel_state_service_client = self._generate_payment_channel_state_service_client()
+        self.payment_channels = []
+        self.last_read_block: int = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def close(self) -> None:
+        await asyncio.gather(self.grpc_channel.close(),
+                             self.__base_grpc_channel.close())
+
+    async def call_rpc(self, rpc_name: str, message_class: str = None,
+                       **kwargs) -> Any:
+        rpc_method = self._get_rpc_method(rpc_name, message_class)
+        request = rpc_method.request_class(**kwargs)
+        if rpc_method.client_streaming:
+            call = rpc_method.method(iter((request,)))
+        else:
+            call = rpc_method.method(request)
+        if rpc_method.server_streaming:
+            return call
+        return await call
+
+    async def call_stream_rpc(self, rpc_name: str,
+                              requests: Iterable[dict] | AsyncIterable[dict],
+                              message_class: str = None) -> Any:
+        rpc_method = self._get_rpc_method(rpc_name, message_class)
+        if not rpc_method.client_streaming:
+            raise Exception(f"{rpc_name} is not a client streaming method")
+        if isinstance(requests, AsyncIterable):
+            request_iterator = (rpc_method.request_class(**kwargs)
+                                async for kwargs in requests)
+        else:
+            request_iterator = (rpc_method.request_class(**kwargs)
+                                for kwargs in requests)
+        call = rpc_method.method(request_iterator)
+        if rpc_method.server_streaming:
+            return call
+        return await call
+
+    def get_rpc_descriptors(self) -> dict[str, RpcDescriptor]:
+        return self.__rpc_descriptors
+
+    def _get_rpc_method(self, rpc_name: str,
+                        message_class: str = None) -> RpcMethod:
+        grpc_channel = self._get_call_channel()
+        if grpc_channel is not self.__rpc_index_channel:
+            _, self.__rpc_index = build_rpc_index(self.service_stubs,
+                                                  grpc_channel,
+                                                  self.__rpc_descriptors)
+            self.__rpc_index_channel = grpc_channel
+        rpc_method = self.__rpc_index.get(rpc_name)
+        if rpc_method is None:
+            raise Exception(f"Service stub for {rpc_name} not found")
+        resolved_rpc_method = resolve_request_class(rpc_name, rpc_method,
+                                                    message_class,
+                                                    self.pb2_module)
+        if resolved_rpc_method is not rpc_method:
+            self.__rpc_index[rpc_name] = resolved_rpc_method
+        return resolved_rpc_method
+
+    def _get_call_channel(self) -> grpc.aio.Channel:
+        if self.options.get("disable_blockchain_operations", False):
+            return self.__base_grpc_channel
+        return self.grpc_channel
+
+    def get_grpc_base_channel(self) -> grpc.aio.Channel:
+        return self.__base_grpc_channel
+
+    def _get_grpc_channel(self, interceptors=None) -> grpc.aio.Channel:
+        endpoint = get_group_endpoints(self.options, self.service_metadata,
+                                       self.group["group_name"])[0]
+        channel_endpoint, is_secure = parse_grpc_endpoint(endpoint)
+        channel_options = get_grpc_channel_options(self.options)
+        compression = get_grpc_compression(self.options)
+        if is_secure:
+            return grpc.aio.secure_channel(channel_endpoint,
+                                           grpc.ssl_channel_credentials(root_certificates=certificate),
+                                           options=channel_options,
+                                           compression=compression,
+                                           interceptors=interceptors)
+        return grpc.aio.insecure_channel(channel_endpoint,
+                                         options=channel_options,
+                                         compression=compression,
+                                         interceptors=interceptors)
+
+    def _generate_payment_channel_state_service_client(self) -> Any:
+        with add_to_path(str(RESOURCES_PATH.joinpath("proto"))):
+            state_service = importlib.import_module("state_service_pb2_grpc")
+        return state_service.PaymentChannelStateServiceStub(self.__base_grpc_channel)
+
+    async def load_open_channels(self) -> list[PaymentChannel]:
+        # The channels cache is kept by the blocking PaymentChannelProvider,
+        # so it is only scanned while no channel is known yet
+        if self.payment_channels:
+            return self.payment_channels
+        payment_address = self.group["payment"]["payment_address"]
+        group_id = base64.b64decode(str(self.group["group_id"]))
+        current_block_number = await self.get_current_block_number()
+        self.payment_channels = await asyncio.to_thread(
+            self.payment_channel_provider.get_past_open_channels,
+            self.account, payment_address, group_id,
+            self.payment_channel_state_service_client
+        )
+        self.last_read_block = current_block_number
+        return self.payment_channels
+
+    async def get_current_block_number(self) -> BlockNumber:
+        # The shared clock is refreshed here rather than in the clock itself,
+        # so a stale clock does not block the event loop
+        if self.block_clock is not None:
+            block_number = self.block_clock.get_cached_block_number()
+            if block_number is not None:
+                return block_number
+        block_number = await self.async_web3.eth.block_number
+        if self.block_clock is not None:
+            self.block_clock.observe(block_number)
+        return block_number
+
+    async def update_channel_states(self) -> list[PaymentChannel]:
+        await asyncio.gather(*(self._sync_channel_state(channel)
+                               for channel in self.payment_channels))
+        return self.payment_channels
+
+    async def _sync_channel_state(self, channel: PaymentChannel) -> None:
+        channel_blockchain_data, current_block_number = await asyncio.gather(
+            self.async_mpe_contract.functions.channels(channel.channel_id).call(),
+            self.get_current_block_number()
+        )
+        request = channel._get_channel_state_request(current_block_number)
+        response = await self.payment_channel_state_service_client.GetChannelState(request)
+        current_nonce, last_signed_amount = channel._parse_channel_state_reply(response)
+        channel._update_state(channel_blockchain_data, current_nonce, last_signed_amount)
+
+    async def escrow_balance(self) -> int:
+        return await self.async_mpe_contract.functions.balances(self.account.address).call()
+
+    async def default_channel_expiration(self) -> int:
+        current_block_number = await self.get_current_block_number()
+        return current_block_number + self.expiry_threshold
+
+    async def open_channel(self, amount: int, expiration: int) -> PaymentChannel:
+        payment_address = self.group["payment"]["payment_address"]
+        group_id = base64.b64decode(str(self.group["group_id"]))
+        return await asyncio.to_thread(
+            self.payment_channel_provider.open_channel,
+            self.account, amount, expiration, payment_address,
+            group_id, self.payment_channel_state_service_client
+        )
+
+    async def deposit_and_open_channel(self, amount: int,
+                                       expiration: int) -> PaymentChannel:
+        payment_address = self.group["payment"]["payment_address"]
+        group_id = base64.b64decode(str(self.group["group_id"]))
+        return await asyncio.to_thread(
+            self.payment_channel_provider.deposit_and_open_channel,
+            self.account, amount, expiration, payment_address,
+            group_id, self.payment_channel_state_service_client
+        )
+
+    def get_price(self) -> int:
+        return self.group["pricing"][0]["price_in_cogs"]
+
+    @property
+    def claim_message_encoder(self) -> ClaimMessageEncoder:
+        # Created on first use, the MPE address doesn't change afterwards
+        if self.__claim_message_encoder is None:
+            self.__claim_message_encoder = ClaimMessageEncoder(self.mpe_address)
+        return self.__claim_message_encoder
+
+    def generate_signature(self, message: bytes) -> bytes:
+        return self.account.signer.sign_message(message)
+
+    def get_service_details(self) -> tuple[str, str, str, str]:
+        return (self.org_id,
+                self.service_id,
+                self.group["group_id"],
+                self.service_metadata.get_all_endpoints_for_group(
+                    self.group["group_name"]
+                )[0])
+
+    def get_concurrency_flag(self) -> bool:
+        return self.options.get('concurrency', True)
+
+    def get_concurrent_calls(self):
+        return self.options.get('concurrent_calls', 1)
+
+    async def get_concurrency_token_and_channel(self) -> tuple[str, PaymentChannel]:
+        return await self.payment_strategy.get_concurrency_token_and_channel(self)
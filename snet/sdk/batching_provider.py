@@ -0,0 +1,135 @@
+import threading
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+import web3
+from web3.types import RPCEndpoint, RPCResponse
+
+DEFAULT_BATCH_WINDOW = 0.005
+MAX_BATCH_SIZE = 100
+
+
+class _PendingRequest:
+    def __init__(self, method: RPCEndpoint, params: Any):
+        self.method = method
+        self.params = params
+        self.response: RPCResponse | None = None
+        self.error: Exception | None = None
+        self.done = False
+
+    def get_response(self) -> RPCResponse:
+        if self.error is not None:
+            raise self.error
+        return self.response
+
+
+class BatchingHTTPProvider(web3.HTTPProvider):
+    def __init__(self, endpoint_uri: str | None = None, request_kwargs: Any = None,
+                 batch_window: float | None = None, max_batch_size: int = MAX_BATCH_SIZE,
+                 **kwargs: Any):
+        super().__init__(endpoint_uri=endpoint_uri, request_kwargs=request_kwargs, **kwargs)
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self.__local = threading.local()
+        self.__threads_in_blocks = 0
+        self.__pending: list[_PendingRequest] = []
+        self.__sending = False
+        self.__batches_supported = True
+        self.__condition = threading.Condition()
+
+    @contextmanager
+    def batch(self, window: float = DEFAULT_BATCH_WINDOW) -> Iterator["BatchingHTTPProvider"]:
+        # The block applies to the requests of the calling thread only; they
+        # are coalesced with the ones of the other threads within a block
+        block_windows = self.__get_block_windows()
+        if len(block_windows) == 0:
+            with self.__condition:
+                self.__threads_in_blocks += 1
+        block_windows.append(window)
+        try:
+            yield self
+        finally:
+            block_windows.pop()
+            if len(block_windows) == 0:
+                with self.__condition:
+                    self.__threads_in_blocks -= 1
+
+    def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        window = self.__get_window()
+        if window is None or not self.__batches_supported:
+            return self._make_single_request(method, params)
+        return self.__make_coalesced_request(_PendingRequest(method, params), window)
+
+    def _make_single_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        return super().make_request(method, params)
+
+    def __get_block_windows(self) -> list[float]:
+        if not hasattr(self.__local, "windows"):
+            self.__local.windows = []
+        return self.__local.windows
+
+    def __get_window(self) -> float | None:
+        windows = list(self.__get_block_windows())
+        if self.batch_window is not None:
+            windows.append(self.batch_window)
+        if len(windows) == 0:
+            return None
+        return max(windows)
+
+    def __make_coalesced_request(self, request: _PendingRequest, window: float) -> RPCResponse:
+        # The thread that finds no batch in flight sends the pending requests,
+        # after waiting for the window; the requests issued meanwhile wait
+        # for the next batch
+        in_block = len(self.__get_block_windows()) > 0
+        with self.__condition:
+            self.__pending.append(request)
+            self.__condition.notify_all()
+            while not request.done:
+                if self.__sending:
+                    self.__condition.wait()
+                    continue
+                self.__sending = True
+                if window > 0 and self.__expects_other_requests(in_block):
+                    self.__condition.wait_for(lambda: len(self.__pending) >= self.max_batch_size,
+                                              window)
+                batch = self.__pending[:self.max_batch_size]
+                del self.__pending[:self.max_batch_size]
+                self.__condition.release()
+                try:
+                    self.__send(batch)
+                finally:
+                    self.__condition.acquire()
+                    self.__sending = False
+                    self.__condition.notify_all()
+        return request.get_response()
+
+    def __expects_other_requests(self, in_block: bool) -> bool:
+        # A lone thread doesn't wait for the window, no request can join it
+        return len(self.__pending) > 1 or self.__threads_in_blocks > in_block
+
+    def __send(self, batch: list[_PendingRequest]) -> None:
+        responses = None
+        if len(batch) > 1 and self.__batches_supported:
+            try:
+                responses = self.make_batch_request([(request.method, request.params)
+                                                     for request in batch])
+            except Exception as e:
+                for request in batch:
+                    request.error = e
+                    request.done = True
+                return
+            if not isinstance(responses, list) or len(responses) != len(batch):
+                # The endpoint rejected the batch, so the requests are sent
+                # one by one from now on
+                print("Warning: the Ethereum RPC endpoint doesn't support batch requests")
+                self.__batches_supported = False
+                responses = None
+        for i, request in enumerate(batch):
+            try:
+                if responses is None:
+                    request.response = self._make_single_request(request.method, request.params)
+                else:
+                    request.response = responses[i]
+            except Exception as e:
+                request.error = e
+            request.done = True
@@ -0,0 +1,86 @@
+import threading
+import time
+
+import web3
+
+
+class BlockClock:
+    def __init__(self, w3: web3.Web3, max_staleness: float = 30,
+                 poll_interval: float = 12, average_block_time: float = 12):
+        self.web3 = w3
+        self.max_staleness = max_staleness
+        self.poll_interval = poll_interval
+        self.average_block_time = average_block_time
+        self.__block_number: int | None = None
+        self.__observed_at: float = 0
+        self.__changed_at: float = 0
+        self.__lock = threading.Lock()
+        self.__refresh_lock = threading.Lock()
+        self.__poll_stop = threading.Event()
+        self.__poll_thread = None
+
+    def get_block_number(self) -> int:
+        block_number = self.get_cached_block_number()
+        if block_number is not None:
+            return block_number
+        return self.refresh(force=False)
+
+    def get_cached_block_number(self) -> int | None:
+        self.start()
+        with self.__lock:
+            if self.__block_number is None:
+                return None
+            now = time.monotonic()
+            if now - self.__observed_at > self.max_staleness:
+                return None
+            # Blocks produced since the last block was seen are interpolated
+            # from the average block time
+            elapsed = now - self.__changed_at
+            return self.__block_number + int(elapsed / self.average_block_time)
+
+    def refresh(self, force: bool = True) -> int:
+        # Concurrent callers that find the clock stale wait for one request
+        with self.__refresh_lock:
+            if not force:
+                block_number = self.get_cached_block_number()
+                if block_number is not None:
+                    return block_number
+            block_number = self.web3.eth.block_number
+            self.observe(block_number)
+            return block_number
+
+    def observe(self, block_number: int) -> None:
+        observed_at = time.monotonic()
+        with self.__lock:
+            if self.__block_number is None or block_number > self.__block_number:
+                if self.__block_number is not None:
+                    block_time = ((observed_at - self.__changed_at) /
+                                  (block_number - self.__block_number))
+                    self.average_block_time = (0.9 * self.average_block_time +
+                                               0.1 * block_time)
+                self.__block_number = block_number
+                self.__changed_at = observed_at
+            self.__observed_at = observed_at
+
+    def start(self) -> None:
+        if self.__poll_thread is not None or self.poll_interval <= 0:
+            return
+        with self.__lock:
+            if self.__poll_thread is not None:
+                return
+            self.__poll_thread = threading.Thread(target=self._poll,
+                                                  name="snet-block-clock",
+                                                  daemon=True)
+            self.__poll_thread.start()
+
+    def _poll(self) -> None:
+        while not self.__poll_stop.is_set():
+            try:
+                self.refresh()
+            except Exception:
+                # The call path refreshes the clock itself once it is stale
+                pass
+            self.__poll_stop.wait(self.poll_interval)
+
+    def stop(self) -> None:
+        self.__poll_stop.set()
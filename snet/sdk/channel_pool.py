@@ -0,0 +1,321 @@
+import collections
+import itertools
+import queue
+import threading
+from typing import Any, Callable
+
+import grpc
+from grpc_health.v1 import health_pb2, health_pb2_grpc
+
+
+ROUND_ROBIN = "round_robin"
+LEAST_OUTSTANDING_REQUESTS = "least_outstanding_requests"
+
+
+class LatencyTracker:
+    def __init__(self, window: int = 200):
+        self.__latencies = collections.deque(maxlen=window)
+        self.__lock = threading.Lock()
+
+    def record(self, latency: float) -> None:
+        with self.__lock:
+            self.__latencies.append(latency)
+
+    def percentile(self, percentile: float) -> float | None:
+        with self.__lock:
+            latencies = sorted(self.__latencies)
+        if len(latencies) == 0:
+            return None
+        index = min(len(latencies) - 1,
+                    int(len(latencies) * percentile / 100))
+        return latencies[index]
+
+    def __len__(self) -> int:
+        return len(self.__latencies)
+
+
+class PooledEndpoint:
+    def __init__(self, endpoint: str, base_channel: grpc.Channel,
+                 channel: grpc.Channel):
+        self.endpoint = endpoint
+        self.base_channel = base_channel
+        self.channel = channel
+        self.outstanding_requests = 0
+        self.healthy = True
+        self.health_stub = None
+
+    def get_channel(self, intercepted: bool) -> grpc.Channel:
+        return self.channel if intercepted else self.base_channel
+
+
+class ChannelPool:
+    def __init__(self,
+                 endpoints: list[str],
+                 create_channel: Callable[[str], grpc.Channel],
+                 interceptor: Any = None,
+                 load_balancing: str = ROUND_ROBIN,
+                 connections_per_endpoint: int = 1,
+                 health_check_interval: float = 0,
+                 health_check_timeout: float = 1):
+        if len(endpoints) == 0:
+            raise ValueError("At least one endpoint is required")
+        if load_balancing not in (ROUND_ROBIN, LEAST_OUTSTANDING_REQUESTS):
+            raise ValueError(f"Unsupported load balancing policy: {load_balancing}")
+        if connections_per_endpoint < 1:
+            raise ValueError("connections_per_endpoint must be a positive number")
+        self.load_balancing = load_balancing
+        self.endpoints: list[PooledEndpoint] = []
+        # Every connection to an endpoint is a separate pooled endpoint, so
+        # the calls are spread among the connections as well
+        for _ in range(connections_per_endpoint):
+            for endpoint in endpoints:
+                base_channel = create_channel(endpoint)
+                channel = base_channel
+                if interceptor is not None:
+                    channel = grpc.intercept_channel(base_channel, interceptor)
+                self.endpoints.append(PooledEndpoint(endpoint, base_channel, channel))
+        self.__lock = threading.Lock()
+        self.__counter = itertools.count()
+        self.__health_check_stop = threading.Event()
+        self.__health_check_thread = None
+        self.base_channel = BalancedChannel(self, intercepted=False)
+        self.channel = BalancedChannel(self, intercepted=True)
+        if health_check_interval > 0:
+            self.start_health_checks(health_check_interval, health_check_timeout)
+
+    def acquire(self, exclude: tuple[PooledEndpoint, ...] = ()) -> PooledEndpoint:
+        with self.__lock:
+            # Unhealthy endpoints are used only if there are no other ones
+            not_excluded = [pooled_endpoint for pooled_endpoint in self.endpoints
+                            if pooled_endpoint not in exclude]
+            candidates = ([pooled_endpoint for pooled_endpoint in not_excluded
+                           if pooled_endpoint.healthy]
+                          or not_excluded or self.endpoints)
+            offset = next(self.__counter) % len(candidates)
+            candidates = candidates[offset:] + candidates[:offset]
+            if self.load_balancing == LEAST_OUTSTANDING_REQUESTS:
+                pooled_endpoint = min(candidates,
+                                      key=lambda e: e.outstanding_requests)
+            else:
+                pooled_endpoint = candidates[0]
+            pooled_endpoint.outstanding_requests += 1
+            return pooled_endpoint
+
+    def release(self, pooled_endpoint: PooledEndpoint) -> None:
+        with self.__lock:
+            pooled_endpoint.outstanding_requests -= 1
+
+    def set_healthy(self, pooled_endpoint: PooledEndpoint, healthy: bool) -> None:
+        with self.__lock:
+            pooled_endpoint.healthy = healthy
+
+    def check_health(self, pooled_endpoint: PooledEndpoint,
+                     timeout: float = 1) -> bool:
+        if pooled_endpoint.health_stub is None:
+            pooled_endpoint.health_stub = health_pb2_grpc.HealthStub(
+                pooled_endpoint.base_channel
+            )
+        request = health_pb2.HealthCheckRequest()
+        try:
+            response = pooled_endpoint.health_stub.Check(request, timeout=timeout)
+        except grpc.RpcError as e:
+            # The daemon is reachable, but doesn't serve the health service
+            return _get_status_code(e) == grpc.StatusCode.UNIMPLEMENTED
+        except ValueError:
+            # The channel was closed
+            return False
+        return response.status == health_pb2.HealthCheckResponse.SERVING
+
+    def start_health_checks(self, interval: float, timeout: float = 1) -> None:
+        if interval <= 0 or self.__health_check_thread is not None:
+            return
+        self.__health_check_thread = threading.Thread(
+            target=self._run_health_checks,
+            args=(interval, timeout),
+            name="snet-health-check",
+            daemon=True
+        )
+        self.__health_check_thread.start()
+
+    def _run_health_checks(self, interval: float, timeout: float) -> None:
+        while not self.__health_check_stop.is_set():
+            for pooled_endpoint in self.endpoints:
+                # The pool may be closed in the middle of a pass
+                if self.__health_check_stop.is_set():
+                    return
+                self.set_healthy(pooled_endpoint,
+                                 self.check_health(pooled_endpoint, timeout))
+            self.__health_check_stop.wait(interval)
+
+    def close(self) -> None:
+        self.__health_check_stop.set()
+        for pooled_endpoint in self.endpoints:
+            pooled_endpoint.base_channel.close()
+
+
+class BalancedChannel(grpc.Channel):
+    def __init__(self, pool: ChannelPool, intercepted: bool):
+        self._pool = pool
+        self._intercepted = intercepted
+
+    def subscribe(self, callback, try_to_connect=False):
+        for pooled_endpoint in self._pool.endpoints:
+            pooled_endpoint.base_channel.subscribe(callback, try_to_connect)
+
+    def unsubscribe(self, callback):
+        for pooled_endpoint in self._pool.endpoints:
+            pooled_endpoint.base_channel.unsubscribe(callback)
+
+    def unary_unary(self, method, request_serializer=None,
+                    response_deserializer=None, **kwargs):
+        return _BalancedMultiCallable(self._pool, self._intercepted,
+                                      "unary_unary", method,
+                                      request_serializer,
+                                      response_deserializer, kwargs)
+
+    def unary_stream(self, method, request_serializer=None,
+                     response_deserializer=None, **kwargs):
+        return _BalancedMultiCallable(self._pool, self._intercepted,
+                                      "unary_stream", method,
+                                      request_serializer,
+                                      response_deserializer, kwargs)
+
+    def stream_unary(self, method, request_serializer=None,
+                     response_deserializer=None, **kwargs):
+        return _BalancedMultiCallable(self._pool, self._intercepted,
+                                      "stream_unary", method,
+                                      request_serializer,
+                                      response_deserializer, kwargs)
+
+    def stream_stream(self, method, request_serializer=None,
+                      response_deserializer=None, **kwargs):
+        return _BalancedMultiCallable(self._pool, self._intercepted,
+                                      "stream_stream", method,
+                                      request_serializer,
+                                      response_deserializer, kwargs)
+
+    def close(self):
+        self._pool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+
+class _BalancedMultiCallable:
+    def __init__(self, pool: ChannelPool, intercepted: bool, cardinality: str,
+                 method: str, request_serializer, response_deserializer,
+                 kwargs: dict):
+        self._pool = pool
+        self._intercepted = intercepted
+        self._cardinality = cardinality
+        self._method = method
+        self._request_serializer = request_serializer
+        self._response_deserializer = response_deserializer
+        self._kwargs = kwargs
+        self._multi_callables = {}
+
+    def _get_multi_callable(self, pooled_endpoint: PooledEndpoint) -> Any:
+        multi_callable = self._multi_callables.get(id(pooled_endpoint))
+        if multi_callable is None:
+            channel = pooled_endpoint.get_channel(self._intercepted)
+            multi_callable = getattr(channel, self._cardinality)(
+                self._method,
+                request_serializer=self._request_serializer,
+                response_deserializer=self._response_deserializer,
+                **self._kwargs
+            )
+            self._multi_callables[id(pooled_endpoint)] = multi_callable
+        return multi_callable
+
+    def _start_call(self, call_type: str, request, args: tuple, kwargs: dict,
+                    exclude: tuple[PooledEndpoint, ...] = ()):
+        tried_endpoints = exclude
+        while True:
+            pooled_endpoint = self._pool.acquire(exclude=tried_endpoints)
+            try:
+                multi_callable = self._get_multi_callable(pooled_endpoint)
+                call = getattr(multi_callable, call_type)(request, *args, **kwargs)
+                break
+            except grpc.RpcError as e:
+                self._pool.release(pooled_endpoint)
+                if _get_status_code(e) != grpc.StatusCode.UNAVAILABLE:
+                    raise
+                self._pool.set_healthy(pooled_endpoint, False)
+                tried_endpoints += (pooled_endpoint,)
+                # Only blocking unary calls are retried: the request of a
+                # streaming call may be already consumed
+                if (self._cardinality != "unary_unary" or
+                        len(tried_endpoints) >= len(self._pool.endpoints)):
+                    raise
+            except BaseException:
+                self._pool.release(pooled_endpoint)
+                raise
+        if call_type == "with_call" or not hasattr(call, "add_done_callback"):
+            self._pool.release(pooled_endpoint)
+        else:
+            # Futures and response streams stay outstanding until they finish
+            call.add_done_callback(lambda _: self._pool.release(pooled_endpoint))
+        return call, pooled_endpoint
+
+    def _call(self, call_type: str, request, *args, **kwargs):
+        call, _ = self._start_call(call_type, request, args, kwargs)
+        return call
+
+    def hedge(self, request, delay: float, *args, **kwargs) -> tuple[Any, int]:
+        if self._cardinality != "unary_unary":
+            raise ValueError("Only unary calls can be hedged")
+        completed = queue.SimpleQueue()
+        future, pooled_endpoint = self._start_call("future", request, args, kwargs)
+        future.add_done_callback(completed.put)
+        attempts = [future]
+        try:
+            try:
+                future = completed.get(timeout=delay)
+            except queue.Empty:
+                # The duplicate goes to another daemon, not to another
+                # connection to the same one
+                same_endpoint = tuple(
+                    e for e in self._pool.endpoints
+                    if e.endpoint == pooled_endpoint.endpoint
+                )
+                if len(same_endpoint) < len(self._pool.endpoints):
+                    hedged_future, _ = self._start_call(
+                        "future", request, args, kwargs,
+                        exclude=same_endpoint
+                    )
+                    hedged_future.add_done_callback(completed.put)
+                    attempts.append(hedged_future)
+                future = completed.get()
+            # The first successful response wins; an attempt that failed
+            # (e.g. the daemon rejected a duplicate payment) waits for the other
+            remaining = len(attempts) - 1
+            while future.exception() is not None and remaining > 0:
+                future = completed.get()
+                remaining -= 1
+            result = future.result()
+            # Only the answered attempts are known to be charged, the other
+            # one is cancelled below
+            charged_attempts = sum(1 for attempt in attempts
+                                   if attempt.done() and not attempt.cancelled()
+                                   and attempt.exception() is None)
+            return result, charged_attempts
+        finally:
+            for attempt in attempts:
+                attempt.cancel()
+
+    def __call__(self, request, *args, **kwargs):
+        return self._call("__call__", request, *args, **kwargs)
+
+    def with_call(self, request, *args, **kwargs):
+        return self._call("with_call", request, *args, **kwargs)
+
+    def future(self, request, *args, **kwargs):
+        return self._call("future", request, *args, **kwargs)
+
+
+def _get_status_code(error: grpc.RpcError) -> grpc.StatusCode | None:
+    return error.code() if hasattr(error, "code") else None
@@ -1,4 +1,7 @@
+from concurrent.futures import ThreadPoolExecutor
 import importlib
+import threading
+import time
 
 import grpc
 import web3
@@ -7,11 +10,26 @@ from snet.sdk.utils.utils import RESOURCES_PATH, add_to_path
 
 
 class ConcurrencyManager:
-    def __init__(self, concurrent_calls: int=1):
+    def __init__(self, concurrent_calls: int=1, renewal_threshold: float | None = None,
+                 target_renewal_interval: float | None = None, min_concurrent_calls: int = 1,
+                 max_concurrent_calls: int | None = None):
         self.__concurrent_calls: int = concurrent_calls
+        self.renewal_threshold = renewal_threshold
+        self.target_renewal_interval = target_renewal_interval
+        self.min_concurrent_calls = min_concurrent_calls
+        self.max_concurrent_calls = max_concurrent_calls
+        self.__calls_since_renewal = 0
+        self.__renewed_at = None
         self.__token: str = ''
         self.__planned_amount: int = 0
         self.__used_amount: int = 0
+        # The token is shared by the calls of all threads: the usage is
+        # reserved under the lock, and one thread at a time renews the token
+        self.__lock = threading.Lock()
+        self.__renewal_lock = threading.Lock()
+        self.__prefetch_pending = False
+        self.__executor = None
+        self.__closed = False
 
     @property
     def concurrent_calls(self) -> int:
@@ -22,11 +40,105 @@ class ConcurrencyManager:
         self.__concurrent_calls = concurrent_calls
 
     def get_token(self, service_client, channel, service_call_price):
-        if len(self.__token) == 0:
-            self.__token = self.__get_token(service_client, channel, service_call_price)
-        elif self.__used_amount >= self.__planned_amount:
-            self.__token = self.__get_token(service_client, channel, service_call_price, new_token=True)
-        return self.__token
+        call_price = service_client.get_price()
+        token = self.reserve_call(call_price)
+        if token is not None:
+            self.schedule_prefetch(service_client, channel, service_call_price)
+            return token
+        with self.__renewal_lock:
+            # The token may have been renewed while this thread waited
+            token = self.reserve_call(call_price)
+            if token is not None:
+                return token
+            token_reply = self.__get_token(service_client, channel, service_call_price,
+                                           new_token=self._has_token())
+            return self._swap_token(token_reply, call_price)
+
+    def _has_token(self) -> bool:
+        return len(self.__token) != 0
+
+    def _swap_token(self, token_reply, call_price: int = 0) -> str:
+        # The calls in flight are not counted by the daemon yet, so the used
+        # amount reserved locally is kept if it is larger
+        with self.__lock:
+            self.__token = token_reply.token
+            self.__planned_amount = token_reply.planned_amount
+            self.__used_amount = max(self.__used_amount, token_reply.used_amount) + call_price
+            self.__record_renewal()
+            if call_price > 0:
+                self.__calls_since_renewal += 1
+            return self.__token
+
+    def __record_renewal(self):
+        now = time.monotonic()
+        if self.target_renewal_interval is not None and self.__renewed_at is not None:
+            self.__concurrent_calls = self._get_adapted_concurrent_calls(self.__calls_since_renewal,
+                                                                         now - self.__renewed_at)
+        self.__renewed_at = now
+        self.__calls_since_renewal = 0
+
+    def _get_adapted_concurrent_calls(self, calls: int, elapsed: float) -> int:
+        # The next tokens prepay the calls expected in the target interval at
+        # the observed call rate. The number changes at most twofold per
+        # renewal, so a single burst or pause doesn't swing it
+        concurrent_calls = self.concurrent_calls
+        if calls == 0 or elapsed <= 0:
+            return concurrent_calls
+        expected_calls = round(calls / elapsed * self.target_renewal_interval)
+        concurrent_calls = max(concurrent_calls // 2, min(concurrent_calls * 2, expected_calls))
+        if self.max_concurrent_calls is not None:
+            concurrent_calls = min(concurrent_calls, self.max_concurrent_calls)
+        return max(concurrent_calls, self.min_concurrent_calls, 1)
+
+    def _prefetch_due(self, service_call_price: int) -> bool:
+        with self.__lock:
+            return self.__prefetch_due(service_call_price)
+
+    def __prefetch_due(self, service_call_price: int) -> bool:
+        return (self._has_token() and
+                self.__planned_amount - self.__used_amount < (1 - self.renewal_threshold) * service_call_price)
+
+    def schedule_prefetch(self, service_client, channel, service_call_price):
+        # Once the used part of the token crosses the threshold, the next token
+        # is fetched in the background, so no call waits for the renewal
+        if self.renewal_threshold is None:
+            return
+        with self.__lock:
+            if self.__closed or self.__prefetch_pending or not self.__prefetch_due(service_call_price):
+                return
+            self.__prefetch_pending = True
+            if self.__executor is None:
+                self.__executor = ThreadPoolExecutor(max_workers=1,
+                                                     thread_name_prefix="snet-token-renewal")
+            executor = self.__executor
+        executor.submit(self.__prefetch_token, service_client, channel, service_call_price)
+
+    def __prefetch_token(self, service_client, channel, service_call_price):
+        try:
+            with self.__renewal_lock:
+                with self.__lock:
+                    if not self.__prefetch_due(service_call_price):
+                        return
+                # The channel is topped up by the calls that wait for a token
+                if channel.state["available_amount"] < service_call_price:
+                    return
+                token_reply = self.__get_token(service_client, channel, service_call_price, new_token=True)
+                self._swap_token(token_reply)
+        except Exception as e:
+            print(f"Warning: prefetch of the prepaid token failed: {e!r}")
+        finally:
+            with self.__lock:
+                self.__prefetch_pending = False
+
+    def reserve_call(self, call_price: int) -> str | None:
+        # The price of the call is counted when the token is handed out, so
+        # the calls in flight don't overdraw the planned amount
+        with self.__lock:
+            if not self._has_token() or self.__used_amount + call_price > self.__planned_amount:
+                return None
+            self.__used_amount += call_price
+            self.__calls_since_renewal += 1
+            return self.__token
 
     def __get_token(self, service_client, channel, service_call_price, new_token=False):
         if not new_token:
@@ -34,21 +146,24 @@ class ConcurrencyManager:
             if amount != 0:
                 try:
                     token_reply = self.__get_token_for_amount(service_client, channel, amount)
-                    planned_amount = token_reply.planned_amount
-                    used_amount = token_reply.used_amount
-                    if planned_amount - used_amount > 0:
-                        self.__used_amount = used_amount
-                        self.__planned_amount = planned_amount
-                        return token_reply.token
+                    if token_reply.planned_amount - token_reply.used_amount > 0:
+                        return token_reply
                 except grpc.RpcError as e:
                     if e.details() != "Unable to retrieve planned Amount ":
                         raise
 
         amount = channel.state["last_signed_amount"] + service_call_price
         token_reply = self.__get_token_for_amount(service_client, channel, amount)
-        self.__used_amount = token_reply.used_amount
-        self.__planned_amount = token_reply.planned_amount
-        return token_reply.token
+        channel.record_claim(amount)
+        return token_reply
+
+    def close(self, wait: bool = False) -> None:
+        # The tokens are renewed by the calls once the manager is closed
+        with self.__lock:
+            self.__closed = True
+            executor = self.__executor
+        if executor is not None:
+            executor.shutdown(wait=wait)
 
     def __get_stub_for_get_token(self, service_client):
         grpc_channel = service_client.get_grpc_base_channel()
@@ -57,15 +172,18 @@ class ConcurrencyManager:
         return token_service_pb2_grpc.TokenServiceStub(grpc_channel)
 
     def __get_token_for_amount(self, service_client, channel, amount):
-        nonce = channel.state["nonce"]
         stub = self.__get_stub_for_get_token(service_client)
+        current_block_number = service_client.get_current_block_number()
+        request = self._get_token_request(service_client, channel, amount, current_block_number)
+        token_reply = stub.GetToken(request)
+        return token_reply
+
+    @staticmethod
+    def _get_token_request(service_client, channel, amount, current_block_number):
+        nonce = channel.state["nonce"]
         with add_to_path(str(RESOURCES_PATH.joinpath("proto"))):
             token_service_pb2 = importlib.import_module("token_service_pb2")
-        current_block_number = service_client.sdk_web3.eth.get_block("latest").number
-        message = web3.Web3.solidity_keccak(
-            ["string", "address", "uint256", "uint256", "uint256"],
-            ["__MPE_claim_message", service_client.mpe_address, channel.channel_id, nonce, amount]
-        )
+        message = service_client.claim_message_encoder.encode(channel.channel_id, nonce, amount)
         mpe_signature = service_client.generate_signature(message)
         message = web3.Web3.solidity_keccak(
             ["bytes", "uint256"],
@@ -73,12 +191,7 @@ class ConcurrencyManager:
         )
         sign_mpe_signature = service_client.generate_signature(message)
 
-        request = token_service_pb2.TokenRequest(
+        return token_service_pb2.TokenRequest(
             channel_id=channel.channel_id, current_nonce=nonce, signed_amount=amount,
             signature=bytes(sign_mpe_signature), claim_signature=bytes(mpe_signature),
             current_block=current_block_number)
-        token_reply = stub.GetToken(request)
-        return token_reply
-
-    def record_successful_call(self):
-        self.__used_amount += 1
@@ -11,7 +11,14 @@ class Config:
                  mpe_contract_address=None,
                  token_contract_address=None,
                  registry_contract_address=None,
-                 signer_private_key=None):
+                 signer_private_key=None,
+                 block_clock_max_staleness=30,
+                 block_clock_poll_interval=12,
+                 average_block_time=12,
+                 signing_backend=None,
+                 multicall_contract_address=None,
+                 eth_rpc_batching=False,
+                 eth_rpc_batch_window=None):
         self.__config = {
             "private_key": private_key,
             "eth_rpc_endpoint": eth_rpc_endpoint,
@@ -24,7 +31,14 @@ class Config:
             "token_contract_address": token_contract_address,
             "registry_contract_address": registry_contract_address,
             "signer_private_key": signer_private_key,
-            "lighthouse_token": " "
+            "lighthouse_token": " ",
+            "block_clock_max_staleness": block_clock_max_staleness,
+            "block_clock_poll_interval": block_clock_poll_interval,
+            "average_block_time": average_block_time,
+            "signing_backend": signing_backend,
+            "multicall_contract_address": multicall_contract_address,
+            "eth_rpc_batching": eth_rpc_batching,
+            "eth_rpc_batch_window": eth_rpc_batch_window
         }
 
     def __getitem__(self, key):
@@ -0,0 +1,115 @@
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+import threading
+import time
+
+
+class FundingManager:
+    def __init__(self, low_balance_calls: int = 1, lead_time: float = 600,
+                 funding_horizon: float = 3600, expiration_watermark: int = 240,
+                 spend_window: int = 100, min_spend_period: float = 60):
+        self.low_balance_calls = low_balance_calls
+        self.lead_time = lead_time
+        self.funding_horizon = funding_horizon
+        self.expiration_watermark = expiration_watermark
+        self.min_spend_period = min_spend_period
+        self.__spend_window = spend_window
+        self.__spend_history: dict[int, deque] = {}
+        self.__pending_top_ups: dict[int, Future] = {}
+        self.__lock = threading.Lock()
+        # Funding transactions of one account are sent one by one, so their
+        # nonces don't collide
+        self.__executor = ThreadPoolExecutor(max_workers=1,
+                                             thread_name_prefix="snet-funding")
+
+    def observe(self, payment_channel) -> None:
+        # The spend rate is derived from the signed amount of the channel
+        # ledger, so it works the same for paid and prepaid calls
+        last_signed_amount = payment_channel.state["last_signed_amount"]
+        with self.__lock:
+            history = self.__spend_history.setdefault(
+                payment_channel.channel_id, deque(maxlen=self.__spend_window)
+            )
+            if history and last_signed_amount < history[-1][1]:
+                # The channel was claimed and the signed amount started over
+                history.clear()
+            if not history or last_signed_amount != history[-1][1]:
+                history.append((time.monotonic(), last_signed_amount))
+
+    def get_spend_rate(self, payment_channel) -> float:
+        with self.__lock:
+            history = self.__spend_history.get(payment_channel.channel_id)
+            if not history or len(history) < 2:
+                return 0
+            (first_time, first_amount), (_, last_amount) = history[0], history[-1]
+        # A burst of calls right after startup doesn't make a forecast on
+        # its own, the amount is spread over at least min_spend_period
+        elapsed = max(time.monotonic() - first_time, self.min_spend_period)
+        return (last_amount - first_amount) / elapsed
+
+    def schedule_top_up(self, payment_channel, service_call_price: int,
+                        default_expiration: int, block_offset: int,
+                        call_allowance: int) -> Future | None:
+        self.observe(payment_channel)
+        with self.__lock:
+            pending_top_up = self.__pending_top_ups.get(payment_channel.channel_id)
+            if pending_top_up is not None:
+                return pending_top_up
+
+        spend_rate = self.get_spend_rate(payment_channel)
+        low_balance = max(service_call_price * self.low_balance_calls,
+                          int(spend_rate * self.lead_time))
+        amount = 0
+        if payment_channel.state["available_amount"] - service_call_price < low_balance:
+            amount = max(service_call_price * call_allowance,
+                         int(spend_rate * self.funding_horizon),
+                         low_balance)
+        expiration = None
+        if payment_channel.state["expiration"] < default_expiration + self.expiration_watermark:
+            expiration = default_expiration + self.expiration_watermark + block_offset
+        if not amount and expiration is None:
+            return None
+
+        with self.__lock:
+            pending_top_up = self.__pending_top_ups.get(payment_channel.channel_id)
+            if pending_top_up is None:
+                pending_top_up = self.__executor.submit(self._top_up, payment_channel,
+                                                        amount, expiration)
+                self.__pending_top_ups[payment_channel.channel_id] = pending_top_up
+            return pending_top_up
+
+    def top_up(self, payment_channel, service_call_price: int, default_expiration: int,
+               block_offset: int, call_allowance: int) -> None:
+        pending_top_up = self.schedule_top_up(payment_channel, service_call_price,
+                                              default_expiration, block_offset,
+                                              call_allowance)
+        # The call is served from the remaining balance unless the channel
+        # can't pay for it before the transaction is mined
+        if pending_top_up is not None and not self.can_serve(payment_channel,
+                                                             service_call_price,
+                                                             default_expiration):
+            pending_top_up.result()
+
+    def _top_up(self, payment_channel, amount: int, expiration: int | None) -> None:
+        try:
+            if amount and expiration is not None:
+                payment_channel.extend_and_add_funds(expiration, amount)
+            elif amount:
+                payment_channel.add_funds(amount)
+            else:
+                payment_channel.extend_expiration(expiration)
+        except Exception as e:
+            print(f"Warning: top-up of the channel {payment_channel.channel_id} failed: {e!r}")
+            raise
+        finally:
+            payment_channel.invalidate_state()
+            with self.__lock:
+                self.__pending_top_ups.pop(payment_channel.channel_id, None)
+
+    @staticmethod
+    def can_serve(payment_channel, service_call_price: int, default_expiration: int) -> bool:
+        return (payment_channel.state["available_amount"] >= service_call_price and
+                payment_channel.state["expiration"] >= default_expiration)
+
+    def close(self, wait: bool = False) -> None:
+        self.__executor.shutdown(wait=wait)
@@ -0,0 +1,21 @@
+from eth_hash.auto import keccak
+import web3
+
+CLAIM_MESSAGE_PREFIX = b"__MPE_claim_message"
+
+
+class ClaimMessageEncoder:
+    def __init__(self, mpe_address: str):
+        # The prefix and the MPE address are packed once, the same way
+        # solidity_keccak packs "string" and "address"
+        address = web3.Web3.to_bytes(hexstr=mpe_address)
+        if len(address) != 20:
+            raise ValueError('Invalid MPE contract address ("{}")'.format(mpe_address))
+        self.mpe_address = mpe_address
+        self.__prefix = CLAIM_MESSAGE_PREFIX + address
+
+    def encode(self, channel_id: int, nonce: int, amount: int) -> bytes:
+        return keccak(self.__prefix +
+                      channel_id.to_bytes(32, "big") +
+                      nonce.to_bytes(32, "big") +
+                      amount.to_bytes(32, "big"))
@@ -1,9 +1,11 @@
 from snet.contracts import get_contract_deployment_block, get_contract_object
+from snet.sdk.multicall import Multicall
 
 
 class MPEContract:
-    def __init__(self, w3, address=None):
+    def __init__(self, w3, address=None, multicall=None):
         self.web3 = w3
+        self.multicall = multicall if multicall is not None else Multicall(self.web3)
         if address is None:
             self.contract = get_contract_object(self.web3, "MultiPartyEscrow")
         else:
@@ -12,6 +14,11 @@ class MPEContract:
     def balance(self, address):
         return self.contract.functions.balances(address).call()
 
+    def get_channels(self, channel_ids):
+        # The channel structs are read in one aggregated call
+        return self.multicall.call(self.contract.functions.channels(channel_id)
+                                   for channel_id in channel_ids)
+
     def deposit(self, account, amount_in_cogs):
         return account.send_transaction(self.contract.functions.deposit, amount_in_cogs)
 
@@ -39,6 +46,6 @@ class MPEContract:
                                         amount)
 
     def _fund_escrow_account(self, account, amount):
-        current_escrow_balance = self.balance(account.address)
+        current_escrow_balance, already_approved = account.escrow_balance_and_allowance()
         if amount > current_escrow_balance:
-            account.deposit_to_escrow_account(amount - current_escrow_balance)
+            account.deposit_to_escrow_account(amount - current_escrow_balance, already_approved)
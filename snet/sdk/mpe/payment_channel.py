@@ -1,13 +1,16 @@
+import threading
+
 import web3
 import importlib
-from eth_account.messages import defunct_hash_message
 
 from snet.sdk.utils.utils import RESOURCES_PATH, add_to_path
 
 class PaymentChannel:
-    def __init__(self, channel_id, w3, account, payment_channel_state_service_client, mpe_contract):
+    def __init__(self, channel_id, w3, account, payment_channel_state_service_client, mpe_contract,
+                 block_clock=None):
         self.channel_id = channel_id
         self.web3 = w3
+        self.block_clock = block_clock
         self.account = account
         self.mpe_contract = mpe_contract
         self.payment_channel_state_service_client = payment_channel_state_service_client
@@ -15,6 +18,10 @@ class PaymentChannel:
             "nonce": 0,
             "last_signed_amount": 0
         }
+        self.state_synced = False
+        self.__reserved_amount = 0
+        self.__release_reservations = False
+        self.__lock = threading.Lock()
 
     def add_funds(self, amount):
         return self.mpe_contract.channel_add_funds(self.account, self.channel_id, amount)
@@ -25,25 +32,76 @@ class PaymentChannel:
     def extend_and_add_funds(self, expiration, amount):
         return self.mpe_contract.channel_extend_and_add_funds(self.account, self.channel_id, expiration, amount)
 
-    def sync_state(self):
-        channel_blockchain_data = self.mpe_contract.contract.functions.channels(self.channel_id).call()
-        (current_nonce, last_signed_amount) = self._get_current_channel_state()
+    def sync_state(self, channel_blockchain_data=None, current_block_number=None):
+        # The channel struct and the block number can be read beforehand for
+        # many channels at once
+        if channel_blockchain_data is None:
+            channel_blockchain_data = self.mpe_contract.contract.functions.channels(self.channel_id).call()
+        (current_nonce, last_signed_amount) = self._get_current_channel_state(current_block_number)
+        self._update_state(channel_blockchain_data, current_nonce, last_signed_amount)
+
+    def _update_state(self, channel_blockchain_data, current_nonce, last_signed_amount):
         nonce = channel_blockchain_data[0]
         total_amount = channel_blockchain_data[5]
         expiration = channel_blockchain_data[6]
-        available_amount = total_amount - last_signed_amount
-        self.state = {
-            "current_nonce": current_nonce,
-            "last_signed_amount": last_signed_amount,
-            "nonce": nonce,
-            "total_amount": total_amount,
-            "expiration": expiration,
-            "available_amount": available_amount
-        }
+        with self.__lock:
+            # The amounts reserved for the calls in flight are kept, as they
+            # may still reach the daemon, unless a claim failed or the channel
+            # was claimed (its nonce changed)
+            if self.__release_reservations or nonce != self.state["nonce"]:
+                self.__reserved_amount = last_signed_amount
+            else:
+                self.__reserved_amount = max(self.__reserved_amount, last_signed_amount)
+            self.__release_reservations = False
+            available_amount = total_amount - self.__reserved_amount
+            self.state = {
+                "current_nonce": current_nonce,
+                "last_signed_amount": last_signed_amount,
+                "nonce": nonce,
+                "total_amount": total_amount,
+                "expiration": expiration,
+                "available_amount": available_amount
+            }
+            self.state_synced = True
+
+    def reserve_claim(self, price):
+        # The calls in flight on the channel sign increasing amounts, so each
+        # amount is reserved before it is signed
+        with self.__lock:
+            amount = max(self.__reserved_amount, self.state["last_signed_amount"]) + price
+            self.__reserved_amount = amount
+            if "total_amount" in self.state:
+                self.state["available_amount"] = self.state["total_amount"] - amount
+            return amount
+
+    def record_claim(self, amount):
+        # The daemon accepted a claim for the amount, so the local state
+        # follows it without asking the daemon again
+        with self.__lock:
+            if self.state_synced:
+                last_signed_amount = max(self.state["last_signed_amount"], amount)
+                self.state["last_signed_amount"] = last_signed_amount
+                self.state["available_amount"] = (self.state["total_amount"] -
+                                                  max(last_signed_amount, self.__reserved_amount))
 
-    def _get_current_channel_state(self):
+    def invalidate_state(self, claim_failed=False):
+        with self.__lock:
+            if claim_failed:
+                self.__release_reservations = True
+            self.state_synced = False
+
+    def _get_current_channel_state(self, current_block_number=None):
         stub = self.payment_channel_state_service_client
-        current_block_number = self.web3.eth.get_block("latest").number
+        if current_block_number is None:
+            if self.block_clock is not None:
+                current_block_number = self.block_clock.get_block_number()
+            else:
+                current_block_number = self.web3.eth.get_block("latest").number
+        request = self._get_channel_state_request(current_block_number)
+        response = stub.GetChannelState(request)
+        return self._parse_channel_state_reply(response)
+
+    def _get_channel_state_request(self, current_block_number):
         message = web3.Web3.solidity_keccak(
             ["string", "address", "uint256", "uint256"],
             [
@@ -52,13 +110,15 @@ class PaymentChannel:
                 self.channel_id,current_block_number
             ]
         )
-        signature = self.web3.eth.account._sign_hash(defunct_hash_message(message), self.account.signer_private_key).signature
+        signature = self.account.signer.sign_message(message)
         with add_to_path(str(RESOURCES_PATH.joinpath("proto"))):
             state_service_pb2 = importlib.import_module("state_service_pb2")
-        request = state_service_pb2.ChannelStateRequest(
+        return state_service_pb2.ChannelStateRequest(
             channel_id=web3.Web3.to_bytes(self.channel_id),
             signature=bytes(signature),
             current_block=current_block_number
         )
-        response = stub.GetChannelState(request)
+
+    @staticmethod
+    def _parse_channel_state_reply(response):
         return int.from_bytes(response.current_nonce, byteorder="big"),int.from_bytes(response.current_signed_amount, byteorder="big")
@@ -0,0 +1,81 @@
+import threading
+import time
+from typing import Callable
+
+from snet.sdk.mpe.payment_channel import PaymentChannel
+
+DEFAULT_LEASE_TIMEOUT = 60
+
+
+class PaymentChannelPool:
+    def __init__(self, size: int, load_channels: Callable[[], list[PaymentChannel]],
+                 lease_timeout: float | None = DEFAULT_LEASE_TIMEOUT):
+        if size < 1:
+            raise ValueError("The payment channel pool size must be a positive number")
+        self.size = size
+        self.lease_timeout = lease_timeout
+        self.__load_channels = load_channels
+        self.__channels: list[PaymentChannel] = []
+        self.__leased: set[int] = set()
+        self.__opening = 0
+        self.__loaded = False
+        self.__condition = threading.Condition()
+
+    @property
+    def channels(self) -> list[PaymentChannel]:
+        with self.__condition:
+            return list(self.__channels)
+
+    def lease(self) -> PaymentChannel | None:
+        # Each in-flight call gets a channel of its own, so the amounts
+        # signed for a channel are sent to the daemon one by one
+        deadline = None
+        if self.lease_timeout is not None:
+            deadline = time.monotonic() + self.lease_timeout
+        with self.__condition:
+            if not self.__loaded:
+                self.__adopt(self.__load_channels())
+                self.__loaded = True
+            while True:
+                for payment_channel in self.__channels:
+                    if payment_channel.channel_id not in self.__leased:
+                        self.__leased.add(payment_channel.channel_id)
+                        return payment_channel
+                if len(self.__channels) + self.__opening < self.size:
+                    # The caller opens a new channel and adds it to the pool
+                    self.__opening += 1
+                    return None
+                timeout = None
+                if deadline is not None:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        raise TimeoutError("No payment channel of the pool was released "
+                                           f"in {self.lease_timeout} seconds")
+                self.__condition.wait(timeout)
+
+    def add(self, payment_channel: PaymentChannel) -> None:
+        # The channel opened for a lease is leased right away
+        with self.__condition:
+            self.__opening -= 1
+            self.__channels.append(payment_channel)
+            self.__leased.add(payment_channel.channel_id)
+
+    def cancel_opening(self) -> None:
+        with self.__condition:
+            self.__opening -= 1
+            self.__condition.notify()
+
+    def release(self, channel_id: int) -> None:
+        with self.__condition:
+            if channel_id in self.__leased:
+                self.__leased.remove(channel_id)
+                self.__condition.notify()
+
+    def __adopt(self, payment_channels: list[PaymentChannel]) -> None:
+        # The open channels of the account for the same recipient and group
+        # are used before any new channel is opened
+        for payment_channel in payment_channels:
+            if len(self.__channels) >= self.size:
+                break
+            if all(payment_channel.channel_id != c.channel_id for c in self.__channels):
+                self.__channels.append(payment_channel)
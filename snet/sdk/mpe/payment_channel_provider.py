@@ -9,12 +9,14 @@ from snet.contracts import get_contract_deployment_block
 
 
 BLOCKS_PER_BATCH = 5000
+LOG_REQUESTS_PER_BATCH = 20
 CHANNELS_DIR = Path.home().joinpath(".snet", "cache", "mpe")
 
 
 class PaymentChannelProvider(object):
-    def __init__(self, w3, mpe_contract):
+    def __init__(self, w3, mpe_contract, block_clock=None):
         self.web3 = w3
+        self.block_clock = block_clock
 
         self.mpe_contract = mpe_contract
         self.event_topics = [self.web3.keccak(
@@ -69,16 +71,20 @@ class PaymentChannelProvider(object):
     def _get_all_channels_from_blockchain_logs_to_dicts(self, starting_block_number, to_block_number):
         codec: ABICodec = self.web3.codec
 
-        logs = []
+        filters = []
         from_block = starting_block_number
         while from_block <= to_block_number:
             to_block = min(from_block + BLOCKS_PER_BATCH, to_block_number)
-            logs = logs + self.web3.eth.get_logs({"fromBlock": from_block,
-                                                  "toBlock": to_block,
-                                                  "address": self.mpe_address,
-                                                  "topics": self.event_topics})
+            filters.append({"fromBlock": from_block,
+                            "toBlock": to_block,
+                            "address": self.mpe_address,
+                            "topics": self.event_topics})
             from_block = to_block + 1
 
+        logs = []
+        for i in range(0, len(filters), LOG_REQUESTS_PER_BATCH):
+            logs = logs + self._get_logs(filters[i:i + LOG_REQUESTS_PER_BATCH])
+
         event_abi = self.mpe_contract.contract.events.ChannelOpen._get_event_abi()
 
         event_data_list = [get_event_data(codec, event_abi, l)["args"] for l in logs]
@@ -86,6 +92,19 @@ class PaymentChannelProvider(object):
 
         return channels_opened
 
+    def _get_logs(self, filters):
+        # The block ranges are requested in one JSON-RPC batch request; the
+        # providers that don't support batches are asked one by one
+        if len(filters) > 1:
+            try:
+                with self.web3.batch_requests() as batch:
+                    for log_filter in filters:
+                        batch.add(self.web3.eth.get_logs(log_filter))
+                    return [log for logs in batch.execute() for log in logs]
+            except Exception:
+                pass
+        return [log for log_filter in filters for log in self.web3.eth.get_logs(log_filter)]
+
     def _get_channels_from_cache(self):
         self.update_cache()
         with open(self.channels_file, "rb") as f:
@@ -106,7 +125,8 @@ class PaymentChannelProvider(object):
                                                        self.web3,
                                                        account,
                                                        payment_channel_state_service_client,
-                                                       self.mpe_contract),
+                                                       self.mpe_contract,
+                                                       self.block_clock),
                         channels_opened))
 
     def open_channel(self, account, amount, expiration, payment_address, group_id, payment_channel_state_service_client):
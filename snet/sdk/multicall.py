@@ -0,0 +1,112 @@
+from typing import Any, Iterable
+
+import web3
+from eth_utils.abi import get_abi_output_types
+from web3._utils.abi import map_abi_data
+from web3._utils.normalizers import BASE_RETURN_NORMALIZERS
+from web3.contract.contract import ContractFunction
+
+# Multicall3 is deployed at the same address on most of the EVM networks
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+MULTICALL3_ABI = [
+    {
+        "name": "aggregate3",
+        "type": "function",
+        "stateMutability": "payable",
+        "inputs": [
+            {
+                "name": "calls",
+                "type": "tuple[]",
+                "components": [
+                    {"name": "target", "type": "address"},
+                    {"name": "allowFailure", "type": "bool"},
+                    {"name": "callData", "type": "bytes"}
+                ]
+            }
+        ],
+        "outputs": [
+            {
+                "name": "returnData",
+                "type": "tuple[]",
+                "components": [
+                    {"name": "success", "type": "bool"},
+                    {"name": "returnData", "type": "bytes"}
+                ]
+            }
+        ]
+    }
+]
+MAX_CALLS_PER_AGGREGATE = 100
+
+
+class Multicall:
+    def __init__(self, w3: web3.Web3, address: str | None = None,
+                 max_calls: int = MAX_CALLS_PER_AGGREGATE):
+        self.web3 = w3
+        self.max_calls = max_calls
+        if address is None:
+            address = MULTICALL3_ADDRESS
+        self.contract = self.web3.eth.contract(
+            address=web3.Web3.to_checksum_address(address),
+            abi=MULTICALL3_ABI
+        )
+        self.__deployed: bool | None = None
+
+    def is_deployed(self) -> bool:
+        # The code is looked up once, the networks without Multicall3 are
+        # served by the fallback from then on
+        if self.__deployed is None:
+            try:
+                self.__deployed = len(self.web3.eth.get_code(self.contract.address)) > 0
+            except Exception:
+                return False
+        return self.__deployed
+
+    def call(self, contract_functions: Iterable[ContractFunction]) -> list[Any]:
+        contract_functions = list(contract_functions)
+        if len(contract_functions) == 0:
+            return []
+        if len(contract_functions) == 1:
+            return [contract_functions[0].call()]
+        if not self.is_deployed():
+            return self.__call_each(contract_functions)
+        results = []
+        for i in range(0, len(contract_functions), self.max_calls):
+            results.extend(self.__aggregate(contract_functions[i:i + self.max_calls]))
+        return results
+
+    def __aggregate(self, contract_functions: list[ContractFunction]) -> list[Any]:
+        calls = [(contract_function.address, True, contract_function._encode_transaction_data())
+                 for contract_function in contract_functions]
+        try:
+            replies = self.contract.functions.aggregate3(calls).call()
+        except Exception:
+            return self.__call_each(contract_functions)
+        results = []
+        for contract_function, (success, return_data) in zip(contract_functions, replies):
+            if success:
+                results.append(self.__decode(contract_function, return_data))
+            else:
+                # The failed call is repeated on its own to raise its error
+                results.append(contract_function.call())
+        return results
+
+    def __decode(self, contract_function: ContractFunction, return_data: bytes) -> Any:
+        # The same decoding as in ContractFunction.call
+        output_types = get_abi_output_types(contract_function.abi)
+        output_data = self.web3.codec.decode(output_types, return_data)
+        normalized_data = map_abi_data(BASE_RETURN_NORMALIZERS, output_types, output_data)
+        if len(normalized_data) == 1:
+            return normalized_data[0]
+        return list(normalized_data)
+
+    def __call_each(self, contract_functions: list[ContractFunction]) -> list[Any]:
+        # The calls are sent in one JSON-RPC batch request; the providers
+        # that don't support batches are asked one by one
+        try:
+            with self.web3.batch_requests() as batch:
+                for contract_function in contract_functions:
+                    batch.add(contract_function)
+                return list(batch.execute())
+        except Exception:
+            return [contract_function.call() for contract_function in contract_functions]
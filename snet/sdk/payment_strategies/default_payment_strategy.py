@@ -1,3 +1,6 @@
+import threading
+import time
+
 from snet.sdk.payment_strategies.freecall_payment_strategy import FreeCallPaymentStrategy
 from snet.sdk.payment_strategies.paidcall_payment_strategy import PaidCallPaymentStrategy
 from snet.sdk.payment_strategies.prepaid_payment_strategy import PrePaidPaymentStrategy
@@ -6,32 +9,80 @@ from snet.sdk.payment_strategies.payment_strategy import PaymentStrategy
 
 class DefaultPaymentStrategy(PaymentStrategy):
 
-    def __init__(self):
+    def __init__(self, free_calls_recheck_interval: float = 600, funding_manager=None, pre_signer=None,
+                 token_renewal_threshold: float | None = None, target_renewal_interval: float | None = None,
+                 min_concurrent_calls: int = 1, max_concurrent_calls: int | None = None):
         self.channel = None
+        self.free_calls_recheck_interval = free_calls_recheck_interval
+        self.funding_manager = funding_manager
+        self.token_renewal_threshold = token_renewal_threshold
+        self.target_renewal_interval = target_renewal_interval
+        self.min_concurrent_calls = min_concurrent_calls
+        self.max_concurrent_calls = max_concurrent_calls
+        self.free_call_payment_strategy = FreeCallPaymentStrategy()
+        self.paid_call_payment_strategy = PaidCallPaymentStrategy(funding_manager=funding_manager,
+                                                                  pre_signer=pre_signer)
+        self.prepaid_payment_strategy = None
+        self._prepaid_lock = threading.Lock()
+        self._free_calls_exhausted_at = None
 
     def set_channel(self, channel):
         self.channel = channel
 
     def get_payment_metadata(self, service_client):
-        free_call_payment_strategy = FreeCallPaymentStrategy()
+        if self._free_calls_recheck_due():
+            free_calls_available = self.free_call_payment_strategy.get_free_calls_left(service_client)
+            self._record_free_calls_available(free_calls_available)
+            if free_calls_available > 0:
+                return self.free_call_payment_strategy.get_payment_metadata(service_client)
+        return self._get_paid_payment_strategy(service_client).get_payment_metadata(service_client)
+
+    def _free_calls_recheck_due(self) -> bool:
+        # Once the daemon reports that the free calls are over, they are
+        # checked again only after the recheck interval
+        return (self._free_calls_exhausted_at is None or
+                time.monotonic() - self._free_calls_exhausted_at >= self.free_calls_recheck_interval)
 
-        if free_call_payment_strategy.get_free_calls_available(service_client) > 0:
-            metadata = free_call_payment_strategy.get_payment_metadata(service_client)
+    def _record_free_calls_available(self, free_calls_available: int) -> None:
+        if free_calls_available > 0:
+            self._free_calls_exhausted_at = None
         else:
-            if service_client.get_concurrency_flag():
-                concurrent_calls = service_client.get_concurrent_calls()
-                payment_strategy = PrePaidPaymentStrategy(concurrent_calls)
-                metadata = payment_strategy.get_payment_metadata(service_client)
-            else:
-                payment_strategy = PaidCallPaymentStrategy()
-                metadata = payment_strategy.get_payment_metadata(service_client)
+            self._free_calls_exhausted_at = time.monotonic()
+
+    def _get_paid_payment_strategy(self, service_client):
+        if not service_client.get_concurrency_flag():
+            return self.paid_call_payment_strategy
+        return self._get_prepaid_payment_strategy(service_client)
 
-        return metadata
+    def _get_prepaid_payment_strategy(self, service_client):
+        # The first calls made at the same time share one strategy, so the
+        # token is renewed and accounted in one place
+        with self._prepaid_lock:
+            if self.prepaid_payment_strategy is None:
+                self.prepaid_payment_strategy = self._create_prepaid_payment_strategy(
+                    service_client.get_concurrent_calls()
+                )
+            return self.prepaid_payment_strategy
+
+    def _create_prepaid_payment_strategy(self, concurrent_calls):
+        return PrePaidPaymentStrategy(
+            concurrent_calls, funding_manager=self.funding_manager,
+            token_renewal_threshold=self.token_renewal_threshold,
+            target_renewal_interval=self.target_renewal_interval,
+            min_concurrent_calls=self.min_concurrent_calls,
+            max_concurrent_calls=self.max_concurrent_calls
+        )
 
     def get_price(self, service_client):
         pass
 
+    def record_call_result(self, service_client, payment_metadata, code):
+        payment_type = dict(payment_metadata).get("snet-payment-type")
+        if payment_type == "free-call":
+            self.free_call_payment_strategy.record_call_result(service_client, payment_metadata, code)
+        elif payment_type == "escrow":
+            self.paid_call_payment_strategy.record_call_result(service_client, payment_metadata, code)
+
     def get_concurrency_token_and_channel(self, service_client):
-        concurrent_calls = service_client.get_concurrent_calls()
-        payment_strategy = PrePaidPaymentStrategy(concurrent_calls)
+        payment_strategy = self._get_prepaid_payment_strategy(service_client)
         return payment_strategy.get_concurrency_token_and_channel(service_client)
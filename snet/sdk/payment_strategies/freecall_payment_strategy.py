@@ -1,4 +1,9 @@
+import base64
 import importlib
+from pathlib import Path
+import pickle
+import threading
+import time
 
 import grpc
 import web3
@@ -6,23 +11,31 @@ import web3
 from snet.sdk.payment_strategies.payment_strategy import PaymentStrategy
 from snet.sdk.utils.utils import RESOURCES_PATH, add_to_path
 
+
+FREE_CALL_TOKENS_DIR = Path.home().joinpath(".snet", "cache", "free_calls")
+
+
 class FreeCallPaymentStrategy(PaymentStrategy):
 
-    def __init__(self):
+    def __init__(self, reconcile_every_calls: int = 10, reconcile_interval: float = 60,
+                 token_cache_dir: Path | None = FREE_CALL_TOKENS_DIR):
         self._user_address = None
         self._free_call_token = None
         self._token_expiration_block = None
+        self.reconcile_every_calls = reconcile_every_calls
+        self.reconcile_interval = reconcile_interval
+        self.token_cache_dir = token_cache_dir
+        self._free_calls_left = None
+        self._calls_since_reconcile = 0
+        self._reconciled_at = 0
+        self._free_calls_lock = threading.Lock()
 
     def get_free_calls_available(self, service_client) -> int:
         if not self._user_address:
             self._user_address = service_client.account.signer_address
 
         current_block_number = service_client.get_current_block_number()
-
-        if (not self._free_call_token or
-                not self._token_expiration_block or
-                current_block_number > self._token_expiration_block):
-            self._free_call_token, self._token_expiration_block = self.get_free_call_token_details(service_client)
+        self.update_free_call_token(service_client, current_block_number)
 
         with add_to_path(str(RESOURCES_PATH.joinpath("proto"))):
             state_service_pb2 = importlib.import_module("state_service_pb2")
@@ -43,14 +56,95 @@ class FreeCallPaymentStrategy(PaymentStrategy):
 
         try:
             response = stub.GetFreeCallsAvailable(request)
-            return response.free_calls_available
+            free_calls_available = response.free_calls_available
         except grpc.RpcError as e:
             if self._user_address:
                 print(f"Warning: {e.details()}")
-            return 0
+            free_calls_available = 0
+        self._reconcile_free_calls(free_calls_available)
+        return free_calls_available
+
+    def get_free_calls_left(self, service_client) -> int:
+        free_calls_left = self._get_local_free_calls_left()
+        if free_calls_left is None:
+            return self.get_free_calls_available(service_client)
+        return free_calls_left
+
+    def _get_local_free_calls_left(self) -> int | None:
+        # The daemon is asked only every reconcile_every_calls calls or
+        # reconcile_interval seconds; in between the calls are counted locally
+        with self._free_calls_lock:
+            if (self._free_calls_left is None or
+                    self._calls_since_reconcile >= self.reconcile_every_calls or
+                    time.monotonic() - self._reconciled_at >= self.reconcile_interval):
+                return None
+            return self._free_calls_left
+
+    def _reconcile_free_calls(self, free_calls_available: int) -> None:
+        with self._free_calls_lock:
+            self._free_calls_left = free_calls_available
+            self._calls_since_reconcile = 0
+            self._reconciled_at = time.monotonic()
+
+    def record_call_result(self, service_client, payment_metadata, code) -> None:
+        with self._free_calls_lock:
+            if code == grpc.StatusCode.OK:
+                if self._free_calls_left is not None:
+                    self._free_calls_left = max(self._free_calls_left - 1, 0)
+                self._calls_since_reconcile += 1
+            elif code == grpc.StatusCode.UNAUTHENTICATED:
+                # The daemon refused the free call, so the next calls fall
+                # back to the paid ones until the next reconciliation
+                self._free_calls_left = 0
+                self._reconciled_at = time.monotonic()
+
+    def update_free_call_token(self, service_client, current_block_number=None) -> None:
+        if not self._user_address:
+            self._user_address = service_client.account.signer_address
+        if current_block_number is None:
+            current_block_number = service_client.get_current_block_number()
+        if not self._free_call_token:
+            self._load_free_call_token(service_client)
+        if (not self._free_call_token or
+                not self._token_expiration_block or
+                current_block_number > self._token_expiration_block):
+            self._free_call_token, self._token_expiration_block = self.get_free_call_token_details(service_client)
+            self._save_free_call_token(service_client)
+
+    def _get_token_cache_file(self, service_client) -> Path | None:
+        if self.token_cache_dir is None:
+            return None
+        org_id, service_id, group_id, _ = service_client.get_service_details()
+        group_id = base64.b64decode(str(group_id)).hex()
+        return self.token_cache_dir.joinpath(str(self._user_address), org_id,
+                                             service_id, f"{group_id}.pickle")
+
+    def _load_free_call_token(self, service_client) -> None:
+        cache_file = self._get_token_cache_file(service_client)
+        if cache_file is None or not cache_file.exists():
+            return
+        try:
+            with open(cache_file, "rb") as f:
+                load_dict = pickle.load(f)
+            self._free_call_token = load_dict["token"]
+            self._token_expiration_block = load_dict["token_expiration_block"]
+        except Exception as e:
+            print(f"Warning: the free call token cache is ignored: {e!r}")
+
+    def _save_free_call_token(self, service_client) -> None:
+        cache_file = self._get_token_cache_file(service_client)
+        if cache_file is None:
+            return
+        try:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(cache_file, "wb") as f:
+                pickle.dump({"token": self._free_call_token,
+                             "token_expiration_block": self._token_expiration_block}, f)
+        except OSError as e:
+            print(f"Warning: the free call token is not cached: {e!r}")
 
     def get_payment_metadata(self, service_client) -> list:
-        if self.get_free_calls_available(service_client) <= 0:
+        if self.get_free_calls_left(service_client) <= 0:
             raise Exception(f"Free calls limit for address {self._user_address} has expired. Please use another payment strategy")
         signature, current_block_number = self.generate_signature(service_client)
         metadata = [("snet-free-call-auth-token-bin", self._free_call_token),
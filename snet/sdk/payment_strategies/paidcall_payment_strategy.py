@@ -1,25 +1,33 @@
-import web3
+import grpc
 from snet.sdk.payment_strategies.payment_strategy import PaymentStrategy
 
 
 class PaidCallPaymentStrategy(PaymentStrategy):
-    def __init__(self, block_offset=240, call_allowance=1):
+    def __init__(self, block_offset=240, call_allowance=1, funding_manager=None, pre_signer=None):
         self.block_offset = block_offset
         self.call_allowance = call_allowance
+        self.funding_manager = funding_manager
+        self.pre_signer = pre_signer
 
     def get_price(self, service_client):
         return service_client.get_price()
 
     def get_payment_metadata(self, service_client):
-        channel = self.select_channel(service_client)
-        amount = channel.state["last_signed_amount"] + int(self.get_price(service_client))
-        message = web3.Web3.solidity_keccak(
-            ["string", "address", "uint256", "uint256", "uint256"],
-            ["__MPE_claim_message", service_client.mpe_address, channel.channel_id,
-             channel.state["nonce"],
-             amount]
-        )
-        signature = service_client.generate_signature(message)
+        payment_channel_pool = getattr(service_client, "payment_channel_pool", None)
+        if payment_channel_pool is None:
+            channel = self.select_channel(service_client)
+            return self._get_payment_metadata_for_channel(service_client, channel)
+        channel = self.lease_channel(service_client, payment_channel_pool)
+        try:
+            return self._get_payment_metadata_for_channel(service_client, channel)
+        except Exception:
+            payment_channel_pool.release(channel.channel_id)
+            raise
+
+    def _get_payment_metadata_for_channel(self, service_client, channel):
+        service_call_price = int(self.get_price(service_client))
+        amount = channel.reserve_claim(service_call_price)
+        signature = self._get_claim_signature(service_client, channel, amount, service_call_price)
 
         metadata = [
             ("snet-payment-type", "escrow"),
@@ -31,17 +39,41 @@ class PaidCallPaymentStrategy(PaymentStrategy):
 
         return metadata
 
+    def _get_claim_signature(self, service_client, channel, amount, service_call_price):
+        nonce = channel.state["nonce"]
+        if self.pre_signer is None:
+            return self._sign_claim(service_client, channel.channel_id, nonce, amount)
+
+        def sign_claim(claim_nonce, claim_amount):
+            return self._sign_claim(service_client, channel.channel_id, claim_nonce, claim_amount)
+
+        signature = self.pre_signer.get_signature(sign_claim, channel.channel_id, nonce, amount)
+        # The next claims differ only by the amount, so they are signed while
+        # this call is in flight
+        next_amounts = [amount + k * service_call_price for k in range(1, self.pre_signer.depth + 1)]
+        self.pre_signer.presign(sign_claim, channel.channel_id, nonce, next_amounts)
+        return signature
+
+    @staticmethod
+    def _sign_claim(service_client, channel_id, nonce, amount):
+        message = service_client.claim_message_encoder.encode(channel_id, nonce, amount)
+        return service_client.generate_signature(message)
+
     def select_channel(self, service_client):
+        default_expiration = service_client.default_channel_expiration()
+        payment_channel = self._get_ledger_channel(service_client, default_expiration)
+        if payment_channel is not None:
+            self._schedule_top_up(payment_channel, self.get_price(service_client), default_expiration)
+            return payment_channel
+
         account = service_client.account
         service_client.load_open_channels()
-        service_client.update_channel_states()
-        payment_channels = service_client.payment_channels
+        payment_channels = service_client.update_channel_states()
         # picking the first pricing strategy as default for now
         service_call_price = self.get_price(service_client)
-        mpe_balance = account.escrow_balance()
-        default_expiration = service_client.default_channel_expiration()
 
         if len(payment_channels) < 1:
+            mpe_balance = account.escrow_balance()
             if service_call_price > mpe_balance:
                 payment_channel = service_client.deposit_and_open_channel(service_call_price,
                                                                           default_expiration + self.block_offset)
@@ -53,6 +85,97 @@ class PaidCallPaymentStrategy(PaymentStrategy):
         else:
             payment_channel = payment_channels[0]
 
+        self._top_up_channel(payment_channel, service_call_price, default_expiration)
+
+        return payment_channel
+
+    def lease_channel(self, service_client, payment_channel_pool):
+        # The leased channel is used by this call only, so it is synced and
+        # topped up without touching the channels of the calls in flight
+        default_expiration = service_client.default_channel_expiration()
+        service_call_price = self.get_price(service_client)
+        payment_channel = payment_channel_pool.lease()
+        if payment_channel is None:
+            payment_channel = self._open_pool_channel(service_client, payment_channel_pool,
+                                                      service_call_price, default_expiration)
+        try:
+            if not payment_channel.state_synced:
+                payment_channel.sync_state()
+            if (self._has_sufficient_funds(payment_channel, service_call_price) and
+                    self._is_valid(payment_channel, default_expiration)):
+                self._schedule_top_up(payment_channel, service_call_price, default_expiration)
+            else:
+                self._top_up_channel(payment_channel, service_call_price, default_expiration)
+        except Exception:
+            payment_channel_pool.release(payment_channel.channel_id)
+            raise
+        return payment_channel
+
+    def _open_pool_channel(self, service_client, payment_channel_pool, service_call_price,
+                           default_expiration):
+        try:
+            if service_call_price > service_client.account.escrow_balance():
+                payment_channel = service_client.deposit_and_open_channel(service_call_price,
+                                                                          default_expiration + self.block_offset)
+            else:
+                payment_channel = service_client.open_channel(service_call_price,
+                                                              default_expiration + self.block_offset)
+        except Exception:
+            payment_channel_pool.cancel_opening()
+            raise
+        payment_channel_pool.add(payment_channel)
+        service_client.payment_channels = service_client.payment_channels + [payment_channel]
+        return payment_channel
+
+    def _get_ledger_channel(self, service_client, default_expiration):
+        # The channel state is updated locally after each call, so the chain
+        # and the daemon are asked only on startup, after a rejected call or
+        # when a top-up is due
+        payment_channel = next((channel for channel in service_client.payment_channels
+                                if channel.state_synced), None)
+        if payment_channel is None:
+            return None
+        if (self._has_sufficient_funds(payment_channel, self.get_price(service_client)) and
+                self._is_valid(payment_channel, default_expiration)):
+            return payment_channel
+        return None
+
+    def record_call_result(self, service_client, payment_metadata, code):
+        metadata = dict(payment_metadata)
+        if metadata.get("snet-payment-type") != "escrow":
+            return
+        channel_id = int(metadata["snet-payment-channel-id"])
+        payment_channel_pool = getattr(service_client, "payment_channel_pool", None)
+        payment_channels = service_client.payment_channels
+        if payment_channel_pool is not None:
+            payment_channels = payment_channel_pool.channels
+        for payment_channel in payment_channels:
+            if payment_channel.channel_id == channel_id:
+                if code == grpc.StatusCode.OK:
+                    payment_channel.record_claim(int(metadata["snet-payment-channel-amount"]))
+                else:
+                    payment_channel.invalidate_state(claim_failed=True)
+        if payment_channel_pool is not None:
+            # The state is recorded before the channel is leased again
+            payment_channel_pool.release(channel_id)
+
+    def _schedule_top_up(self, payment_channel, service_call_price, default_expiration):
+        # With a funding manager the channel is topped up in the background
+        # before it runs short
+        if self.funding_manager is not None:
+            self.funding_manager.schedule_top_up(payment_channel, service_call_price, default_expiration,
+                                                 self.block_offset, self.call_allowance)
+
+    def _top_up_channel(self, payment_channel, service_call_price, default_expiration):
+        if self.funding_manager is not None:
+            self.funding_manager.top_up(payment_channel, service_call_price, default_expiration,
+                                        self.block_offset, self.call_allowance)
+            return
+        if (self._has_sufficient_funds(payment_channel, service_call_price) and
+                self._is_valid(payment_channel, default_expiration)):
+            return
+        # The funding transaction changes the channel on chain
+        payment_channel.invalidate_state()
         if self._has_sufficient_funds(payment_channel, service_call_price) and not self._is_valid(payment_channel,
                                                                                                   default_expiration):
             payment_channel.extend_expiration(default_expiration + self.block_offset)
@@ -64,8 +187,6 @@ class PaidCallPaymentStrategy(PaymentStrategy):
             payment_channel.extend_and_add_funds(default_expiration + self.block_offset,
                                                  service_call_price * self.call_allowance)
 
-        return payment_channel
-
     @staticmethod
     def _has_sufficient_funds(channel, amount):
         return channel.state["available_amount"] >= amount
@@ -5,3 +5,6 @@ class PaymentStrategy(object):
 
     def get_price(self, service_client):
         pass
+
+    def record_call_result(self, service_client, payment_metadata, code):
+        pass
@@ -1,13 +1,24 @@
+import threading
+
 from snet.sdk.concurrency_manager import ConcurrencyManager
 from snet.sdk.payment_strategies.payment_strategy import PaymentStrategy
 
 
 class PrePaidPaymentStrategy(PaymentStrategy):
 
-    def __init__(self, concurrent_calls: int=1, block_offset: int = 240, call_allowance: int = 1):
-        self.concurrency_manager = ConcurrencyManager(concurrent_calls)
+    def __init__(self, concurrent_calls: int=1, block_offset: int = 240, call_allowance: int = 1,
+                 funding_manager=None, token_renewal_threshold: float | None = None,
+                 target_renewal_interval: float | None = None, min_concurrent_calls: int = 1,
+                 max_concurrent_calls: int | None = None):
+        self.concurrency_manager = ConcurrencyManager(concurrent_calls, token_renewal_threshold,
+                                                      target_renewal_interval, min_concurrent_calls,
+                                                      max_concurrent_calls)
         self.block_offset = block_offset
         self.call_allowance = call_allowance
+        self.funding_manager = funding_manager
+        self.__channel = None
+        # One thread at a time selects the channel and renews the token
+        self.__channel_lock = threading.Lock()
 
     def get_price(self, service_client):
         return service_client.get_price() * self.concurrency_manager.concurrent_calls
@@ -16,8 +27,7 @@ class PrePaidPaymentStrategy(PaymentStrategy):
         self.concurrency_manager.concurrent_calls = concurrent_calls
 
     def get_payment_metadata(self, service_client):
-        channel = self.select_channel(service_client)
-        token = self.concurrency_manager.get_token(service_client, channel, self.get_price(service_client))
+        token, channel = self.get_concurrency_token_and_channel(service_client)
         metadata = [
             ("snet-payment-type", "prepaid-call"),
             ("snet-payment-channel-id", str(channel.channel_id)),
@@ -27,15 +37,35 @@ class PrePaidPaymentStrategy(PaymentStrategy):
         return metadata
 
     def get_concurrency_token_and_channel(self, service_client):
-        channel = self.select_channel(service_client)
-        token = self.concurrency_manager.get_token(service_client, channel, self.get_price(service_client))
+        token_and_channel = self.__reserve_call(service_client)
+        if token_and_channel is not None:
+            return token_and_channel
+        with self.__channel_lock:
+            # The token may have been renewed while this thread waited
+            token_and_channel = self.__reserve_call(service_client)
+            if token_and_channel is not None:
+                return token_and_channel
+            channel = self.select_channel(service_client)
+            token = self.concurrency_manager.get_token(service_client, channel, self.get_price(service_client))
+            self.__channel = channel
+        return token, channel
+
+    def __reserve_call(self, service_client):
+        # While the token covers the call, the channel is not selected again,
+        # so the calls don't wait for the chain and the daemon
+        channel = self.__channel
+        if channel is None:
+            return None
+        token = self.concurrency_manager.reserve_call(service_client.get_price())
+        if token is None:
+            return None
+        self.concurrency_manager.schedule_prefetch(service_client, channel, self.get_price(service_client))
         return token, channel
 
     def select_channel(self, service_client):
         account = service_client.account
         service_client.load_open_channels()
-        service_client.update_channel_states()
-        payment_channels = service_client.payment_channels
+        payment_channels = service_client.update_channel_states()
         service_call_price = self.get_price(service_client)
         extend_channel_fund = service_call_price * self.call_allowance
         mpe_balance = account.escrow_balance()
@@ -48,9 +78,16 @@ class PrePaidPaymentStrategy(PaymentStrategy):
             else:
                 payment_channel = service_client.open_channel(service_call_price,
                                                               default_expiration + self.block_offset)
+            service_client.payment_channels = service_client.payment_channels + [payment_channel]
+            service_client.update_channel_states()
         else:
             payment_channel = payment_channels[0]
 
+        if self.funding_manager is not None:
+            self.funding_manager.top_up(payment_channel, service_call_price, default_expiration,
+                                        self.block_offset, self.call_allowance)
+            return payment_channel
+
         if self.__has_sufficient_funds(payment_channel, service_call_price) \
                 and not self.__is_valid(payment_channel, default_expiration):
             payment_channel.extend_expiration(default_expiration + self.block_offset)
@@ -1,5 +1,3 @@
-import web3
-
 from snet.sdk.payment_strategies.paidcall_payment_strategy import PaidCallPaymentStrategy
 
 
@@ -26,12 +24,8 @@ class TrainingPaymentStrategy(PaidCallPaymentStrategy):
     def get_payment_metadata(self, service_client) -> list[tuple[str, str]]:
         channel = self.select_channel(service_client)
         amount = channel.state["last_signed_amount"] + int(self.get_price(service_client))
-        message = web3.Web3.solidity_keccak(
-            ["string", "address", "uint256", "uint256", "uint256"],
-            ["__MPE_claim_message", service_client.mpe_address, channel.channel_id,
-             channel.state["nonce"],
-             amount]
-        )
+        message = service_client.claim_message_encoder.encode(channel.channel_id,
+                                                              channel.state["nonce"], amount)
         signature = service_client.generate_signature(message)
 
         metadata = [
@@ -42,5 +36,8 @@ class TrainingPaymentStrategy(PaidCallPaymentStrategy):
             ("snet-train-model-id", self.get_model_id()),
             ("snet-payment-channel-signature-bin", signature)
         ]
+        # The result of a training call is not reported back, so the channel
+        # state is synced again before the next paid call
+        channel.invalidate_state()
 
         return metadata
@@ -0,0 +1,55 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+import threading
+
+
+class PreSigner:
+    def __init__(self, depth: int = 4, max_workers: int = 1):
+        self.depth = depth
+        # The signatures are made while the request thread waits for the
+        # daemon, so threads are enough and the key never leaves the process
+        self.__executor = ThreadPoolExecutor(max_workers=max_workers,
+                                             thread_name_prefix="snet-pre-signer")
+        self.__signatures: dict[int, tuple[int, dict[int, Future]]] = {}
+        self.__lock = threading.Lock()
+        self.__closed = False
+
+    def get_signature(self, sign_func: callable, channel_id: int, nonce: int,
+                      amount: int) -> bytes:
+        with self.__lock:
+            signatures = self.__get_channel_signatures(channel_id, nonce)
+            future = signatures.pop(amount, None)
+            # The claims below the signed amount won't be needed anymore
+            for stale_amount in [a for a in signatures if a < amount]:
+                signatures.pop(stale_amount).cancel()
+        if future is not None and not future.cancelled():
+            try:
+                return future.result()
+            except Exception:
+                pass
+        return sign_func(nonce, amount)
+
+    def presign(self, sign_func: callable, channel_id: int, nonce: int,
+                amounts: list[int]) -> None:
+        with self.__lock:
+            if self.__closed:
+                return
+            signatures = self.__get_channel_signatures(channel_id, nonce)
+            for amount in amounts:
+                if amount not in signatures:
+                    signatures[amount] = self.__executor.submit(sign_func, nonce, amount)
+
+    def __get_channel_signatures(self, channel_id: int, nonce: int) -> dict[int, Future]:
+        channel_nonce, signatures = self.__signatures.get(channel_id, (None, {}))
+        if channel_nonce != nonce:
+            # The claims signed for another nonce are useless
+            for future in signatures.values():
+                future.cancel()
+            signatures = {}
+            self.__signatures[channel_id] = (nonce, signatures)
+        return signatures
+
+    def close(self, wait: bool = False) -> None:
+        # The claims are signed inline once the pre-signer is closed
+        with self.__lock:
+            self.__closed = True
+        self.__executor.shutdown(wait=wait, cancel_futures=not wait)
@@ -1,22 +1,32 @@
 import base64
+import collections
+from concurrent.futures import ThreadPoolExecutor
 import importlib
 import re
 import os
+import queue
+import threading
+import time
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterable, Iterator
 
 from eth_typing import BlockNumber
 import grpc
+from google.protobuf import message_factory
 from hexbytes import HexBytes
 import web3
-from eth_account.messages import defunct_hash_message
-from rfc3986 import urlparse
 
 from snet.sdk import generic_client_interceptor, FreeCallPaymentStrategy
 from snet.sdk.account import Account
+from snet.sdk.block_clock import BlockClock
+from snet.sdk.channel_pool import ChannelPool, LatencyTracker, ROUND_ROBIN
+from snet.sdk.mpe.claim_message import ClaimMessageEncoder
 from snet.sdk.mpe.mpe_contract import MPEContract
 from snet.sdk.mpe.payment_channel import PaymentChannel
+from snet.sdk.mpe.payment_channel_pool import DEFAULT_LEASE_TIMEOUT, PaymentChannelPool
 from snet.sdk.mpe.payment_channel_provider import PaymentChannelProvider
+from snet.sdk.payment_strategies.default_payment_strategy import DefaultPaymentStrategy
+from snet.sdk.payment_strategies.paidcall_payment_strategy import PaidCallPaymentStrategy
 from snet.sdk.payment_strategies.prepaid_payment_strategy import PrePaidPaymentStrategy
 from snet.sdk.resources.root_certificate import certificate
 from snet.sdk.storage_provider.service_metadata import MPEServiceMetadata
@@ -25,7 +35,90 @@ from snet.sdk.utils.utils import (RESOURCES_PATH, add_to_path,
                                   find_file_by_keyword)
 from snet.sdk.training.training import Training
 from snet.sdk.training.exceptions import NoTrainingException
-from snet.sdk.utils.call_utils import create_intercept_call_func
+from snet.sdk.utils.call_utils import (create_intercept_call_func,
+                                       get_grpc_channel_options,
+                                       get_grpc_compression,
+                                       parse_grpc_endpoint)
+
+
+RpcMethod = collections.namedtuple(
+    'RpcMethod',
+    ('method', 'request_class', 'client_streaming', 'server_streaming')
+)
+RpcDescriptor = collections.namedtuple(
+    'RpcDescriptor',
+    ('service_name', 'request_class', 'response_class',
+     'client_streaming', 'server_streaming')
+)
+
+
+def build_rpc_descriptors(pb2_module: Any) -> dict[str, RpcDescriptor]:
+    rpc_descriptors = {}
+    file_descriptor = getattr(pb2_module, "DESCRIPTOR", None)
+    if file_descriptor is None:
+        return rpc_descriptors
+    for service in file_descriptor.services_by_name.values():
+        for method in service.methods:
+            rpc_descriptors.setdefault(method.name, RpcDescriptor(
+                service.name,
+                message_factory.GetMessageClass(method.input_type),
+                message_factory.GetMessageClass(method.output_type),
+                method.client_streaming,
+                method.server_streaming
+            ))
+    return rpc_descriptors
+
+
+def build_rpc_index(
+    service_stubs: list[ServiceStub],
+    grpc_channel: Any,
+    rpc_descriptors: dict[str, RpcDescriptor]
+) -> tuple[list[Any], dict[str, RpcMethod]]:
+    grpc_stubs = [service_stub(grpc_channel) for service_stub in service_stubs]
+    rpc_index = {}
+    for grpc_stub in grpc_stubs:
+        for rpc_name, method in vars(grpc_stub).items():
+            if rpc_name in rpc_index:
+                continue
+            rpc_descriptor = rpc_descriptors.get(rpc_name)
+            if rpc_descriptor is None:
+                rpc_index[rpc_name] = RpcMethod(method, None, False, False)
+            else:
+                rpc_index[rpc_name] = RpcMethod(
+                    method,
+                    rpc_descriptor.request_class,
+                    rpc_descriptor.client_streaming,
+                    rpc_descriptor.server_streaming
+                )
+    return grpc_stubs, rpc_index
+
+
+def get_group_endpoints(options: dict, service_metadata: MPEServiceMetadata,
+                        group_name: str) -> list[str]:
+    group_endpoints = options.get("group_endpoints", {}).get(group_name, None)
+    if group_endpoints is not None:
+        if isinstance(group_endpoints, str):
+            return [group_endpoints]
+        return list(group_endpoints)
+    endpoint = options.get("endpoint", None)
+    if endpoint is not None:
+        return [endpoint]
+    return list(service_metadata.get_all_endpoints_for_group(group_name))
+
+
+def resolve_request_class(rpc_name: str, rpc_method: RpcMethod,
+                          message_class: str | None,
+                          pb2_module: Any) -> RpcMethod:
+    request_class = rpc_method.request_class
+    if message_class is not None and (request_class is None or
+                                      request_class.__name__ != message_class):
+        return rpc_method._replace(
+            request_class=getattr(pb2_module, message_class)
+        )
+    if request_class is None:
+        raise Exception(f"Request message class for {rpc_name} not found, "
+                        f"please pass message_class explicitly")
+    return rpc_method
 
 
 class ServiceClient:
@@ -44,7 +137,8 @@ class ServiceClient:
         pb2_module: ModuleName,
         payment_channel_provider: PaymentChannelProvider,
         path_to_pb_files: Path,
-        training_added: bool = False
+        training_added: bool = False,
+        block_clock: BlockClock = None
     ):
         self.org_id = org_id
         self.service_id = service_id
@@ -53,78 +147,292 @@ class ServiceClient:
         self.payment_strategy = payment_strategy
         if isinstance(payment_strategy, PrePaidPaymentStrategy):
             self.payment_strategy.set_concurrent_calls(options["concurrent_calls"])
+        if options.get("channel_sync_workers", 8) < 1:
+            raise ValueError("channel_sync_workers must be a positive number")
         self.options = options
+        self.mpe_contract = mpe_contract
         self.mpe_address = mpe_contract.contract.address
+        self.__claim_message_encoder = None
         self.account = account
         self.sdk_web3 = sdk_web3
+        self.block_clock = block_clock
         self.pb2_module = (importlib.import_module(pb2_module)
                                 if isinstance(pb2_module, str)
                                 else pb2_module)
+        self.__rpc_descriptors = self._build_rpc_descriptors()
         self.payment_channel_provider = payment_channel_provider
         self.path_to_pb_files = path_to_pb_files
 
         self.expiry_threshold: int = self.group["payment"]["payment_expiration_threshold"]
-        self.__base_grpc_channel = self._get_grpc_channel()
-        _intercept_call_func = create_intercept_call_func(self.payment_strategy.get_payment_metadata, self)
-        self.grpc_channel = grpc.intercept_channel(
-            self.__base_grpc_channel,
-            generic_client_interceptor.create(_intercept_call_func)
+        _intercept_call_func = create_intercept_call_func(
+            self.payment_strategy.get_payment_metadata, self,
+            getattr(self.payment_strategy, "record_call_result", None)
+        )
+        self.channel_pool = ChannelPool(
+            self._get_endpoints(),
+            self._get_grpc_channel,
+            generic_client_interceptor.create(_intercept_call_func),
+            self.options.get("load_balancing", ROUND_ROBIN),
+            self.options.get("connections_per_endpoint", 1)
         )
+        health_check_interval = self.options.get("health_check_interval", 10)
+        if len(self.channel_pool.endpoints) > 1 and health_check_interval > 0:
+            self.channel_pool.start_health_checks(
+                health_check_interval,
+                self.options.get("health_check_timeout", 1)
+            )
+        self.__base_grpc_channel = self.channel_pool.base_channel
+        self.grpc_channel = self.channel_pool.channel
         self.service_stubs = service_stubs
+        self.__grpc_stubs: list[Any] = []
+        self.__rpc_index: dict[str, RpcMethod] = {}
+        self.__rpc_index_channel: grpc.Channel | None = None
+        self.__latency_trackers: dict[str, LatencyTracker] = {}
+        self.hedged_attempts: int = 0
+        self.__hedging_lock = threading.Lock()
         self.payment_channel_state_service_client = self._generate_payment_channel_state_service_client()
         self.payment_channels = []
         self.last_read_block: int = 0
+        self.payment_channel_pool = None
+        if self.options.get("payment_channel_pool_size") is not None:
+            self.payment_channel_pool = PaymentChannelPool(
+                self.options["payment_channel_pool_size"],
+                self._load_usable_channels,
+                self.options.get("payment_channel_lease_timeout", DEFAULT_LEASE_TIMEOUT)
+            )
         self.__training = Training(self, training_added)
+        if self.options.get("warmup", False):
+            self.warmup(self.options.get("warmup_timeout", 10))
+
+    def call_rpc(self, rpc_name: str, message_class: str = None,
+                 hedge: bool = False, **kwargs) -> Any:
+        rpc_method = self._get_rpc_method(rpc_name, message_class)
+        request = self._make_request(rpc_method, kwargs)
+        if rpc_method.client_streaming:
+            return rpc_method.method(iter((request,)))
+        if rpc_method.server_streaming:
+            return rpc_method.method(request)
+        latency_tracker = self.__latency_trackers.get(rpc_name)
+        if latency_tracker is None:
+            latency_tracker = LatencyTracker()
+            self.__latency_trackers[rpc_name] = latency_tracker
+        start_time = time.perf_counter()
+        if hedge:
+            self._check_hedging()
+            response, charged_attempts = rpc_method.method.hedge(
+                request, self._get_hedge_delay(latency_tracker)
+            )
+            with self.__hedging_lock:
+                self.hedged_attempts += charged_attempts - 1
+        else:
+            response = rpc_method.method(request)
+        latency_tracker.record(time.perf_counter() - start_time)
+        return response
+
+    def _get_hedge_delay(self, latency_tracker: LatencyTracker) -> float:
+        # Until enough latencies are collected the configured delay is used
+        if len(latency_tracker) < self.options.get("hedge_min_samples", 20):
+            return self.options.get("hedge_delay", 0.1)
+        return latency_tracker.percentile(
+            self.options.get("hedge_delay_percentile", 95)
+        )
 
-    def call_rpc(self, rpc_name: str, message_class: str, **kwargs) -> Any:
-        service = self._get_service_stub(rpc_name)
+    def _check_hedging(self) -> None:
+        # The duplicate of an escrow call must sign a claim of its own, so it
+        # needs a payment channel leased from the pool
+        escrow = (isinstance(self.payment_strategy, PaidCallPaymentStrategy) or
+                  (isinstance(self.payment_strategy, DefaultPaymentStrategy) and
+                   not self.get_concurrency_flag()))
+        if escrow and self.payment_channel_pool is None:
+            raise ValueError("Escrow calls can be hedged only with a payment channel pool "
+                             "(the payment_channel_pool_size option); use the prepaid "
+                             "or free-call payment strategy otherwise")
+
+    def get_hedging_spend(self) -> int:
+        with self.__hedging_lock:
+            return self.hedged_attempts * self.get_price()
+
+    def call_stream_rpc(self, rpc_name: str, requests: Iterable[dict],
+                        message_class: str = None) -> Any:
+        rpc_method = self._get_rpc_method(rpc_name, message_class)
+        if not rpc_method.client_streaming:
+            raise Exception(f"{rpc_name} is not a client streaming method")
+        request_iterator = (self._make_request(rpc_method, kwargs)
+                            for kwargs in requests)
+        return rpc_method.method(request_iterator)
+
+    def map_rpc(self, rpc_name: str, requests: Iterable[dict],
+                max_in_flight: int = 16, ordered: bool = True,
+                message_class: str = None) -> Iterator[Any]:
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be a positive number")
+        rpc_method = self._get_rpc_method(rpc_name, message_class)
+        if rpc_method.client_streaming or rpc_method.server_streaming:
+            raise Exception(f"{rpc_name} is not a unary method")
+        if ordered:
+            return self._map_rpc_ordered(rpc_method, requests, max_in_flight)
+        return self._map_rpc_unordered(rpc_method, requests, max_in_flight)
+
+    def _map_rpc_ordered(self, rpc_method: RpcMethod, requests: Iterable[dict],
+                         max_in_flight: int) -> Iterator[Any]:
+        in_flight = collections.deque()
+        try:
+            for kwargs in requests:
+                if len(in_flight) >= max_in_flight:
+                    yield in_flight.popleft().result()
+                request = self._make_request(rpc_method, kwargs)
+                in_flight.append(rpc_method.method.future(request))
+            while in_flight:
+                yield in_flight.popleft().result()
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+    def _map_rpc_unordered(self, rpc_method: RpcMethod, requests: Iterable[dict],
+                           max_in_flight: int) -> Iterator[Any]:
+        completed = queue.SimpleQueue()
+        in_flight = set()
+        try:
+            for kwargs in requests:
+                if len(in_flight) >= max_in_flight:
+                    future = completed.get()
+                    in_flight.discard(future)
+                    yield future.result()
+                request = self._make_request(rpc_method, kwargs)
+                future = rpc_method.method.future(request)
+                in_flight.add(future)
+                future.add_done_callback(completed.put)
+            while in_flight:
+                future = completed.get()
+                in_flight.discard(future)
+                yield future.result()
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+    def _make_request(self, rpc_method: RpcMethod, kwargs: dict) -> Any:
         if "model_id" in kwargs:
             kwargs["model_id"] = self._get_training_model_id(kwargs["model_id"])
-        rpc_method = getattr(service, rpc_name)
-        request = getattr(self.pb2_module, message_class)(**kwargs)
-        return rpc_method(request)
+        return rpc_method.request_class(**kwargs)
 
     def _get_payment_expiration_threshold_for_group(self):
         pass
 
+    def _build_rpc_descriptors(self) -> dict[str, RpcDescriptor]:
+        return build_rpc_descriptors(self.pb2_module)
+
+    def get_rpc_descriptors(self) -> dict[str, RpcDescriptor]:
+        return self.__rpc_descriptors
+
+    def _get_rpc_method(self, rpc_name: str,
+                        message_class: str = None) -> RpcMethod:
+        self._ensure_rpc_index()
+        rpc_method = self.__rpc_index.get(rpc_name)
+        if rpc_method is None:
+            raise Exception(f"Service stub for {rpc_name} not found")
+        resolved_rpc_method = resolve_request_class(rpc_name, rpc_method,
+                                                    message_class,
+                                                    self.pb2_module)
+        if resolved_rpc_method is not rpc_method:
+            # Resolved once per rpc and kept in the index for the next calls
+            self.__rpc_index[rpc_name] = resolved_rpc_method
+        return resolved_rpc_method
+
+    def _ensure_rpc_index(self) -> None:
+        # Stubs are bound to a channel, so they are only rebuilt when the
+        # channel used for service calls changes
+        grpc_channel = self._get_call_channel()
+        if grpc_channel is self.__rpc_index_channel:
+            return
+        grpc_stubs, rpc_index = build_rpc_index(self.service_stubs,
+                                                grpc_channel,
+                                                self.__rpc_descriptors)
+        self.__grpc_stubs = grpc_stubs
+        self.__rpc_index = rpc_index
+        self.__rpc_index_channel = grpc_channel
+
     def _get_service_stub(self, rpc_name: str) -> Any:
-        for service_stub in self.service_stubs:
-            grpc_stub = self._generate_grpc_stub(service_stub)
+        self._ensure_rpc_index()
+        for grpc_stub in self.__grpc_stubs:
             if hasattr(grpc_stub, rpc_name):
                 return grpc_stub
         raise Exception(f"Service stub for {rpc_name} not found")
 
-    def _generate_grpc_stub(self, service_stub: ServiceStub) -> Any:
-        grpc_channel = self.__base_grpc_channel
+    def _get_call_channel(self) -> grpc.Channel:
         disable_blockchain_operations: bool = self.options.get(
             "disable_blockchain_operations",
             False
         )
-        if not disable_blockchain_operations:
-            grpc_channel = self.grpc_channel
-        stub_instance = service_stub(grpc_channel)
-        return stub_instance
+        if disable_blockchain_operations:
+            return self.__base_grpc_channel
+        return self.grpc_channel
+
+    def _generate_grpc_stub(self, service_stub: ServiceStub) -> Any:
+        return service_stub(self._get_call_channel())
+
+    def warmup(self, timeout: float = 10) -> None:
+        # The connections and the state the first call needs are prepared in
+        # parallel, so the first call has the latency of the next ones
+        tasks = {}
+        with ThreadPoolExecutor() as executor:
+            for pooled_endpoint in self.channel_pool.endpoints:
+                channel_ready_future = grpc.channel_ready_future(
+                    pooled_endpoint.base_channel
+                )
+                tasks[f"connection to {pooled_endpoint.endpoint}"] = \
+                    executor.submit(channel_ready_future.result, timeout)
+            tasks["block number"] = executor.submit(self.get_current_block_number)
+            free_call_payment_strategy = self._get_free_call_payment_strategy()
+            if free_call_payment_strategy is not None:
+                tasks["free call token"] = executor.submit(
+                    free_call_payment_strategy.update_free_call_token, self
+                )
+            if (not isinstance(self.payment_strategy, FreeCallPaymentStrategy) and
+                    not self.options.get("disable_blockchain_operations", False)):
+                tasks["payment channel state"] = executor.submit(
+                    self._warmup_payment_channels
+                )
+        for name, task in tasks.items():
+            try:
+                task.result()
+            except Exception as e:
+                print(f"Warning: warmup of {name} failed: {e!r}")
+
+    def _get_free_call_payment_strategy(self) -> FreeCallPaymentStrategy | None:
+        if isinstance(self.payment_strategy, FreeCallPaymentStrategy):
+            return self.payment_strategy
+        if isinstance(self.payment_strategy, DefaultPaymentStrategy):
+            return self.payment_strategy.free_call_payment_strategy
+        return None
+
+    def _warmup_payment_channels(self) -> None:
+        self.load_open_channels()
+        self.update_channel_states()
+
+    def close(self) -> None:
+        self.channel_pool.close()
 
     def get_grpc_base_channel(self) -> grpc.Channel:
         return self.__base_grpc_channel
 
-    def _get_grpc_channel(self) -> grpc.Channel:
-        endpoint = self.options.get("endpoint", None)
-        if endpoint is None:
-            endpoint = self.service_metadata.get_all_endpoints_for_group(self.group["group_name"])[0]
-        endpoint_object = urlparse(endpoint)
-        if endpoint_object.port is not None:
-            channel_endpoint = endpoint_object.hostname + ":" + str(endpoint_object.port)
-        else:
-            channel_endpoint = endpoint_object.hostname
+    def _get_endpoints(self) -> list[str]:
+        return get_group_endpoints(self.options, self.service_metadata,
+                                   self.group["group_name"])
 
-        if endpoint_object.scheme == "http":
-            return grpc.insecure_channel(channel_endpoint)
-        elif endpoint_object.scheme == "https":
+    def _get_grpc_channel(self, endpoint: str = None) -> grpc.Channel:
+        if endpoint is None:
+            endpoint = self._get_endpoints()[0]
+        channel_endpoint, is_secure = parse_grpc_endpoint(endpoint)
+        channel_options = get_grpc_channel_options(self.options)
+        compression = get_grpc_compression(self.options)
+        if is_secure:
             return grpc.secure_channel(channel_endpoint,
-                                       grpc.ssl_channel_credentials(root_certificates=certificate))
-        else:
-            raise ValueError('Unsupported scheme in service metadata ("{}")'.format(endpoint_object.scheme))
+                                       grpc.ssl_channel_credentials(root_certificates=certificate),
+                                       options=channel_options,
+                                       compression=compression)
+        return grpc.insecure_channel(channel_endpoint,
+                                     options=channel_options,
+                                     compression=compression)
 
     def _filter_existing_channels_from_new_payment_channels(
         self,
@@ -146,7 +454,7 @@ class ServiceClient:
         return new_channels_to_be_added
 
     def load_open_channels(self) -> list[PaymentChannel]:
-        current_block_number = self.sdk_web3.eth.block_number
+        current_block_number = self.get_current_block_number()
         payment_address = self.group["payment"]["payment_address"]
         group_id = base64.b64decode(str(self.group["group_id"]))
         new_payment_channels = (
@@ -160,17 +468,60 @@ class ServiceClient:
         self.last_read_block = current_block_number
         return self.payment_channels
 
+    def _load_usable_channels(self) -> list[PaymentChannel]:
+        # The pool adopts only the channels that can pay for a call without
+        # a funding transaction on the caller's thread
+        payment_channels = list(self.load_open_channels())
+        if len(payment_channels) == 0:
+            return []
+        channels_blockchain_data = self.mpe_contract.get_channels(
+            [channel.channel_id for channel in payment_channels]
+        )
+        current_block_number = self.get_current_block_number()
+        return [channel for channel, channel_blockchain_data in zip(payment_channels, channels_blockchain_data)
+                if self._is_usable_channel(channel_blockchain_data, current_block_number)]
+
     def get_current_block_number(self) -> BlockNumber:
+        if self.block_clock is not None:
+            return self.block_clock.get_block_number()
         return self.sdk_web3.eth.block_number
 
-    def update_channel_states(self) -> list[PaymentChannel]:
-        for channel in self.payment_channels:
-            channel.sync_state()
-        return self.payment_channels
+    def update_channel_states(self, include_unusable: bool = False) -> list[PaymentChannel]:
+        payment_channels = list(self.payment_channels)
+        if len(payment_channels) == 0:
+            return []
+        # The channel structs are read at once, and the expired and empty
+        # channels are not synced with the daemon unless no other is left
+        channels_blockchain_data = self.mpe_contract.get_channels(
+            [channel.channel_id for channel in payment_channels]
+        )
+        current_block_number = self.get_current_block_number()
+        channels_to_sync = list(zip(payment_channels, channels_blockchain_data))
+        if not include_unusable:
+            usable_channels = [(channel, channel_blockchain_data)
+                               for channel, channel_blockchain_data in channels_to_sync
+                               if self._is_usable_channel(channel_blockchain_data, current_block_number)]
+            if len(usable_channels) > 0:
+                usable_channel_ids = {channel.channel_id for channel, _ in usable_channels}
+                for channel in payment_channels:
+                    if channel.channel_id not in usable_channel_ids:
+                        channel.invalidate_state()
+                channels_to_sync = usable_channels
+        max_workers = min(len(channels_to_sync), self.options.get("channel_sync_workers", 8))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            tasks = [executor.submit(channel.sync_state, channel_blockchain_data, current_block_number)
+                     for channel, channel_blockchain_data in channels_to_sync]
+            for task in tasks:
+                task.result()
+        return [channel for channel, _ in channels_to_sync]
+
+    @staticmethod
+    def _is_usable_channel(channel_blockchain_data, current_block_number: int) -> bool:
+        # nonce, sender, signer, recipient, group_id, value, expiration
+        return channel_blockchain_data[5] > 0 and channel_blockchain_data[6] > current_block_number
 
     def default_channel_expiration(self) -> int:
-        current_block_number = self.sdk_web3.eth.get_block("latest").number
-        return current_block_number + self.expiry_threshold
+        return self.get_current_block_number() + self.expiry_threshold
 
     def _generate_payment_channel_state_service_client(self) -> Any:
         grpc_channel = self.__base_grpc_channel
@@ -198,10 +549,15 @@ class ServiceClient:
     def get_price(self) -> int:
         return self.group["pricing"][0]["price_in_cogs"]
 
+    @property
+    def claim_message_encoder(self) -> ClaimMessageEncoder:
+        # Created on first use, the MPE address doesn't change afterwards
+        if self.__claim_message_encoder is None:
+            self.__claim_message_encoder = ClaimMessageEncoder(self.mpe_address)
+        return self.__claim_message_encoder
+
     def generate_signature(self, message: bytes) -> bytes:
-        return bytes(self.sdk_web3.eth.account._sign_hash(
-            defunct_hash_message(message), self.account.signer_private_key
-        ).signature)
+        return self.account.signer.sign_message(message)
 
     def generate_training_signature(self, text: str, address: str,
                                     block_number: BlockNumber) -> HexBytes:
@@ -210,9 +566,7 @@ class ServiceClient:
             ["string", "address", "uint256"],
             [text, address, block_number]
         )
-        return self.sdk_web3.eth.account._sign_hash(
-            defunct_hash_message(message), self.account.signer_private_key
-        ).signature
+        return HexBytes(self.account.signer.sign_message(message))
 
     def get_service_details(self) -> tuple[str, str, str, str]:
         return (self.org_id,
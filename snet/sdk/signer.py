@@ -0,0 +1,62 @@
+from eth_account.messages import defunct_hash_message
+from eth_keys import keys
+
+try:
+    import coincurve
+except ImportError:
+    coincurve = None
+
+
+class Signer:
+    backend = None
+
+    def __init__(self, private_key: bytes):
+        pass
+
+    def sign_hash(self, message_hash: bytes) -> bytes:
+        pass
+
+    def sign_message(self, message: bytes) -> bytes:
+        # The same signature as eth_account's _sign_hash of the EIP-191
+        # (personal_sign) hash of the message: r || s || v, v is 27 or 28
+        return self.sign_hash(defunct_hash_message(message))
+
+
+class EthKeysSigner(Signer):
+    backend = "eth_keys"
+
+    def __init__(self, private_key: bytes):
+        super().__init__(private_key)
+        self.__private_key = keys.PrivateKey(bytes(private_key))
+
+    def sign_hash(self, message_hash: bytes) -> bytes:
+        signature = self.__private_key.sign_msg_hash(bytes(message_hash))
+        return signature.to_bytes()[:64] + bytes([signature.v + 27])
+
+
+class CoincurveSigner(Signer):
+    backend = "coincurve"
+
+    def __init__(self, private_key: bytes):
+        super().__init__(private_key)
+        if coincurve is None:
+            raise ImportError("The coincurve signing backend requires the coincurve package")
+        self.__private_key = coincurve.PrivateKey(bytes(private_key))
+
+    def sign_hash(self, message_hash: bytes) -> bytes:
+        signature = self.__private_key.sign_recoverable(bytes(message_hash), hasher=None)
+        return signature[:64] + bytes([signature[64] + 27])
+
+
+SIGNERS = {
+    EthKeysSigner.backend: EthKeysSigner,
+    CoincurveSigner.backend: CoincurveSigner,
+}
+
+
+def create_signer(private_key: bytes, backend: str | None = None) -> Signer:
+    if backend is None:
+        backend = CoincurveSigner.backend if coincurve is not None else EthKeysSigner.backend
+    if backend not in SIGNERS:
+        raise ValueError('Unsupported signing backend ("{}")'.format(backend))
+    return SIGNERS[backend](private_key)
@@ -2,20 +2,69 @@ import web3
 from lighthouseweb3 import Lighthouse
 import json
 
+from snet.sdk.multicall import Multicall
 from snet.sdk.utils.ipfs_utils import get_ipfs_client, get_from_ipfs_and_checkhash
 from snet.sdk.utils.utils import bytesuri_to_hash, safe_extract_proto
 from snet.sdk.storage_provider.service_metadata import MPEServiceMetadata, mpe_service_metadata_from_json
 
 class StorageProvider(object):
-    def __init__(self, config, registry_contract):
+    def __init__(self, config, registry_contract, multicall=None):
         self._registry_contract = registry_contract
+        self._multicall = (multicall if multicall is not None
+                           else Multicall(registry_contract.w3))
         self._ipfs_client = get_ipfs_client(config)
         self.lighthouse_client = Lighthouse(config["lighthouse_token"])
 
     def fetch_org_metadata(self,org_id):
+        org_registration = self._get_org_registration(org_id).call()
+        return self._download_org_metadata(org_id, org_registration)
+
+    def fetch_service_metadata(self, org_id: str,
+                               service_id: str) -> MPEServiceMetadata:
+        service_registration = self._get_service_registration(
+            org_id,
+            service_id
+        ).call()
+        return self._download_service_metadata(org_id, service_id,
+                                               service_registration)
+
+    def enhance_service_metadata(self,org_id,service_id):
+        # Both registrations are read from the Registry in one aggregated call
+        service_registration, org_registration = self._multicall.call([
+            self._get_service_registration(org_id, service_id),
+            self._get_org_registration(org_id)
+        ])
+        service_metadata = self._download_service_metadata(
+            org_id,
+            service_id,
+            service_registration
+        )
+        org_metadata = self._download_org_metadata(org_id, org_registration)
+
+        org_group_map = {}
+        for group in org_metadata['groups']:
+            org_group_map[group['group_name']] = group
+
+        for group in service_metadata.m['groups']:
+            # merge service group with org_group
+            group['payment'] = org_group_map[group['group_name']]['payment']
+
+        return service_metadata
+
+    def _get_org_registration(self, org_id):
         org = web3.Web3.to_bytes(text=org_id).ljust(32, b"\0")
+        return self._registry_contract.functions.getOrganizationById(org)
 
-        found, _, org_metadata_uri, _, _, _ = self._registry_contract.functions.getOrganizationById(org).call()
+    def _get_service_registration(self, org_id, service_id):
+        org = web3.Web3.to_bytes(text=org_id).ljust(32, b"\0")
+        service = web3.Web3.to_bytes(text=service_id).ljust(32, b"\0")
+        return self._registry_contract.functions.getServiceRegistrationById(
+            org,
+            service
+        )
+
+    def _download_org_metadata(self, org_id, org_registration):
+        found, _, org_metadata_uri, _, _, _ = org_registration
         if found is not True:
             raise Exception('Organization with org ID "{}" not found '.format(org_id))
 
@@ -29,17 +78,9 @@ class StorageProvider(object):
 
         return org_metadata
 
-    def fetch_service_metadata(self, org_id: str,
-                               service_id: str) -> MPEServiceMetadata:
-        org = web3.Web3.to_bytes(text=org_id).ljust(32, b"\0")
-        service = web3.Web3.to_bytes(text=service_id).ljust(32, b"\0")
-
-        found, _, service_metadata_uri = (
-            self._registry_contract.functions.getServiceRegistrationById(
-                org,
-                service
-            ).call()
-        )
+    def _download_service_metadata(self, org_id, service_id,
+                                   service_registration) -> MPEServiceMetadata:
+        found, _, service_metadata_uri = service_registration
         if found is not True:
             raise Exception(f"No service '{service_id}' "
                             f"found in organization '{org_id}'")
@@ -61,20 +102,6 @@ class StorageProvider(object):
 
         return service_metadata
 
-    def enhance_service_metadata(self,org_id,service_id):
-        service_metadata = self.fetch_service_metadata(org_id, service_id)
-        org_metadata = self.fetch_org_metadata(org_id)
-
-        org_group_map = {}
-        for group in org_metadata['groups']:
-            org_group_map[group['group_name']] = group
-
-        for group in service_metadata.m['groups']:
-            # merge service group with org_group
-            group['payment'] = org_group_map[group['group_name']]['payment']
-
-        return service_metadata
-
     def fetch_and_extract_proto(self, service_api_source, protodir):
         try:
             proto_provider_type, service_api_source = bytesuri_to_hash(service_api_source, to_decode=False)
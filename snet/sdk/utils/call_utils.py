@@ -1,5 +1,9 @@
+import asyncio
 import collections
+from typing import Any
+
 import grpc
+from rfc3986 import urlparse
 
 
 class _ClientCallDetails(
@@ -10,15 +14,113 @@ class _ClientCallDetails(
     pass
 
 
-def create_intercept_call_func(get_metadata_func: callable, service_client) -> callable:
+def create_intercept_call_func(get_metadata_func: callable, service_client,
+                               call_done_func: callable = None) -> callable:
     def intercept_call(client_call_details, request_iterator, request_streaming, response_streaming):
         metadata = []
         if client_call_details.metadata is not None:
             metadata = list(client_call_details.metadata)
-        metadata.extend(get_metadata_func(service_client))
+        payment_metadata = get_metadata_func(service_client)
+        metadata.extend(payment_metadata)
         client_call_details = _ClientCallDetails(
             client_call_details.method, client_call_details.timeout, metadata,
             client_call_details.credentials)
-        return client_call_details, request_iterator, None
+
+        postprocess = None
+        if call_done_func is not None:
+            def postprocess(call):
+                if hasattr(call, "add_done_callback"):
+                    call.add_done_callback(
+                        lambda c: call_done_func(service_client, payment_metadata, c.code())
+                    )
+                return call
+        return client_call_details, request_iterator, postprocess
+
+    return intercept_call
+
+
+def parse_grpc_endpoint(endpoint: str) -> tuple[str, bool]:
+    endpoint_object = urlparse(endpoint)
+    if endpoint_object.scheme == "unix":
+        # gRPC accepts unix domain socket targets as they are
+        return endpoint, False
+
+    if endpoint_object.port is not None:
+        channel_endpoint = endpoint_object.hostname + ":" + str(endpoint_object.port)
+    else:
+        channel_endpoint = endpoint_object.hostname
+
+    if endpoint_object.scheme == "http":
+        return channel_endpoint, False
+    elif endpoint_object.scheme == "https":
+        return channel_endpoint, True
+    else:
+        raise ValueError('Unsupported scheme in service metadata ("{}")'.format(endpoint_object.scheme))
+
+
+CHANNEL_OPTIONS = {
+    "max_send_message_length": "grpc.max_send_message_length",
+    "max_receive_message_length": "grpc.max_receive_message_length",
+    "keepalive_time_ms": "grpc.keepalive_time_ms",
+    "keepalive_timeout_ms": "grpc.keepalive_timeout_ms",
+    "keepalive_permit_without_calls": "grpc.keepalive_permit_without_calls",
+    "http2_max_pings_without_data": "grpc.http2.max_pings_without_data",
+    "http2_lookahead_bytes": "grpc.http2.lookahead_bytes",
+    "http2_bdp_probe": "grpc.http2.bdp_probe",
+    "http2_max_frame_size": "grpc.http2.max_frame_size",
+}
+
+COMPRESSION_ALGORITHMS = {
+    "none": grpc.Compression.NoCompression,
+    "deflate": grpc.Compression.Deflate,
+    "gzip": grpc.Compression.Gzip,
+}
+
+
+def get_grpc_channel_options(options: dict) -> list[tuple[str, Any]]:
+    channel_options = []
+    for option, channel_arg in CHANNEL_OPTIONS.items():
+        value = options.get(option, None)
+        if value is not None:
+            channel_options.append((channel_arg, int(value)))
+    if options.get("connections_per_endpoint", 1) > 1:
+        # Channels to the same target share connections unless each of them
+        # has its own subchannel pool
+        channel_options.append(("grpc.use_local_subchannel_pool", 1))
+    channel_options.extend(options.get("grpc_options", []))
+    return channel_options
+
+
+def get_grpc_compression(options: dict) -> grpc.Compression | None:
+    compression = options.get("compression", None)
+    if compression is None or isinstance(compression, grpc.Compression):
+        return compression
+    if compression not in COMPRESSION_ALGORITHMS:
+        raise ValueError('Unsupported compression algorithm ("{}")'.format(compression))
+    return COMPRESSION_ALGORITHMS[compression]
+
+
+def create_async_intercept_call_func(get_metadata_func: callable, service_client,
+                                     call_done_func: callable = None) -> callable:
+    async def intercept_call(client_call_details, request_streaming, response_streaming):
+        metadata = grpc.aio.Metadata()
+        if client_call_details.metadata is not None:
+            metadata = grpc.aio.Metadata(*client_call_details.metadata)
+        payment_metadata = await get_metadata_func(service_client)
+        for key, value in payment_metadata:
+            metadata.add(key, value)
+        client_call_details = grpc.aio.ClientCallDetails(
+            client_call_details.method, client_call_details.timeout, metadata,
+            client_call_details.credentials, client_call_details.wait_for_ready)
+
+        postprocess = None
+        if call_done_func is not None:
+            def postprocess(call):
+                # The status of a finished grpc.aio call is read with a coroutine
+                async def call_done():
+                    call_done_func(service_client, payment_metadata, await call.code())
+                call.add_done_callback(lambda _: asyncio.ensure_future(call_done()))
+                return call
+        return client_call_details, postprocess
 
     return intercept_call
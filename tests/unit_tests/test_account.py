@@ -1,4 +1,6 @@
+from concurrent import futures
 import os
+import time
 import unittest
 from unittest.mock import MagicMock, patch
 
@@ -82,6 +84,40 @@ class TestAccount(unittest.TestCase):
     #     self.mock_web3.eth.account.sign_transaction.assert_called_once()
     #     self.mock_web3.eth.send_raw_transaction.assert_called_once()
 
+    def test_concurrent_transactions_get_distinct_nonces(self):
+        def get_transaction_count(address):
+            # The transactions are not mined yet
+            time.sleep(0.01)
+            return 0
+
+        self.mock_web3.eth.get_transaction_count.side_effect = get_transaction_count
+        self.mock_web3.net.version = "1"
+        self.mock_web3.eth.gas_price = 1
+        mock_contract_fn = MagicMock()
+        mock_contract_fn.return_value.build_transaction.side_effect = lambda transaction: transaction
+        self.mock_web3.eth.account.sign_transaction.side_effect = \
+            lambda transaction, private_key: MagicMock(raw_transaction=transaction["nonce"])
+        in_flight = []
+
+        def send_raw_transaction(raw_transaction):
+            in_flight.append(raw_transaction)
+            time.sleep(0.01)
+            concurrent_sends.append(len(in_flight))
+            in_flight.remove(raw_transaction)
+            return raw_transaction
+
+        concurrent_sends = []
+        self.mock_web3.eth.send_raw_transaction.side_effect = send_raw_transaction
+        self.mock_web3.to_hex.side_effect = lambda nonce: nonce
+
+        with futures.ThreadPoolExecutor(max_workers=4) as executor:
+            nonces = list(executor.map(lambda _: self.account._send_signed_transaction(mock_contract_fn),
+                                       range(4)))
+
+        self.assertEqual(sorted(nonces), [1, 2, 3, 4])
+        # A nonce is taken only after the previous transaction was sent
+        self.assertEqual(max(concurrent_sends), 1)
+
     def test_parse_receipt_success(self):
         # Mock receipt and event
         mock_receipt = MagicMock()
@@ -0,0 +1,135 @@
+import importlib
+from pathlib import Path
+import unittest
+from unittest.mock import MagicMock
+
+import grpc
+from web3 import Web3
+
+from snet.sdk.account import Account
+from snet.sdk.aio.payment_strategies import (AsyncFreeCallPaymentStrategy,
+                                             AsyncPaymentStrategy)
+from snet.sdk.aio.service_client import AsyncServiceClient
+from snet.sdk.mpe.mpe_contract import MPEContract
+from snet.sdk.mpe.payment_channel_provider import PaymentChannelProvider
+from snet.sdk.signer import create_signer
+from snet.sdk.storage_provider.service_metadata import MPEServiceMetadata
+from snet.sdk.utils.utils import RESOURCES_PATH, add_to_path
+
+with add_to_path(str(RESOURCES_PATH.joinpath("proto"))):
+    state_service_pb2 = importlib.import_module("state_service_pb2")
+    state_service_pb2_grpc = importlib.import_module("state_service_pb2_grpc")
+
+PRIVATE_KEY = bytes.fromhex("11" * 32)
+
+
+class StaticPaymentStrategy(AsyncPaymentStrategy):
+    async def get_payment_metadata(self, service_client):
+        return [("snet-payment-type", "test")]
+
+
+class FakeAsyncEth:
+    def __init__(self, block_number):
+        self._block_number = block_number
+        self.contract = MagicMock()
+
+    @property
+    async def block_number(self):
+        return self._block_number
+
+
+class FakeFreeCallStateService(state_service_pb2_grpc.FreeCallStateServiceServicer):
+    def __init__(self):
+        self.metadata = []
+
+    async def GetFreeCallToken(self, request, context):
+        self.metadata.append(dict(context.invocation_metadata()))
+        return state_service_pb2.FreeCallToken(token=b"token",
+                                               token_expiration_block=1000)
+
+    async def GetFreeCallsAvailable(self, request, context):
+        self.metadata.append(dict(context.invocation_metadata()))
+        return state_service_pb2.FreeCallStateReply(free_calls_available=5)
+
+
+class TestAsyncServiceClient(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.servicer = FakeFreeCallStateService()
+        self.server = grpc.aio.server()
+        state_service_pb2_grpc.add_FreeCallStateServiceServicer_to_server(
+            self.servicer, self.server
+        )
+        port = self.server.add_insecure_port("localhost:0")
+        await self.server.start()
+
+        self.mock_service_metadata = MagicMock(spec=MPEServiceMetadata)
+        self.mock_service_metadata.get_all_endpoints_for_group.return_value = [
+            f"http://localhost:{port}"
+        ]
+        self.mock_group = {
+            'group_id': '/mb90Qs8VktxGQmU0uRu0bSlGgqeDlYrKrs+WbsOvOQ=',
+            'group_name': 'default_group',
+            'pricing': [{'price_in_cogs': 1}],
+            'payment': {
+                'payment_address': '0x0709e9B78756B740ab0C64427f43f8305fD6D1A7',
+                'payment_expiration_threshold': 40320,
+            }
+        }
+        self.mock_mpe_contract = MagicMock(spec=MPEContract)
+        self.mock_mpe_contract.contract = MagicMock()
+        self.mock_account = MagicMock(spec=Account)
+        self.mock_account.signer_private_key = PRIVATE_KEY
+        self.mock_account.signer = create_signer(PRIVATE_KEY)
+        self.mock_account.signer_address = Web3().eth.account.from_key(
+            PRIVATE_KEY
+        ).address
+        self.mock_async_web3 = MagicMock()
+        self.mock_async_web3.eth = FakeAsyncEth(100)
+
+    async def asyncTearDown(self):
+        await self.server.stop(None)
+
+    def _create_client(self, payment_strategy):
+        return AsyncServiceClient(
+            "org_id",
+            "service_id",
+            self.mock_service_metadata,
+            self.mock_group,
+            [state_service_pb2_grpc.FreeCallStateServiceStub],
+            payment_strategy,
+            {"concurrent_calls": 1},
+            self.mock_mpe_contract,
+            self.mock_account,
+            Web3(),
+            self.mock_async_web3,
+            state_service_pb2,
+            MagicMock(spec=PaymentChannelProvider),
+            MagicMock(spec=Path)
+        )
+
+    async def test_call_rpc_adds_payment_metadata(self):
+        async with self._create_client(StaticPaymentStrategy()) as client:
+            response = await client.call_rpc("GetFreeCallToken",
+                                             address="0x1",
+                                             current_block=100)
+
+        self.assertEqual(response.token, b"token")
+        self.assertEqual(self.servicer.metadata[-1]["snet-payment-type"],
+                         "test")
+
+    async def test_call_rpc_with_free_call_strategy(self):
+        async with self._create_client(AsyncFreeCallPaymentStrategy(token_cache_dir=None)) as client:
+            response = await client.call_rpc("GetFreeCallsAvailable",
+                                             address="0x1",
+                                             current_block=100)
+
+        self.assertEqual(response.free_calls_available, 5)
+        call_metadata = self.servicer.metadata[-1]
+        self.assertEqual(call_metadata["snet-payment-type"], "free-call")
+        self.assertEqual(call_metadata["snet-free-call-auth-token-bin"],
+                         b"token")
+        self.assertEqual(call_metadata["snet-current-block-number"], "100")
+
+
+if __name__ == "__main__":
+    unittest.main()
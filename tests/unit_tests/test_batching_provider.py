@@ -0,0 +1,115 @@
+from concurrent import futures
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+import time
+import unittest
+
+import web3
+
+from snet.sdk.batching_provider import BatchingHTTPProvider
+
+ADDRESSES = [web3.Web3.to_checksum_address(f"0x{i:040x}") for i in range(1, 9)]
+
+
+class FakeNode(BaseHTTPRequestHandler):
+    # Answers eth_getBalance with the address and counts the HTTP requests
+    posts = []
+    batches_supported = True
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.posts.append(body)
+        if isinstance(body, list) and not self.batches_supported:
+            reply = {"jsonrpc": "2.0", "id": None,
+                     "error": {"code": -32600, "message": "Batch requests are not supported"}}
+        elif isinstance(body, list):
+            reply = [self.reply(request) for request in body]
+        else:
+            reply = self.reply(body)
+        data = json.dumps(reply).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    @staticmethod
+    def reply(request):
+        result = "0x1"
+        if request["method"] == "eth_getBalance":
+            result = hex(int(request["params"][0], 16))
+        return {"jsonrpc": "2.0", "id": request["id"], "result": result}
+
+    def log_message(self, *args):
+        pass
+
+
+class TestBatchingHTTPProvider(unittest.TestCase):
+    def setUp(self):
+        FakeNode.posts = []
+        FakeNode.batches_supported = True
+        server = ThreadingHTTPServer(("localhost", 0), FakeNode)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.provider = BatchingHTTPProvider(f"http://localhost:{server.server_port}")
+        self.w3 = web3.Web3(self.provider)
+
+    def _get_balances_concurrently(self, window=0.5):
+        # Each thread opens its own block; all of them are open before
+        # the requests are issued
+        barrier = threading.Barrier(len(ADDRESSES))
+
+        def get_balance(address):
+            with self.provider.batch(window=window):
+                barrier.wait()
+                return self.w3.eth.get_balance(address)
+
+        with futures.ThreadPoolExecutor(max_workers=len(ADDRESSES)) as executor:
+            return list(executor.map(get_balance, ADDRESSES))
+
+    def test_requests_are_sent_one_by_one_outside_a_batch(self):
+        balances = [self.w3.eth.get_balance(address) for address in ADDRESSES]
+
+        self.assertEqual(balances, list(range(1, 9)))
+        self.assertEqual(len(FakeNode.posts), len(ADDRESSES))
+
+    def test_requests_within_the_window_are_coalesced(self):
+        balances = self._get_balances_concurrently()
+
+        self.assertEqual(balances, list(range(1, 9)))
+        self.assertEqual(len(FakeNode.posts), 1)
+        self.assertEqual(len(FakeNode.posts[0]), len(ADDRESSES))
+
+    def test_requests_are_sent_one_by_one_if_batches_are_rejected(self):
+        FakeNode.batches_supported = False
+
+        balances = self._get_balances_concurrently()
+        with self.provider.batch(window=0.5):
+            balances.append(self.w3.eth.get_balance(ADDRESSES[0]))
+
+        self.assertEqual(balances, list(range(1, 9)) + [1])
+        self.assertIsInstance(FakeNode.posts[0], list)
+        self.assertTrue(all(isinstance(body, dict) for body in FakeNode.posts[1:]))
+        self.assertEqual(len(FakeNode.posts), len(ADDRESSES) + 2)
+
+    def test_block_applies_to_the_requests_of_its_thread_only(self):
+        with self.provider.batch(window=0.5):
+            with futures.ThreadPoolExecutor(max_workers=len(ADDRESSES)) as executor:
+                balances = list(executor.map(self.w3.eth.get_balance, ADDRESSES))
+
+        self.assertEqual(balances, list(range(1, 9)))
+        self.assertEqual(len(FakeNode.posts), len(ADDRESSES))
+
+    def test_lone_request_does_not_wait_for_the_window(self):
+        start = time.monotonic()
+        with self.provider.batch(window=5):
+            balance = self.w3.eth.get_balance(ADDRESSES[0])
+
+        self.assertEqual(balance, 1)
+        self.assertLess(time.monotonic() - start, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+from unittest.mock import MagicMock, PropertyMock, patch
+
+from snet.sdk.block_clock import BlockClock
+
+
+class TestBlockClock(unittest.TestCase):
+    def setUp(self):
+        self.w3 = MagicMock()
+        self.block_number = PropertyMock(return_value=100)
+        type(self.w3.eth).block_number = self.block_number
+        self.now = 1000.0
+        patcher = patch("snet.sdk.block_clock.time.monotonic",
+                        side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_block_number_is_interpolated(self):
+        clock = BlockClock(self.w3, max_staleness=30, poll_interval=0,
+                           average_block_time=12)
+
+        self.assertEqual(clock.get_block_number(), 100)
+        self.now += 25
+        self.assertEqual(clock.get_block_number(), 102)
+        self.assertEqual(self.block_number.call_count, 1)
+
+    def test_stale_clock_is_refreshed(self):
+        clock = BlockClock(self.w3, max_staleness=30, poll_interval=0,
+                           average_block_time=12)
+        clock.get_block_number()
+
+        self.now += 31
+        self.block_number.return_value = 103
+        self.assertEqual(clock.get_block_number(), 103)
+        self.assertEqual(self.block_number.call_count, 2)
+
+    def test_zero_staleness_always_reads_the_chain(self):
+        clock = BlockClock(self.w3, max_staleness=0, poll_interval=0)
+        clock.get_block_number()
+        self.now += 1
+        clock.get_block_number()
+
+        self.assertEqual(self.block_number.call_count, 2)
+
+    def test_average_block_time_follows_observations(self):
+        clock = BlockClock(self.w3, poll_interval=0, average_block_time=12)
+        clock.observe(100)
+        self.now += 4
+        clock.observe(101)
+        self.now += 4
+        clock.observe(101)
+        # A lagging node doesn't move the clock back
+        clock.observe(99)
+
+        self.assertAlmostEqual(clock.average_block_time, 0.9 * 12 + 0.1 * 4)
+        self.assertEqual(clock.get_cached_block_number(), 101)
+
+
+if __name__ == "__main__":
+    unittest.main()
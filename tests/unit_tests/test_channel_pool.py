@@ -0,0 +1,259 @@
+from concurrent.futures import Future
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+import grpc
+from grpc_health.v1 import health_pb2
+
+from snet.sdk.channel_pool import (ChannelPool, LatencyTracker,
+                                   LEAST_OUTSTANDING_REQUESTS, ROUND_ROBIN)
+
+
+class FakeRpcError(grpc.RpcError):
+    def __init__(self, code):
+        self._code = code
+
+    def code(self):
+        return self._code
+
+
+def create_channel(endpoint):
+    channel = MagicMock(name=endpoint)
+    channel.unary_unary.return_value = MagicMock(
+        side_effect=lambda request: (endpoint, request)
+    )
+    return channel
+
+
+class TestChannelPool(unittest.TestCase):
+    def setUp(self):
+        self.endpoints = ["http://a:1", "http://b:2", "http://c:3"]
+
+    def test_round_robin(self):
+        pool = ChannelPool(self.endpoints, create_channel,
+                           load_balancing=ROUND_ROBIN)
+        rpc_method = pool.base_channel.unary_unary("/Calculator/add")
+
+        served_by = [rpc_method(i)[0] for i in range(6)]
+
+        self.assertEqual(served_by, self.endpoints * 2)
+        for pooled_endpoint in pool.endpoints:
+            self.assertEqual(pooled_endpoint.outstanding_requests, 0)
+
+    def test_least_outstanding_requests(self):
+        pool = ChannelPool(self.endpoints, create_channel,
+                           load_balancing=LEAST_OUTSTANDING_REQUESTS)
+        futures = {}
+
+        def submit(endpoint):
+            def future(request):
+                futures[endpoint] = Future()
+                return futures[endpoint]
+            return future
+
+        for pooled_endpoint in pool.endpoints:
+            pooled_endpoint.base_channel.unary_unary.return_value.future = \
+                submit(pooled_endpoint.endpoint)
+        rpc_method = pool.base_channel.unary_unary("/Calculator/add")
+
+        rpc_method.future(1)
+        rpc_method.future(2)
+        rpc_method.future(3)
+        self.assertEqual(
+            [e.outstanding_requests for e in pool.endpoints], [1, 1, 1]
+        )
+
+        futures["http://b:2"].set_result(None)
+        self.assertEqual(
+            [e.outstanding_requests for e in pool.endpoints], [1, 0, 1]
+        )
+        self.assertEqual(pool.acquire().endpoint, "http://b:2")
+
+    @patch("snet.sdk.channel_pool.grpc.intercept_channel")
+    def test_interceptor_is_applied_per_endpoint(self, mock_intercept_channel):
+        interceptor = MagicMock()
+        mock_intercept_channel.side_effect = lambda channel, _: channel.paid
+        pool = ChannelPool(self.endpoints, create_channel, interceptor)
+
+        for pooled_endpoint in pool.endpoints:
+            mock_intercept_channel.assert_any_call(pooled_endpoint.base_channel,
+                                                   interceptor)
+            self.assertIs(pooled_endpoint.channel,
+                          pooled_endpoint.base_channel.paid)
+
+        pool.channel.unary_unary("/Calculator/add")(1)
+        pool.endpoints[0].channel.unary_unary.assert_called_once()
+        pool.endpoints[0].base_channel.unary_unary.assert_not_called()
+
+    def test_unavailable_endpoint_is_ejected_and_call_retried(self):
+        pool = ChannelPool(self.endpoints, create_channel)
+        dead_endpoint = pool.endpoints[0]
+        dead_endpoint.base_channel.unary_unary.return_value.side_effect = \
+            FakeRpcError(grpc.StatusCode.UNAVAILABLE)
+        rpc_method = pool.base_channel.unary_unary("/Calculator/add")
+
+        served_by = [rpc_method(i)[0] for i in range(4)]
+
+        self.assertNotIn("http://a:1", served_by)
+        self.assertFalse(dead_endpoint.healthy)
+        for pooled_endpoint in pool.endpoints:
+            self.assertEqual(pooled_endpoint.outstanding_requests, 0)
+
+    def test_other_errors_are_not_retried(self):
+        pool = ChannelPool(self.endpoints[:1], create_channel)
+        pool.endpoints[0].base_channel.unary_unary.return_value.side_effect = \
+            FakeRpcError(grpc.StatusCode.INVALID_ARGUMENT)
+        rpc_method = pool.base_channel.unary_unary("/Calculator/add")
+
+        with self.assertRaises(grpc.RpcError):
+            rpc_method(1)
+        self.assertTrue(pool.endpoints[0].healthy)
+
+    def test_health_checks_eject_and_readmit_endpoints(self):
+        pool = ChannelPool(self.endpoints[:2], create_channel)
+        first, second = pool.endpoints
+        first.health_stub = MagicMock()
+        second.health_stub = MagicMock()
+        first.health_stub.Check.return_value = health_pb2.HealthCheckResponse(
+            status=health_pb2.HealthCheckResponse.NOT_SERVING
+        )
+        second.health_stub.Check.side_effect = FakeRpcError(
+            grpc.StatusCode.UNIMPLEMENTED
+        )
+
+        self.assertFalse(pool.check_health(first))
+        self.assertTrue(pool.check_health(second))
+
+        pool.set_healthy(first, False)
+        self.assertEqual({pool.acquire().endpoint for _ in range(4)},
+                         {"http://b:2"})
+
+        first.health_stub.Check.return_value = health_pb2.HealthCheckResponse(
+            status=health_pb2.HealthCheckResponse.SERVING
+        )
+        pool.set_healthy(first, pool.check_health(first))
+        self.assertEqual({pool.acquire().endpoint for _ in range(4)},
+                         {"http://a:1", "http://b:2"})
+
+    def test_health_checks_are_not_started_without_an_interval(self):
+        pool = ChannelPool(self.endpoints[:2], create_channel)
+
+        with patch("snet.sdk.channel_pool.threading.Thread") as mock_thread:
+            pool.start_health_checks(0)
+
+        mock_thread.assert_not_called()
+
+    def test_closed_channel_is_unhealthy(self):
+        pool = ChannelPool(self.endpoints[:2], create_channel)
+        pooled_endpoint = pool.endpoints[0]
+        pooled_endpoint.health_stub = MagicMock()
+        pooled_endpoint.health_stub.Check.side_effect = ValueError("Cannot invoke RPC on closed channel!")
+
+        self.assertFalse(pool.check_health(pooled_endpoint))
+
+    def test_health_check_pass_stops_when_the_pool_is_closed(self):
+        pool = ChannelPool(self.endpoints[:2], create_channel)
+        first, second = pool.endpoints
+        first.health_stub = MagicMock()
+        first.health_stub.Check.side_effect = \
+            lambda request, timeout: pool.close() or health_pb2.HealthCheckResponse()
+        second.health_stub = MagicMock()
+
+        pool._run_health_checks(10, 1)
+
+        second.health_stub.Check.assert_not_called()
+
+    def _set_futures(self, pool, results):
+        futures = {}
+
+        def submit(endpoint):
+            def future(request):
+                futures[endpoint] = Future()
+                if results.get(endpoint) is not None:
+                    futures[endpoint].set_result(results[endpoint])
+                return futures[endpoint]
+            return future
+
+        for pooled_endpoint in pool.endpoints:
+            pooled_endpoint.base_channel.unary_unary.return_value.future = \
+                submit(pooled_endpoint.endpoint)
+        return futures
+
+    def test_hedge_is_sent_to_another_endpoint_after_delay(self):
+        pool = ChannelPool(self.endpoints[:2], create_channel)
+        futures = self._set_futures(pool, {"http://b:2": "b"})
+        rpc_method = pool.base_channel.unary_unary("/Calculator/add")
+
+        response, attempts = rpc_method.hedge(1, delay=0.01)
+
+        self.assertEqual((response, attempts), ("b", 1))
+        self.assertTrue(futures["http://a:1"].cancelled())
+        for pooled_endpoint in pool.endpoints:
+            self.assertEqual(pooled_endpoint.outstanding_requests, 0)
+
+    def test_no_hedge_if_response_arrives_in_time(self):
+        pool = ChannelPool(self.endpoints[:2], create_channel)
+        futures = self._set_futures(pool, {"http://a:1": "a", "http://b:2": "b"})
+        rpc_method = pool.base_channel.unary_unary("/Calculator/add")
+
+        self.assertEqual(rpc_method.hedge(1, delay=1), ("a", 1))
+        self.assertNotIn("http://b:2", futures)
+
+    def test_failed_attempt_waits_for_the_other_one(self):
+        pool = ChannelPool(self.endpoints[:2], create_channel)
+        futures = self._set_futures(pool, {})
+        rpc_method = pool.base_channel.unary_unary("/Calculator/add")
+        pool.endpoints[1].base_channel.unary_unary.return_value.future = \
+            lambda request: self._fail_and_complete(futures["http://a:1"])
+
+        self.assertEqual(rpc_method.hedge(1, delay=0.01), ("a", 1))
+
+    def test_answered_attempts_are_counted(self):
+        pool = ChannelPool(self.endpoints[:2], create_channel)
+        futures = self._set_futures(pool, {})
+        rpc_method = pool.base_channel.unary_unary("/Calculator/add")
+
+        def answer_both(request):
+            futures["http://a:1"].set_result("a")
+            duplicate = Future()
+            duplicate.set_result("b")
+            return duplicate
+
+        pool.endpoints[1].base_channel.unary_unary.return_value.future = answer_both
+
+        self.assertEqual(rpc_method.hedge(1, delay=0.01), ("a", 2))
+
+    @staticmethod
+    def _fail_and_complete(primary):
+        failed = Future()
+        failed.set_exception(FakeRpcError(grpc.StatusCode.FAILED_PRECONDITION))
+        threading.Timer(0.05, primary.set_result, ("a",)).start()
+        return failed
+
+    def test_connections_per_endpoint(self):
+        pool = ChannelPool(self.endpoints[:2], create_channel,
+                           connections_per_endpoint=2)
+        self.assertEqual([e.endpoint for e in pool.endpoints],
+                         ["http://a:1", "http://b:2"] * 2)
+        self.assertEqual(len({id(e.base_channel) for e in pool.endpoints}), 4)
+        futures = self._set_futures(pool, {"http://b:2": "b"})
+        rpc_method = pool.base_channel.unary_unary("/Calculator/add")
+
+        # The duplicate skips the other connection to the slow daemon
+        self.assertEqual(rpc_method.hedge(1, delay=0.01), ("b", 1))
+        self.assertTrue(futures["http://a:1"].cancelled())
+
+    def test_latency_percentile(self):
+        latency_tracker = LatencyTracker(window=100)
+        self.assertIsNone(latency_tracker.percentile(95))
+        for latency in range(200):
+            latency_tracker.record(latency)
+
+        self.assertEqual(len(latency_tracker), 100)
+        self.assertEqual(latency_tracker.percentile(50), 150)
+        self.assertEqual(latency_tracker.percentile(100), 199)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,27 @@
+import unittest
+
+from web3 import Web3
+
+from snet.sdk.mpe.claim_message import ClaimMessageEncoder
+
+MPE_ADDRESS = "0x5e592F9b1d303183d963635f895f0f0C48284f4e"
+
+
+class TestClaimMessageEncoder(unittest.TestCase):
+    def test_encoding_matches_solidity_keccak(self):
+        encoder = ClaimMessageEncoder(MPE_ADDRESS)
+
+        for channel_id, nonce, amount in [(0, 0, 0), (42, 3, 1000), (2 ** 64, 2 ** 32, 2 ** 255)]:
+            expected_message = Web3.solidity_keccak(
+                ["string", "address", "uint256", "uint256", "uint256"],
+                ["__MPE_claim_message", MPE_ADDRESS, channel_id, nonce, amount]
+            )
+            self.assertEqual(encoder.encode(channel_id, nonce, amount), bytes(expected_message))
+
+    def test_invalid_mpe_address(self):
+        with self.assertRaises(ValueError):
+            ClaimMessageEncoder("0x1234")
+
+
+if __name__ == "__main__":
+    unittest.main()
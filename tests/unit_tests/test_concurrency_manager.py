@@ -0,0 +1,242 @@
+import asyncio
+from concurrent import futures
+import importlib
+import threading
+import time
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import grpc
+
+from snet.sdk.aio.payment_strategies import AsyncConcurrencyManager
+from snet.sdk.concurrency_manager import ConcurrencyManager
+from snet.sdk.mpe.claim_message import ClaimMessageEncoder
+from snet.sdk.mpe.payment_channel import PaymentChannel
+from snet.sdk.payment_strategies.default_payment_strategy import DefaultPaymentStrategy
+from snet.sdk.payment_strategies.prepaid_payment_strategy import PrePaidPaymentStrategy
+from snet.sdk.utils.utils import RESOURCES_PATH, add_to_path
+
+with add_to_path(str(RESOURCES_PATH.joinpath("proto"))):
+    token_service_pb2 = importlib.import_module("token_service_pb2")
+    token_service_pb2_grpc = importlib.import_module("token_service_pb2_grpc")
+
+PRICE = 10
+CONCURRENT_CALLS = 5
+CALLS = 400
+
+
+class FakeDaemon(token_service_pb2_grpc.TokenServiceServicer):
+    # Issues a token for the planned amount and charges the calls made with it
+    def __init__(self):
+        self.planned_amount = 0
+        self.used_amount = 0
+        self.token_requests = 0
+        self.overdrawn_calls = 0
+        self.lock = threading.Lock()
+
+    def GetToken(self, request, context):
+        with self.lock:
+            self.token_requests += 1
+            if request.signed_amount > self.planned_amount:
+                self.planned_amount = request.signed_amount
+            return token_service_pb2.TokenReply(
+                channel_id=request.channel_id, token=f"token-{self.planned_amount}",
+                planned_amount=self.planned_amount, used_amount=self.used_amount
+            )
+
+    def call(self, token):
+        with self.lock:
+            planned_amount = int(token.split("-")[1])
+            if self.used_amount + PRICE > planned_amount:
+                self.overdrawn_calls += 1
+            self.used_amount += PRICE
+
+
+class TestConcurrencyManager(unittest.TestCase):
+    def setUp(self):
+        self.daemon = FakeDaemon()
+        server = grpc.server(futures.ThreadPoolExecutor(max_workers=4))
+        token_service_pb2_grpc.add_TokenServiceServicer_to_server(self.daemon, server)
+        port = server.add_insecure_port("localhost:0")
+        server.start()
+        self.addCleanup(server.stop, None)
+        grpc_channel = grpc.insecure_channel(f"localhost:{port}")
+        self.addCleanup(grpc_channel.close)
+
+        self.service_client = MagicMock()
+        self.service_client.get_grpc_base_channel.return_value = grpc_channel
+        self.service_client.get_current_block_number.return_value = 100
+        self.service_client.get_price.return_value = PRICE
+        self.service_client.claim_message_encoder = ClaimMessageEncoder("0x" + "11" * 20)
+        self.service_client.generate_signature.return_value = b"signature"
+        self.channel = PaymentChannel(7, MagicMock(), MagicMock(), MagicMock(), MagicMock())
+        self.channel._update_state([0, None, None, None, None, 100000, 2000], 0, 0)
+
+    def _assert_no_duplicate_renewals(self):
+        # Every token covers CONCURRENT_CALLS calls and is fetched once
+        self.assertEqual(self.daemon.token_requests, CALLS // CONCURRENT_CALLS)
+        self.assertEqual(self.daemon.overdrawn_calls, 0)
+        self.assertEqual(self.daemon.used_amount, CALLS * PRICE)
+        self.assertEqual(self.channel.state["last_signed_amount"], CALLS * PRICE)
+
+    def test_token_is_shared_by_concurrent_threads(self):
+        concurrency_manager = ConcurrencyManager(CONCURRENT_CALLS)
+
+        def call():
+            token = concurrency_manager.get_token(self.service_client, self.channel,
+                                                  PRICE * CONCURRENT_CALLS)
+            self.daemon.call(token)
+
+        with futures.ThreadPoolExecutor(max_workers=16) as executor:
+            for task in [executor.submit(call) for _ in range(CALLS)]:
+                task.result()
+
+        self._assert_no_duplicate_renewals()
+
+    def test_next_token_is_fetched_in_the_background(self):
+        concurrency_manager = ConcurrencyManager(CONCURRENT_CALLS, renewal_threshold=0.6)
+        self.addCleanup(concurrency_manager.close)
+        renewal_threads = []
+        self.service_client.get_current_block_number.side_effect = \
+            lambda: renewal_threads.append(threading.current_thread().name) or 100
+
+        def call():
+            token = concurrency_manager.get_token(self.service_client, self.channel,
+                                                  PRICE * CONCURRENT_CALLS)
+            self.daemon.call(token)
+            return token
+
+        tokens = [call() for _ in range(4)]
+        # 10 of 50 cogs are left after the 4th call, less than 40% of the token
+        # The next token is swapped in once the prefetch is no longer due
+        deadline = time.monotonic() + 5
+        while (concurrency_manager._prefetch_due(PRICE * CONCURRENT_CALLS) and
+               time.monotonic() < deadline):
+            time.sleep(0.01)
+        tokens += [call() for _ in range(2)]
+
+        # The calls after the swap use the next token
+        self.assertEqual(tokens, ["token-50"] * 4 + ["token-100"] * 2)
+        self.assertEqual(self.daemon.token_requests, 2)
+        self.assertTrue(renewal_threads[1].startswith("snet-token-renewal"))
+        self.assertEqual(self.daemon.overdrawn_calls, 0)
+
+    def test_concurrent_calls_follow_the_call_rate(self):
+        concurrency_manager = ConcurrencyManager(4, target_renewal_interval=60, max_concurrent_calls=10)
+
+        # 8 calls a minute fill a token renewed once a minute
+        self.assertEqual(concurrency_manager._get_adapted_concurrent_calls(8, 60), 8)
+        # The number at most doubles or halves per renewal
+        self.assertEqual(concurrency_manager._get_adapted_concurrent_calls(100, 1), 8)
+        self.assertEqual(concurrency_manager._get_adapted_concurrent_calls(1, 60), 2)
+        concurrency_manager.concurrent_calls = 8
+        self.assertEqual(concurrency_manager._get_adapted_concurrent_calls(100, 1), 10)
+
+    def test_prepaid_amount_grows_with_the_call_rate(self):
+        concurrency_manager = ConcurrencyManager(2, target_renewal_interval=3600, max_concurrent_calls=8)
+
+        for _ in range(30):
+            token = concurrency_manager.get_token(self.service_client, self.channel,
+                                                  PRICE * concurrency_manager.concurrent_calls)
+            self.daemon.call(token)
+
+        # The tokens cover 2, 2, 4, 8, 8 and 8 calls
+        self.assertEqual(concurrency_manager.concurrent_calls, 8)
+        self.assertEqual(self.daemon.token_requests, 6)
+        self.assertEqual(self.daemon.overdrawn_calls, 0)
+
+    def _call_concurrently(self, strategy):
+        def call():
+            metadata = dict(strategy.get_payment_metadata(self.service_client))
+            self.daemon.call(metadata["snet-prepaid-auth-token-bin"].decode())
+
+        with futures.ThreadPoolExecutor(max_workers=16) as executor:
+            for task in [executor.submit(call) for _ in range(CALLS)]:
+                task.result()
+
+    def test_prepaid_strategy_selects_the_channel_on_renewal_only(self):
+        strategy = PrePaidPaymentStrategy(CONCURRENT_CALLS)
+        strategy.select_channel = MagicMock(return_value=self.channel)
+
+        self._call_concurrently(strategy)
+
+        self._assert_no_duplicate_renewals()
+        self.assertEqual(strategy.select_channel.call_count, CALLS // CONCURRENT_CALLS)
+
+    def test_prepaid_strategy_fetches_the_next_token_in_the_background(self):
+        strategy = PrePaidPaymentStrategy(CONCURRENT_CALLS, token_renewal_threshold=0.6)
+        self.addCleanup(strategy.concurrency_manager.close)
+        strategy.select_channel = MagicMock(return_value=self.channel)
+
+        def call():
+            metadata = dict(strategy.get_payment_metadata(self.service_client))
+            token = metadata["snet-prepaid-auth-token-bin"].decode()
+            self.daemon.call(token)
+            return token
+
+        tokens = [call() for _ in range(4)]
+        deadline = time.monotonic() + 5
+        while (strategy.concurrency_manager._prefetch_due(PRICE * CONCURRENT_CALLS) and
+               time.monotonic() < deadline):
+            time.sleep(0.01)
+        tokens += [call() for _ in range(2)]
+
+        # The next calls use the prefetched token, the channel is not selected again
+        self.assertEqual(tokens, ["token-50"] * 4 + ["token-100"] * 2)
+        self.assertEqual(self.daemon.token_requests, 2)
+        self.assertEqual(strategy.select_channel.call_count, 1)
+
+    def test_default_strategy_shares_one_prepaid_strategy(self):
+        strategy = DefaultPaymentStrategy()
+        strategy.free_call_payment_strategy = MagicMock()
+        strategy.free_call_payment_strategy.get_free_calls_left.return_value = 0
+        self.service_client.get_concurrency_flag.return_value = True
+        # The strategy is created slowly, while the other first calls arrive
+        self.service_client.get_concurrent_calls.side_effect = \
+            lambda: time.sleep(0.05) or CONCURRENT_CALLS
+
+        with patch.object(PrePaidPaymentStrategy, "select_channel", return_value=self.channel):
+            self._call_concurrently(strategy)
+
+        # The first calls made at the same time don't create strategies of their own
+        self._assert_no_duplicate_renewals()
+
+
+class TestAsyncConcurrencyManager(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.daemon = FakeDaemon()
+        server = grpc.server(futures.ThreadPoolExecutor(max_workers=4))
+        token_service_pb2_grpc.add_TokenServiceServicer_to_server(self.daemon, server)
+        port = server.add_insecure_port("localhost:0")
+        server.start()
+        self.addCleanup(server.stop, None)
+        grpc_channel = grpc.aio.insecure_channel(f"localhost:{port}")
+        self.addAsyncCleanup(grpc_channel.close)
+
+        self.service_client = MagicMock()
+        self.service_client.get_grpc_base_channel.return_value = grpc_channel
+        self.service_client.get_current_block_number = AsyncMock(return_value=100)
+        self.service_client.get_price.return_value = PRICE
+        self.service_client.claim_message_encoder = ClaimMessageEncoder("0x" + "11" * 20)
+        self.service_client.generate_signature.return_value = b"signature"
+        self.channel = PaymentChannel(7, MagicMock(), MagicMock(), MagicMock(), MagicMock())
+        self.channel._update_state([0, None, None, None, None, 100000, 2000], 0, 0)
+
+    async def test_token_is_shared_by_concurrent_calls(self):
+        concurrency_manager = AsyncConcurrencyManager(CONCURRENT_CALLS)
+
+        async def call():
+            token = await concurrency_manager.get_token(self.service_client, self.channel,
+                                                        PRICE * CONCURRENT_CALLS)
+            self.daemon.call(token)
+
+        await asyncio.gather(*[call() for _ in range(CALLS)])
+
+        # The accounting is the same as the one of the threads
+        self.assertEqual(self.daemon.token_requests, CALLS // CONCURRENT_CALLS)
+        self.assertEqual(self.daemon.overdrawn_calls, 0)
+        self.assertEqual(self.channel.state["last_signed_amount"], CALLS * PRICE)
+
+
+if __name__ == "__main__":
+    unittest.main()
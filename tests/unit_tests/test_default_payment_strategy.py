@@ -0,0 +1,87 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from snet.sdk.payment_strategies.default_payment_strategy import DefaultPaymentStrategy
+from snet.sdk.payment_strategies.prepaid_payment_strategy import PrePaidPaymentStrategy
+
+
+class TestDefaultPaymentStrategy(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = patch(
+            "snet.sdk.payment_strategies.default_payment_strategy.time.monotonic",
+            side_effect=lambda: self.now
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.service_client = MagicMock()
+        self.service_client.get_concurrency_flag.return_value = True
+        self.service_client.get_concurrent_calls.return_value = 5
+        self.strategy = DefaultPaymentStrategy(free_calls_recheck_interval=60)
+        self.free_call_strategy = MagicMock()
+        self.free_call_strategy.get_payment_metadata.return_value = [("snet-payment-type", "free-call")]
+        self.strategy.free_call_payment_strategy = self.free_call_strategy
+
+    def test_free_calls_are_used_while_available(self):
+        self.free_call_strategy.get_free_calls_left.return_value = 2
+
+        metadata = self.strategy.get_payment_metadata(self.service_client)
+        self.strategy.get_payment_metadata(self.service_client)
+
+        self.assertEqual(metadata, [("snet-payment-type", "free-call")])
+        self.assertEqual(self.free_call_strategy.get_payment_metadata.call_count, 2)
+
+    @patch.object(PrePaidPaymentStrategy, "get_payment_metadata",
+                  return_value=[("snet-payment-type", "prepaid-call")])
+    def test_exhausted_free_calls_are_rechecked_on_schedule(self, mock_prepaid_metadata):
+        self.free_call_strategy.get_free_calls_left.return_value = 0
+
+        for _ in range(3):
+            metadata = self.strategy.get_payment_metadata(self.service_client)
+        self.assertEqual(metadata, [("snet-payment-type", "prepaid-call")])
+        self.free_call_strategy.get_free_calls_left.assert_called_once()
+
+        # The prepaid strategy (and its token) is kept between calls
+        prepaid_payment_strategy = self.strategy.prepaid_payment_strategy
+        self.assertEqual(prepaid_payment_strategy.concurrency_manager.concurrent_calls, 5)
+        self.assertEqual(mock_prepaid_metadata.call_count, 3)
+
+        self.now += 60
+        self.free_call_strategy.get_free_calls_left.return_value = 1
+        metadata = self.strategy.get_payment_metadata(self.service_client)
+        self.assertEqual(metadata, [("snet-payment-type", "free-call")])
+        self.assertIs(self.strategy.prepaid_payment_strategy, prepaid_payment_strategy)
+
+    def test_concurrent_calls_bounds_are_passed_to_the_prepaid_strategy(self):
+        strategy = DefaultPaymentStrategy(target_renewal_interval=60, min_concurrent_calls=3,
+                                          max_concurrent_calls=20)
+
+        prepaid_payment_strategy = strategy._get_prepaid_payment_strategy(self.service_client)
+
+        concurrency_manager = prepaid_payment_strategy.concurrency_manager
+        self.assertEqual(concurrency_manager.min_concurrent_calls, 3)
+        self.assertEqual(concurrency_manager.max_concurrent_calls, 20)
+        # A slow call rate doesn't take the number below the lower bound
+        self.assertEqual(concurrency_manager._get_adapted_concurrent_calls(1, 3600), 3)
+
+    def test_concurrent_calls_bounds_are_in_the_prepaid_strategy_order(self):
+        strategy = DefaultPaymentStrategy(600, None, None, None, 60, 3, 20)
+
+        self.assertEqual(strategy.min_concurrent_calls, 3)
+        self.assertEqual(strategy.max_concurrent_calls, 20)
+
+    def test_paid_call_strategy_without_concurrency(self):
+        self.service_client.get_concurrency_flag.return_value = False
+        self.free_call_strategy.get_free_calls_left.return_value = 0
+        self.strategy.paid_call_payment_strategy = MagicMock()
+
+        self.strategy.get_payment_metadata(self.service_client)
+        self.strategy.get_payment_metadata(self.service_client)
+
+        self.assertEqual(self.strategy.paid_call_payment_strategy.get_payment_metadata.call_count, 2)
+        self.assertIsNone(self.strategy.prepaid_payment_strategy)
+
+
+if __name__ == "__main__":
+    unittest.main()
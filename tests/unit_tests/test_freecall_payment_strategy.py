@@ -0,0 +1,106 @@
+import base64
+from pathlib import Path
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+import grpc
+
+from snet.sdk.payment_strategies.default_payment_strategy import DefaultPaymentStrategy
+from snet.sdk.payment_strategies.freecall_payment_strategy import FreeCallPaymentStrategy
+
+
+class TestFreeCallPaymentStrategy(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = patch(
+            "snet.sdk.payment_strategies.freecall_payment_strategy.time.monotonic",
+            side_effect=lambda: self.now
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.cache_dir.cleanup)
+        self.service_client = MagicMock()
+        self.service_client.account.signer_address = "0x42"
+        self.service_client.get_current_block_number.return_value = 100
+        self.service_client.get_service_details.return_value = (
+            "org", "service", base64.b64encode(b"group").decode(), "http://localhost:7000"
+        )
+
+    def _create_strategy(self, free_calls_available=3):
+        strategy = FreeCallPaymentStrategy(reconcile_every_calls=2,
+                                           reconcile_interval=60,
+                                           token_cache_dir=Path(self.cache_dir.name))
+        strategy.get_free_calls_available = MagicMock(
+            side_effect=lambda service_client: self._reconcile(strategy, free_calls_available)
+        )
+        return strategy
+
+    @staticmethod
+    def _reconcile(strategy, free_calls_available):
+        strategy._reconcile_free_calls(free_calls_available)
+        return free_calls_available
+
+    def test_free_calls_are_counted_locally(self):
+        strategy = self._create_strategy(free_calls_available=3)
+
+        self.assertEqual(strategy.get_free_calls_left(self.service_client), 3)
+        strategy.record_call_result(self.service_client, [], grpc.StatusCode.OK)
+        self.assertEqual(strategy.get_free_calls_left(self.service_client), 2)
+        strategy.get_free_calls_available.assert_called_once()
+
+        # The daemon is asked again after reconcile_every_calls calls
+        strategy.record_call_result(self.service_client, [], grpc.StatusCode.OK)
+        self.assertEqual(strategy.get_free_calls_left(self.service_client), 3)
+        self.assertEqual(strategy.get_free_calls_available.call_count, 2)
+
+    def test_free_calls_are_reconciled_on_schedule(self):
+        strategy = self._create_strategy()
+        strategy.get_free_calls_left(self.service_client)
+        strategy.get_free_calls_left(self.service_client)
+        strategy.get_free_calls_available.assert_called_once()
+
+        self.now += 60
+        strategy.get_free_calls_left(self.service_client)
+        self.assertEqual(strategy.get_free_calls_available.call_count, 2)
+
+    def test_rejected_free_call_falls_back_to_paid_calls(self):
+        default_strategy = DefaultPaymentStrategy()
+        default_strategy.free_call_payment_strategy = self._create_strategy()
+        self.service_client.get_concurrency_flag.return_value = False
+        default_strategy.paid_call_payment_strategy = MagicMock()
+        default_strategy.free_call_payment_strategy.get_payment_metadata = MagicMock(
+            return_value=[("snet-payment-type", "free-call")]
+        )
+
+        metadata = default_strategy.get_payment_metadata(self.service_client)
+        default_strategy.record_call_result(self.service_client, metadata,
+                                            grpc.StatusCode.UNAUTHENTICATED)
+        default_strategy.get_payment_metadata(self.service_client)
+
+        default_strategy.paid_call_payment_strategy.get_payment_metadata.assert_called_once()
+
+    def test_free_call_token_is_persisted(self):
+        strategy = self._create_strategy()
+        strategy.get_free_call_token_details = MagicMock(return_value=(b"token", 200))
+        strategy.update_free_call_token(self.service_client)
+
+        restarted_strategy = self._create_strategy()
+        restarted_strategy.get_free_call_token_details = MagicMock()
+        restarted_strategy.update_free_call_token(self.service_client)
+
+        restarted_strategy.get_free_call_token_details.assert_not_called()
+        self.assertEqual(restarted_strategy._free_call_token, b"token")
+        self.assertEqual(restarted_strategy._token_expiration_block, 200)
+
+        # An expired token is replaced
+        self.service_client.get_current_block_number.return_value = 201
+        restarted_strategy.get_free_call_token_details.return_value = (b"new token", 400)
+        restarted_strategy.update_free_call_token(self.service_client)
+        self.assertEqual(restarted_strategy._free_call_token, b"new token")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+from snet.sdk.funding_manager import FundingManager
+from snet.sdk.mpe.payment_channel import PaymentChannel
+
+
+class TestFundingManager(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = patch("snet.sdk.funding_manager.time.monotonic",
+                        side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.mined = threading.Event()
+        self.mpe_contract = MagicMock()
+        self.mpe_contract.channel_add_funds.side_effect = lambda *args: self.mined.wait(5)
+        self.mpe_contract.channel_extend.side_effect = lambda *args: self.mined.wait(5)
+        self.mpe_contract.channel_extend_and_add_funds.side_effect = lambda *args: self.mined.wait(5)
+        self.channel = PaymentChannel(7, MagicMock(), MagicMock(), MagicMock(), self.mpe_contract)
+        self.funding_manager = FundingManager(low_balance_calls=2, lead_time=60,
+                                              funding_horizon=600, expiration_watermark=100,
+                                              min_spend_period=5)
+        self.addCleanup(self.funding_manager.close)
+
+    def _set_state(self, last_signed_amount, total_amount=100, expiration=2000):
+        self.channel._update_state([0, None, None, None, None, total_amount, expiration],
+                                   0, last_signed_amount)
+
+    def _top_up(self, price=10, default_expiration=1000):
+        self.funding_manager.top_up(self.channel, price, default_expiration,
+                                    block_offset=240, call_allowance=1)
+
+    def test_low_balance_is_topped_up_in_background(self):
+        self._set_state(75)
+
+        # 25 cogs are left: this call is served while the top-up is mined
+        self._top_up()
+        self.assertTrue(self.channel.state_synced)
+        self._top_up()
+
+        self.mined.set()
+        self.funding_manager.close(wait=True)
+        self.mpe_contract.channel_add_funds.assert_called_once_with(self.channel.account, 7, 20)
+        self.assertFalse(self.channel.state_synced)
+
+    def test_empty_channel_waits_for_the_top_up(self):
+        self._set_state(95)
+        threading.Timer(0.05, self.mined.set).start()
+
+        self._top_up()
+
+        self.assertTrue(self.mined.is_set())
+        self.mpe_contract.channel_add_funds.assert_called_once()
+
+    def test_top_up_amount_follows_the_spend_rate(self):
+        for i in range(6):
+            self.now = 1000 + i
+            self._set_state(i * 10, total_amount=1000)
+            self._top_up()
+        self.mpe_contract.channel_add_funds.assert_not_called()
+        self.assertAlmostEqual(self.funding_manager.get_spend_rate(self.channel), 10)
+
+        # 10 cogs per second: 600 cogs are needed in the next lead_time,
+        # and the channel is funded for the next funding_horizon
+        self._set_state(50, total_amount=600)
+        self._top_up()
+
+        self.mined.set()
+        self.funding_manager.close(wait=True)
+        self.mpe_contract.channel_add_funds.assert_called_once_with(self.channel.account, 7, 6000)
+
+    def test_channel_is_extended_before_it_expires(self):
+        self._set_state(0, expiration=1050)
+
+        self._top_up()
+
+        self.mined.set()
+        self.funding_manager.close(wait=True)
+        self.mpe_contract.channel_extend.assert_called_once_with(self.channel.account, 7, 1340)
+
+
+if __name__ == "__main__":
+    unittest.main()
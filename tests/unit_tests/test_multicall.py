@@ -0,0 +1,101 @@
+import unittest
+
+import web3
+from eth_utils.abi import get_abi_output_types
+from web3.providers.base import JSONBaseProvider
+
+from snet.contracts import get_contract_object
+from snet.sdk.mpe.mpe_contract import MPEContract
+from snet.sdk.multicall import MULTICALL3_ADDRESS, Multicall
+
+MPE_ADDRESS = web3.Web3.to_checksum_address("0x" + "22" * 20)
+SENDER = web3.Web3.to_checksum_address("0x" + "33" * 20)
+AGGREGATE_CALL_TYPES = ["(address,bool,bytes)[]"]
+AGGREGATE_REPLY_TYPES = ["(bool,bytes)[]"]
+
+
+class FakeChain(JSONBaseProvider):
+    # Serves the MPE reads directly and through Multicall3
+    def __init__(self, multicall_deployed=True):
+        super().__init__()
+        self.multicall_deployed = multicall_deployed
+        self.calls = []
+        self.w3 = web3.Web3()
+        self.mpe = get_contract_object(self.w3, "MultiPartyEscrow", MPE_ADDRESS)
+        self.channels = {
+            channel_id: [channel_id, SENDER, SENDER, SENDER, b"\0" * 32, 100 * channel_id, 1000]
+            for channel_id in range(1, 6)
+        }
+
+    def make_request(self, method, params):
+        if method == "eth_chainId":
+            result = "0x1"
+        elif method == "eth_getCode":
+            result = "0x6080" if self.multicall_deployed else "0x"
+        elif method == "eth_call":
+            self.calls.append(params[0]["to"])
+            data = web3.Web3.to_bytes(hexstr=params[0]["data"])
+            if params[0]["to"] == MULTICALL3_ADDRESS:
+                result = self.aggregate(data)
+            else:
+                result = self.call_mpe(data)
+            result = web3.Web3.to_hex(result)
+        else:
+            raise NotImplementedError(method)
+        return {"jsonrpc": "2.0", "id": 0, "result": result}
+
+    def aggregate(self, data):
+        (calls,) = self.w3.codec.decode(AGGREGATE_CALL_TYPES, data[4:])
+        replies = []
+        for _, _, call_data in calls:
+            try:
+                replies.append((True, self.call_mpe(call_data)))
+            except KeyError:
+                replies.append((False, b""))
+        return self.w3.codec.encode(AGGREGATE_REPLY_TYPES, [replies])
+
+    def call_mpe(self, data):
+        function, args = self.mpe.decode_function_input(data)
+        if function.fn_name == "channels":
+            result = self.channels[args[""]]
+        else:
+            result = [7]
+        return self.w3.codec.encode(get_abi_output_types(function.abi), result)
+
+
+class TestMulticall(unittest.TestCase):
+    def _create_mpe_contract(self, chain):
+        w3 = web3.Web3(chain)
+        return MPEContract(w3, MPE_ADDRESS, Multicall(w3))
+
+    def test_reads_are_aggregated_in_one_call(self):
+        chain = FakeChain()
+        mpe_contract = self._create_mpe_contract(chain)
+
+        channels = mpe_contract.get_channels(range(1, 6))
+
+        self.assertEqual(chain.calls, [MULTICALL3_ADDRESS])
+        self.assertEqual(channels[2], [3, SENDER, SENDER, SENDER, b"\0" * 32, 300, 1000])
+        # The results are the same as the ones of the single calls
+        self.assertEqual(channels[2], mpe_contract.contract.functions.channels(3).call())
+
+    def test_reads_are_sent_one_by_one_without_multicall(self):
+        chain = FakeChain(multicall_deployed=False)
+        mpe_contract = self._create_mpe_contract(chain)
+
+        channels = mpe_contract.get_channels(range(1, 6))
+
+        self.assertEqual(chain.calls, [MPE_ADDRESS] * 5)
+        self.assertEqual([channel[5] for channel in channels], [100, 200, 300, 400, 500])
+
+    def test_failed_read_raises_its_error(self):
+        chain = FakeChain()
+        mpe_contract = self._create_mpe_contract(chain)
+
+        with self.assertRaises(KeyError):
+            mpe_contract.get_channels([1, 42])
+        self.assertEqual(chain.calls, [MULTICALL3_ADDRESS, MPE_ADDRESS])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,219 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+
+import grpc
+
+from snet.sdk.aio.payment_strategies import AsyncPaidCallPaymentStrategy
+from snet.sdk.funding_manager import FundingManager
+from snet.sdk.mpe.payment_channel import PaymentChannel
+from snet.sdk.mpe.payment_channel_pool import PaymentChannelPool
+from snet.sdk.payment_strategies.paidcall_payment_strategy import PaidCallPaymentStrategy
+from snet.sdk.pre_signer import PreSigner
+
+
+class TestPaidCallPaymentStrategy(unittest.TestCase):
+    def setUp(self):
+        self.channel = PaymentChannel(7, MagicMock(), MagicMock(), MagicMock(), MagicMock())
+        self.channel.sync_state = MagicMock(side_effect=self._sync_state)
+        self.service_client = MagicMock()
+        self.service_client.get_price.return_value = 10
+        self.service_client.default_channel_expiration.return_value = 1000
+        self.service_client.mpe_address = "0x" + "11" * 20
+        self.service_client.generate_signature.return_value = b"signature"
+        self.service_client.payment_channels = [self.channel]
+        self.service_client.payment_channel_pool = None
+        self.service_client.update_channel_states.side_effect = self._update_channel_states
+        self.daemon_signed_amount = 0
+        self.strategy = PaidCallPaymentStrategy()
+
+    def _update_channel_states(self, include_unusable=False):
+        for channel in self.service_client.payment_channels:
+            channel.sync_state()
+        return self.service_client.payment_channels
+
+    def _sync_state(self):
+        # nonce, ..., total_amount, expiration as returned by MPE.channels()
+        channel_blockchain_data = [0, None, None, None, None, 25, 2000]
+        self.channel._update_state(channel_blockchain_data, 0, self.daemon_signed_amount)
+
+    def _call(self, code=grpc.StatusCode.OK):
+        metadata = self.strategy.get_payment_metadata(self.service_client)
+        if code == grpc.StatusCode.OK:
+            self.daemon_signed_amount = int(dict(metadata)["snet-payment-channel-amount"])
+        self.strategy.record_call_result(self.service_client, metadata, code)
+        return metadata
+
+    def test_ledger_is_updated_locally(self):
+        first = dict(self._call())
+        second = dict(self._call())
+
+        self.assertEqual(first["snet-payment-channel-amount"], "10")
+        self.assertEqual(second["snet-payment-channel-amount"], "20")
+        self.assertEqual(self.channel.state["available_amount"], 5)
+        # The state is synced on startup only
+        self.assertEqual(self.channel.sync_state.call_count, 1)
+        self.service_client.load_open_channels.assert_called_once()
+        self.service_client.account.escrow_balance.assert_not_called()
+
+    def test_overlapping_calls_sign_increasing_amounts(self):
+        self.channel._update_state([0, None, None, None, None, 100, 2000], 0, 0)
+        first = self.strategy.get_payment_metadata(self.service_client)
+        second = self.strategy.get_payment_metadata(self.service_client)
+
+        self.assertEqual(dict(first)["snet-payment-channel-amount"], "10")
+        self.assertEqual(dict(second)["snet-payment-channel-amount"], "20")
+        self.assertEqual(self.channel.state["available_amount"], 80)
+        # The calls finish in any order
+        self.strategy.record_call_result(self.service_client, second, grpc.StatusCode.OK)
+        self.strategy.record_call_result(self.service_client, first, grpc.StatusCode.OK)
+        self.assertEqual(self.channel.state["last_signed_amount"], 20)
+        third = self.strategy.get_payment_metadata(self.service_client)
+        self.assertEqual(dict(third)["snet-payment-channel-amount"], "30")
+
+    def test_resync_keeps_the_reservations_of_the_calls_in_flight(self):
+        self.channel._update_state([0, None, None, None, None, 100, 2000], 0, 0)
+        first = self.strategy.get_payment_metadata(self.service_client)
+        self.strategy.get_payment_metadata(self.service_client)
+        # The first call reaches the daemon, the second one is still in flight
+        self.strategy.record_call_result(self.service_client, first, grpc.StatusCode.OK)
+        self.channel._update_state([0, None, None, None, None, 100, 2000], 0, 10)
+
+        third = self.strategy.get_payment_metadata(self.service_client)
+        self.assertEqual(dict(third)["snet-payment-channel-amount"], "30")
+
+        # After a failed claim the reservations are given up on the next sync
+        self.strategy.record_call_result(self.service_client, third, grpc.StatusCode.FAILED_PRECONDITION)
+        self.channel._update_state([0, None, None, None, None, 100, 2000], 0, 20)
+        fourth = self.strategy.get_payment_metadata(self.service_client)
+        self.assertEqual(dict(fourth)["snet-payment-channel-amount"], "30")
+
+    def test_rejected_call_resyncs_the_ledger(self):
+        self._call()
+        self._call(grpc.StatusCode.FAILED_PRECONDITION)
+        self.assertFalse(self.channel.state_synced)
+
+        metadata = dict(self._call())
+        self.assertEqual(metadata["snet-payment-channel-amount"], "20")
+        self.assertEqual(self.channel.sync_state.call_count, 2)
+
+    def test_top_up_resyncs_the_ledger(self):
+        self._call()
+        self._call()
+        # 5 cogs are left, so the next call tops up the channel
+        self._call()
+
+        self.channel.mpe_contract.channel_add_funds.assert_called_once_with(
+            self.channel.account, 7, 10
+        )
+        self.assertEqual(self.channel.sync_state.call_count, 2)
+
+    def test_funding_manager_tops_up_ahead_of_time(self):
+        self.strategy.funding_manager = FundingManager(low_balance_calls=1)
+        self.addCleanup(self.strategy.funding_manager.close)
+        self.channel.add_funds = MagicMock()
+
+        self._call()
+        # 5 cogs will be left after this call, so the top-up is submitted
+        # while the call is still paid from the channel
+        metadata = dict(self._call())
+        self.strategy.funding_manager.close(wait=True)
+
+        self.assertEqual(metadata["snet-payment-channel-amount"], "20")
+        # 10 cogs spent within min_spend_period (60 s), funded for an hour
+        self.channel.add_funds.assert_called_once_with(600)
+        self.assertEqual(self.channel.sync_state.call_count, 1)
+
+    def test_next_claims_are_presigned(self):
+        self.strategy.pre_signer = PreSigner(depth=2)
+        self.addCleanup(self.strategy.pre_signer.close)
+
+        self._call()
+        self.strategy.pre_signer.close(wait=True)
+        self.assertEqual(self.service_client.generate_signature.call_count, 3)
+
+        # The next claim was signed while the previous call was in flight
+        metadata = dict(self._call())
+        self.assertEqual(metadata["snet-payment-channel-amount"], "20")
+        self.assertEqual(metadata["snet-payment-channel-signature-bin"], b"signature")
+        self.assertEqual(self.service_client.generate_signature.call_count, 3)
+
+    def test_pool_leases_a_channel_per_call(self):
+        other_channel = PaymentChannel(8, MagicMock(), MagicMock(), MagicMock(), MagicMock())
+        other_channel.sync_state = MagicMock(
+            side_effect=lambda: other_channel._update_state([0, None, None, None, None, 25, 2000], 0, 0)
+        )
+        self.service_client.payment_channel_pool = PaymentChannelPool(
+            2, lambda: [self.channel, other_channel]
+        )
+
+        first = dict(self.strategy.get_payment_metadata(self.service_client))
+        second = dict(self.strategy.get_payment_metadata(self.service_client))
+
+        # Both calls are in flight, each on a channel of its own
+        self.assertEqual(first["snet-payment-channel-id"], "7")
+        self.assertEqual(second["snet-payment-channel-id"], "8")
+        self.assertEqual(second["snet-payment-channel-amount"], "10")
+
+        self.strategy.record_call_result(self.service_client, list(first.items()), grpc.StatusCode.OK)
+        third = dict(self.strategy.get_payment_metadata(self.service_client))
+        self.assertEqual(third["snet-payment-channel-id"], "7")
+        self.assertEqual(third["snet-payment-channel-amount"], "20")
+
+    def test_pool_opens_a_channel_when_all_are_leased(self):
+        new_channel = PaymentChannel(9, MagicMock(), MagicMock(), MagicMock(), MagicMock())
+        new_channel.sync_state = MagicMock(
+            side_effect=lambda: new_channel._update_state([0, None, None, None, None, 10, 2000], 0, 0)
+        )
+        self.service_client.account.escrow_balance.return_value = 100
+        self.service_client.open_channel.return_value = new_channel
+        self.service_client.payment_channel_pool = PaymentChannelPool(
+            2, lambda: self.service_client.payment_channels
+        )
+
+        self.strategy.get_payment_metadata(self.service_client)
+        metadata = dict(self.strategy.get_payment_metadata(self.service_client))
+
+        self.assertEqual(metadata["snet-payment-channel-id"], "9")
+        self.service_client.open_channel.assert_called_once_with(10, 1240)
+        self.assertEqual(self.service_client.payment_channels, [self.channel, new_channel])
+
+
+class TestAsyncPaidCallPaymentStrategy(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.service_client = MagicMock()
+        self.service_client.get_price.return_value = 10
+        self.service_client.default_channel_expiration = AsyncMock(return_value=1000)
+        self.service_client.mpe_address = "0x" + "11" * 20
+        self.service_client.generate_signature.return_value = b"signature"
+        self.service_client.payment_channels = []
+        self.service_client.load_open_channels = AsyncMock()
+        self.service_client.update_channel_states = AsyncMock(side_effect=self._update_channel_states)
+        self.service_client.escrow_balance = AsyncMock(return_value=1000)
+        self.service_client.open_channel = AsyncMock(side_effect=self._open_channel)
+        self.strategy = AsyncPaidCallPaymentStrategy()
+
+    async def _update_channel_states(self):
+        for channel in self.service_client.payment_channels:
+            if not channel.state_synced:
+                channel._update_state([0, None, None, None, None, 1000, 2000], 0, 0)
+        return self.service_client.payment_channels
+
+    async def _open_channel(self, amount, expiration):
+        # The transaction is mined while the other first calls arrive
+        await asyncio.sleep(0.05)
+        return PaymentChannel(len(self.service_client.payment_channels) + 1,
+                              MagicMock(), MagicMock(), MagicMock(), MagicMock())
+
+    async def test_first_calls_open_one_channel(self):
+        metadata = await asyncio.gather(*[self.strategy.get_payment_metadata(self.service_client)
+                                          for _ in range(20)])
+
+        self.service_client.open_channel.assert_awaited_once()
+        self.assertEqual(len(self.service_client.payment_channels), 1)
+        amounts = sorted(int(dict(m)["snet-payment-channel-amount"]) for m in metadata)
+        self.assertEqual(amounts, list(range(10, 210, 10)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import threading
+import unittest
+from unittest.mock import MagicMock
+
+from snet.sdk.mpe.payment_channel_pool import DEFAULT_LEASE_TIMEOUT, PaymentChannelPool
+
+
+def create_channel(channel_id):
+    channel = MagicMock()
+    channel.channel_id = channel_id
+    return channel
+
+
+class TestPaymentChannelPool(unittest.TestCase):
+    def setUp(self):
+        self.channels = [create_channel(1), create_channel(2), create_channel(3)]
+        self.load_channels = MagicMock(return_value=self.channels)
+
+    def test_open_channels_are_adopted_up_to_the_pool_size(self):
+        pool = PaymentChannelPool(2, self.load_channels)
+
+        self.assertIs(pool.lease(), self.channels[0])
+        self.assertIs(pool.lease(), self.channels[1])
+        self.assertEqual([c.channel_id for c in pool.channels], [1, 2])
+        self.load_channels.assert_called_once()
+
+    def test_released_channel_is_leased_again(self):
+        pool = PaymentChannelPool(1, self.load_channels)
+        pool.lease()
+        pool.release(1)
+
+        self.assertIs(pool.lease(), self.channels[0])
+
+    def test_pool_grows_with_new_channels(self):
+        self.load_channels.return_value = [self.channels[0]]
+        pool = PaymentChannelPool(2, self.load_channels)
+        pool.lease()
+
+        # No channel is free, so the caller opens one
+        self.assertIsNone(pool.lease())
+        pool.add(self.channels[1])
+        self.assertEqual([c.channel_id for c in pool.channels], [1, 2])
+
+        pool.release(1)
+        self.assertIs(pool.lease(), self.channels[0])
+
+    def test_failed_opening_frees_the_slot(self):
+        self.load_channels.return_value = []
+        pool = PaymentChannelPool(1, self.load_channels)
+
+        self.assertIsNone(pool.lease())
+        pool.cancel_opening()
+        self.assertIsNone(pool.lease())
+
+    def test_lease_waits_for_a_released_channel(self):
+        pool = PaymentChannelPool(1, self.load_channels, lease_timeout=5)
+        pool.lease()
+        threading.Timer(0.05, pool.release, args=(1,)).start()
+
+        self.assertIs(pool.lease(), self.channels[0])
+
+    def test_lease_times_out(self):
+        pool = PaymentChannelPool(1, self.load_channels, lease_timeout=0.01)
+        pool.lease()
+
+        self.assertRaises(TimeoutError, pool.lease)
+
+    def test_lease_timeout_is_finite_by_default(self):
+        pool = PaymentChannelPool(1, self.load_channels)
+
+        self.assertEqual(pool.lease_timeout, DEFAULT_LEASE_TIMEOUT)
+
+    def test_pool_size_must_be_positive(self):
+        self.assertRaises(ValueError, PaymentChannelPool, 0, self.load_channels)
+
+
+if __name__ == "__main__":
+    unittest.main()
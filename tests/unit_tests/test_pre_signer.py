@@ -0,0 +1,40 @@
+import unittest
+from unittest.mock import MagicMock
+
+from snet.sdk.pre_signer import PreSigner
+
+
+class TestPreSigner(unittest.TestCase):
+    def setUp(self):
+        self.pre_signer = PreSigner(depth=2)
+        self.addCleanup(self.pre_signer.close)
+        self.sign = MagicMock(side_effect=lambda nonce, amount: f"{nonce}:{amount}".encode())
+
+    def test_presigned_claims_are_reused(self):
+        self.pre_signer.presign(self.sign, 7, 0, [10, 20])
+
+        self.assertEqual(self.pre_signer.get_signature(self.sign, 7, 0, 10), b"0:10")
+        self.assertEqual(self.pre_signer.get_signature(self.sign, 7, 0, 20), b"0:20")
+        self.assertEqual(self.sign.call_count, 2)
+
+    def test_claims_are_dropped_when_the_nonce_changes(self):
+        self.pre_signer.presign(self.sign, 7, 0, [10, 20])
+        self.pre_signer.get_signature(self.sign, 7, 0, 10)
+
+        # The channel was claimed, the amounts start over with a new nonce
+        self.assertEqual(self.pre_signer.get_signature(self.sign, 7, 1, 20), b"1:20")
+        self.sign.assert_called_with(1, 20)
+
+    def test_claim_that_was_not_presigned_is_signed_inline(self):
+        self.assertEqual(self.pre_signer.get_signature(self.sign, 7, 0, 30), b"0:30")
+        self.sign.assert_called_once_with(0, 30)
+
+    def test_failed_presigning_is_retried_inline(self):
+        sign = MagicMock(side_effect=[Exception("signer is busy"), b"signature"])
+        self.pre_signer.presign(sign, 7, 0, [10])
+
+        self.assertEqual(self.pre_signer.get_signature(sign, 7, 0, 10), b"signature")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,14 +1,24 @@
+from concurrent import futures
+from concurrent.futures import Future
+import importlib
 from pathlib import Path
+import tempfile
+from types import SimpleNamespace
 import unittest
 from unittest.mock import MagicMock, Mock, patch, create_autospec
 
+import grpc
+from hexbytes import HexBytes
 from web3 import Web3
 
 from snet.sdk.account import Account
 from snet.sdk.mpe.mpe_contract import MPEContract
 from snet.sdk.mpe.payment_channel_provider import PaymentChannelProvider
+from snet.sdk.payment_strategies.freecall_payment_strategy import FreeCallPaymentStrategy
+from snet.sdk.payment_strategies.paidcall_payment_strategy import PaidCallPaymentStrategy
 from snet.sdk.service_client import ServiceClient
 from snet.sdk.storage_provider.service_metadata import MPEServiceMetadata
+from snet.sdk.utils.utils import RESOURCES_PATH, add_to_path
 
 
 class TestServiceClient(unittest.TestCase):
@@ -60,6 +70,8 @@ class TestServiceClient(unittest.TestCase):
         self.mock_mpe_contract.contract = MagicMock()
         self.mock_account = MagicMock(spec=Account)
         self.mock_account.signer_private_key = MagicMock()
+        self.mock_account.signer = MagicMock()
+        self.mock_account.signer.sign_message.return_value = b"signature"
         self.mock_sdk_web3 = MagicMock(spec=Web3)
         self.mock_sdk_web3.eth = MagicMock()
         self.mock_pb2_module = MagicMock()
@@ -85,11 +97,14 @@ class TestServiceClient(unittest.TestCase):
         )
 
     def test_call_rpc(self):
-        # Set up mocks for service and pb2_module
+        # Set up mocks for service stub and pb2_module
         mock_rpc_method = MagicMock(return_value="value: 8")
-        self.client.service = MagicMock()
-        self.client.service.mul = mock_rpc_method
+        mock_stub_class = MagicMock(
+            return_value=SimpleNamespace(mul=mock_rpc_method)
+        )
+        self.client.service_stubs = [mock_stub_class]
         self.mock_pb2_module.Numbers = MagicMock()
+        self.mock_pb2_module.Numbers.__name__ = "Numbers"
 
         # Call the method
         result = self.client.call_rpc("mul", "Numbers", a=2, b=4)
@@ -101,12 +116,306 @@ class TestServiceClient(unittest.TestCase):
         )
         self.assertEqual(result, mock_rpc_method.return_value)
 
+    def test_call_rpc_reuses_stubs_until_channel_changes(self):
+        mock_stub_class = MagicMock(
+            side_effect=lambda channel: SimpleNamespace(mul=MagicMock())
+        )
+        self.client.service_stubs = [mock_stub_class]
+        self.mock_pb2_module.Numbers = MagicMock()
+        self.mock_pb2_module.Numbers.__name__ = "Numbers"
+
+        self.client.call_rpc("mul", "Numbers", a=2, b=4)
+        self.client.call_rpc("mul", "Numbers", a=3, b=5)
+        mock_stub_class.assert_called_once_with(self.client.grpc_channel)
+
+        self.mock_options["disable_blockchain_operations"] = True
+        self.client.call_rpc("mul", "Numbers", a=2, b=4)
+        self.assertEqual(mock_stub_class.call_count, 2)
+        mock_stub_class.assert_called_with(
+            self.client.get_grpc_base_channel()
+        )
+
+        with self.assertRaises(Exception):
+            self.client.call_rpc("div", "Numbers", a=2, b=4)
+
+    def test_escrow_calls_are_hedged_only_with_a_channel_pool(self):
+        rpc_method = MagicMock()
+        rpc_method.hedge.return_value = ("value: 8", 2)
+        self.client.service_stubs = [MagicMock(return_value=SimpleNamespace(mul=rpc_method))]
+        self.mock_pb2_module.Numbers = MagicMock()
+        self.mock_pb2_module.Numbers.__name__ = "Numbers"
+        self.client.payment_strategy = PaidCallPaymentStrategy()
+
+        with self.assertRaises(ValueError):
+            self.client.call_rpc("mul", "Numbers", hedge=True, a=2, b=4)
+        rpc_method.hedge.assert_not_called()
+
+        self.client.payment_channel_pool = MagicMock()
+        self.assertEqual(self.client.call_rpc("mul", "Numbers", hedge=True, a=2, b=4), "value: 8")
+        # The answered duplicate was charged
+        self.assertEqual(self.client.get_hedging_spend(), 1)
+
+    def test_call_rpc_resolves_request_class_from_descriptor(self):
+        with add_to_path(str(RESOURCES_PATH.joinpath("proto"))):
+            state_service_pb2 = importlib.import_module("state_service_pb2")
+        client = ServiceClient(
+            self.mock_org_id,
+            self.mock_service_id,
+            self.mock_service_metadata,
+            self.mock_group,
+            [],
+            self.mock_payment_strategy,
+            self.mock_options,
+            self.mock_mpe_contract,
+            self.mock_account,
+            self.mock_sdk_web3,
+            state_service_pb2,
+            self.mock_payment_channel_provider,
+            self.mock_path_to_pb_files
+        )
+        mock_rpc_method = MagicMock()
+        client.service_stubs = [
+            MagicMock(return_value=SimpleNamespace(
+                GetFreeCallToken=mock_rpc_method
+            ))
+        ]
+
+        client.call_rpc("GetFreeCallToken", address="0x1", current_block=7)
+
+        request = mock_rpc_method.call_args.args[0]
+        self.assertIsInstance(request, state_service_pb2.GetFreeCallTokenRequest)
+        self.assertEqual(request.address, "0x1")
+        self.assertEqual(request.current_block, 7)
+        descriptor = client.get_rpc_descriptors()["GetFreeCallToken"]
+        self.assertEqual(descriptor.service_name, "FreeCallStateService")
+        self.assertFalse(descriptor.client_streaming)
+        self.assertFalse(descriptor.server_streaming)
+
+    def test_map_rpc_keeps_bounded_window(self):
+        in_flight = []
+        max_in_flight = [0]
+
+        def submit(request):
+            future = Future()
+            future.request = request
+            in_flight.append(future)
+            max_in_flight[0] = max(max_in_flight[0], len(in_flight))
+            return future
+
+        mock_rpc_method = MagicMock()
+        mock_rpc_method.future.side_effect = submit
+        self.client.service_stubs = [
+            MagicMock(return_value=SimpleNamespace(mul=mock_rpc_method))
+        ]
+        self.mock_pb2_module.Numbers = MagicMock(side_effect=lambda a: a)
+        self.mock_pb2_module.Numbers.__name__ = "Numbers"
+
+        def complete_in_flight():
+            # Answer the newest call first and the oldest one last
+            for future in reversed(in_flight):
+                future.set_result(future.request)
+            in_flight.clear()
+
+        def requests():
+            for a in range(10):
+                if len(in_flight) == 3:
+                    complete_in_flight()
+                yield {"a": a}
+            complete_in_flight()
+
+        results = list(self.client.map_rpc("mul", requests(), max_in_flight=3,
+                                           message_class="Numbers"))
+        self.assertEqual(results, list(range(10)))
+        self.assertEqual(max_in_flight[0], 3)
+
+        in_flight.clear()
+        results = list(self.client.map_rpc("mul", requests(), max_in_flight=3,
+                                           ordered=False,
+                                           message_class="Numbers"))
+        self.assertEqual(sorted(results), list(range(10)))
+        self.assertEqual(max_in_flight[0], 3)
+
+    def test_warmup_prefetches_free_call_token(self):
+        with add_to_path(str(RESOURCES_PATH.joinpath("proto"))):
+            state_service_pb2 = importlib.import_module("state_service_pb2")
+            state_service_pb2_grpc = importlib.import_module("state_service_pb2_grpc")
+        get_free_call_token = MagicMock(
+            return_value=state_service_pb2.FreeCallToken(
+                token=b"token", token_expiration_block=1000
+            )
+        )
+        servicer = state_service_pb2_grpc.FreeCallStateServiceServicer()
+        servicer.GetFreeCallToken = lambda request, context: get_free_call_token(request)
+        server = grpc.server(futures.ThreadPoolExecutor(max_workers=2))
+        state_service_pb2_grpc.add_FreeCallStateServiceServicer_to_server(servicer, server)
+        port = server.add_insecure_port("localhost:0")
+        server.start()
+        self.addCleanup(server.stop, None)
+
+        self.mock_options["endpoint"] = f"http://localhost:{port}"
+        self.mock_options["warmup"] = True
+        self.mock_account.signer_address = "0x7DF35C98f41F3Af0df1dc4c7F7D4C19a71Dd059F"
+        self.mock_sdk_web3.eth.block_number = 100
+        self.mock_service_metadata.get_all_endpoints_for_group.return_value = [
+            self.mock_options["endpoint"]
+        ]
+        payment_strategy = FreeCallPaymentStrategy(token_cache_dir=None)
+        client = ServiceClient(
+            self.mock_org_id,
+            self.mock_service_id,
+            self.mock_service_metadata,
+            self.mock_group,
+            [],
+            payment_strategy,
+            self.mock_options,
+            self.mock_mpe_contract,
+            self.mock_account,
+            self.mock_sdk_web3,
+            state_service_pb2,
+            self.mock_payment_channel_provider,
+            self.mock_path_to_pb_files
+        )
+        self.addCleanup(client.close)
+
+        get_free_call_token.assert_called_once()
+        self.assertEqual(payment_strategy._free_call_token, b"token")
+        self.assertEqual(payment_strategy._token_expiration_block, 1000)
+
+        # The token is reused until it expires
+        payment_strategy.update_free_call_token(client)
+        get_free_call_token.assert_called_once()
+
+    def test_health_checks_are_disabled_with_a_zero_interval(self):
+        self.mock_options["connections_per_endpoint"] = 2
+        self.mock_options["health_check_interval"] = 0
+
+        with patch("snet.sdk.service_client.ChannelPool.start_health_checks") as start_health_checks:
+            client = ServiceClient(
+                self.mock_org_id,
+                self.mock_service_id,
+                self.mock_service_metadata,
+                self.mock_group,
+                self.mock_service_stub,
+                self.mock_payment_strategy,
+                self.mock_options,
+                self.mock_mpe_contract,
+                self.mock_account,
+                self.mock_sdk_web3,
+                self.mock_pb2_module,
+                self.mock_payment_channel_provider,
+                self.mock_path_to_pb_files
+            )
+        self.addCleanup(client.close)
+
+        self.assertEqual(len(client.channel_pool.endpoints), 2)
+        start_health_checks.assert_not_called()
+
+    def test_channel_sync_workers_must_be_positive(self):
+        self.mock_options["channel_sync_workers"] = 0
+
+        with self.assertRaises(ValueError):
+            ServiceClient(
+                self.mock_org_id,
+                self.mock_service_id,
+                self.mock_service_metadata,
+                self.mock_group,
+                self.mock_service_stub,
+                self.mock_payment_strategy,
+                self.mock_options,
+                self.mock_mpe_contract,
+                self.mock_account,
+                self.mock_sdk_web3,
+                self.mock_pb2_module,
+                self.mock_payment_channel_provider,
+                self.mock_path_to_pb_files
+            )
+
+    def test_group_endpoints_override(self):
+        self.mock_service_metadata.get_all_endpoints_for_group.return_value = [
+            "https://node1.naint.tech:62400"
+        ]
+        del self.mock_options["endpoint"]
+        self.assertEqual(self.client._get_endpoints(),
+                         ["https://node1.naint.tech:62400"])
+
+        self.mock_options["group_endpoints"] = {
+            "default_group": "unix:///run/snetd/snetd.sock",
+            "other_group": ["http://localhost:7000"]
+        }
+        self.assertEqual(self.client._get_endpoints(),
+                         ["unix:///run/snetd/snetd.sock"])
+
+    def test_call_over_unix_domain_socket(self):
+        with add_to_path(str(RESOURCES_PATH.joinpath("proto"))):
+            state_service_pb2 = importlib.import_module("state_service_pb2")
+            state_service_pb2_grpc = importlib.import_module("state_service_pb2_grpc")
+        servicer = state_service_pb2_grpc.FreeCallStateServiceServicer()
+        servicer.GetFreeCallsAvailable = lambda request, context: \
+            state_service_pb2.FreeCallStateReply(free_calls_available=3)
+        socket_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(socket_dir.cleanup)
+        endpoint = f"unix://{socket_dir.name}/snetd.sock"
+        server = grpc.server(futures.ThreadPoolExecutor(max_workers=2))
+        state_service_pb2_grpc.add_FreeCallStateServiceServicer_to_server(servicer, server)
+        server.add_insecure_port(endpoint)
+        server.start()
+        self.addCleanup(server.stop, None)
+
+        self.mock_options["endpoint"] = endpoint
+        self.mock_options["disable_blockchain_operations"] = True
+        client = ServiceClient(
+            self.mock_org_id,
+            self.mock_service_id,
+            self.mock_service_metadata,
+            self.mock_group,
+            [state_service_pb2_grpc.FreeCallStateServiceStub],
+            self.mock_payment_strategy,
+            self.mock_options,
+            self.mock_mpe_contract,
+            self.mock_account,
+            self.mock_sdk_web3,
+            state_service_pb2,
+            self.mock_payment_channel_provider,
+            self.mock_path_to_pb_files
+        )
+        self.addCleanup(client.close)
+
+        response = client.call_rpc("GetFreeCallsAvailable", address="0x1")
+        self.assertEqual(response.free_calls_available, 3)
+
     @patch("snet.sdk.service_client.grpc.insecure_channel")
     def test_get_grpc_channel_http(self, mock_insecure_channel):
         channel = self.client._get_grpc_channel()
-        mock_insecure_channel.assert_called_once_with("localhost:5000")
+        mock_insecure_channel.assert_called_once_with("localhost:5000",
+                                                      options=[],
+                                                      compression=None)
         self.assertEqual(channel, mock_insecure_channel.return_value)
 
+    @patch("snet.sdk.service_client.grpc.insecure_channel")
+    def test_get_grpc_channel_with_options(self, mock_insecure_channel):
+        self.mock_options.update({
+            "max_receive_message_length": 64 * 1024 * 1024,
+            "keepalive_time_ms": 30000,
+            "keepalive_permit_without_calls": True,
+            "compression": "gzip",
+            "connections_per_endpoint": 2,
+            "grpc_options": [("grpc.primary_user_agent", "test")]
+        })
+        self.client._get_grpc_channel()
+        mock_insecure_channel.assert_called_once_with(
+            "localhost:5000",
+            options=[("grpc.max_receive_message_length", 64 * 1024 * 1024),
+                     ("grpc.keepalive_time_ms", 30000),
+                     ("grpc.keepalive_permit_without_calls", 1),
+                     ("grpc.use_local_subchannel_pool", 1),
+                     ("grpc.primary_user_agent", "test")],
+            compression=grpc.Compression.Gzip
+        )
+
+        self.mock_options["compression"] = "brotli"
+        with self.assertRaises(ValueError):
+            self.client._get_grpc_channel()
+
     @patch("snet.sdk.service_client.grpc.ssl_channel_credentials")
     @patch("snet.sdk.service_client.grpc.secure_channel")
     def test_get_grpc_channel_https(self,
@@ -117,7 +426,9 @@ class TestServiceClient(unittest.TestCase):
         mock_ssl_channel_credentials.assert_called_once()
         mock_secure_channel.assert_called_once_with(
             "localhost:5000",
-            mock_ssl_channel_credentials.return_value
+            mock_ssl_channel_credentials.return_value,
+            options=[],
+            compression=None
         )
         self.assertEqual(channel, mock_secure_channel.return_value)
 
@@ -131,6 +442,57 @@ class TestServiceClient(unittest.TestCase):
         )
         self.assertEqual(result, [mock_new_channel_1, mock_new_channel_2])
 
+    def test_update_channel_states_skips_unusable_channels(self):
+        usable_channel = MagicMock(channel_id=1)
+        expired_channel = MagicMock(channel_id=2)
+        empty_channel = MagicMock(channel_id=3)
+        self.client.payment_channels = [expired_channel, usable_channel, empty_channel]
+        # nonce, sender, signer, recipient, group_id, value, expiration
+        channels_blockchain_data = [
+            [0, None, None, None, None, 100, 99],
+            [0, None, None, None, None, 100, 200],
+            [0, None, None, None, None, 0, 200],
+        ]
+        self.mock_mpe_contract.get_channels.return_value = channels_blockchain_data
+        self.client.sdk_web3.eth.block_number = 100
+
+        result = self.client.update_channel_states()
+
+        self.assertEqual(result, [usable_channel])
+        self.mock_mpe_contract.get_channels.assert_called_once_with([2, 1, 3])
+        usable_channel.sync_state.assert_called_once_with(channels_blockchain_data[1], 100)
+        expired_channel.sync_state.assert_not_called()
+        expired_channel.invalidate_state.assert_called_once()
+        empty_channel.sync_state.assert_not_called()
+
+        result = self.client.update_channel_states(include_unusable=True)
+        self.assertEqual(result, [expired_channel, usable_channel, empty_channel])
+        empty_channel.sync_state.assert_called_once_with(channels_blockchain_data[2], 100)
+
+    def test_update_channel_states_syncs_all_if_none_is_usable(self):
+        expired_channel = MagicMock(channel_id=1)
+        self.client.payment_channels = [expired_channel]
+        self.mock_mpe_contract.get_channels.return_value = [[0, None, None, None, None, 100, 99]]
+        self.client.sdk_web3.eth.block_number = 100
+
+        # The expired channel can still be extended
+        self.assertEqual(self.client.update_channel_states(), [expired_channel])
+        expired_channel.sync_state.assert_called_once()
+
+    def test_pool_adopts_usable_channels_only(self):
+        usable_channel = MagicMock(channel_id=1)
+        expired_channel = MagicMock(channel_id=2)
+        self.mock_payment_channel_provider.get_past_open_channels.return_value = [
+            expired_channel, usable_channel
+        ]
+        self.mock_mpe_contract.get_channels.return_value = [
+            [0, None, None, None, None, 100, 99],
+            [0, None, None, None, None, 100, 200],
+        ]
+        self.client.sdk_web3.eth.block_number = 100
+
+        self.assertEqual(self.client._load_usable_channels(), [usable_channel])
+
     def test_get_current_block_number(self):
         expected_result = Mock(return_value=12345)
         self.client.sdk_web3.eth.block_number = expected_result
@@ -139,12 +501,9 @@ class TestServiceClient(unittest.TestCase):
 
     def test_generate_signature(self):
         message = b"test_message"
-        mock_signature = MagicMock()
-        self.client.sdk_web3.eth.account._sign_hash = MagicMock(
-            return_value=MagicMock(signature=mock_signature)
-        )
         result = self.client.generate_signature(message)
-        self.assertEqual(result, bytes(mock_signature))
+        self.assertEqual(result, b"signature")
+        self.client.account.signer.sign_message.assert_called_once_with(message)
 
     @patch("snet.sdk.service_client.web3.Web3.solidity_keccak")
     def test_generate_training_signature(self, mock_solidity_keccak):
@@ -152,13 +511,9 @@ class TestServiceClient(unittest.TestCase):
         address = "test_address"
         block_number = "test_block_number"
         mock_solidity_keccak.return_value = b"test_message"
-        mock_signature = MagicMock()
-        self.client.sdk_web3.eth.account._sign_hash = MagicMock(
-            return_value=MagicMock(signature=mock_signature)
-        )
         result = self.client.generate_training_signature(text, address,
                                                          block_number)
-        self.assertEqual(result, mock_signature)
+        self.assertEqual(result, HexBytes(b"signature"))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,39 @@
+import unittest
+
+from eth_account.messages import defunct_hash_message
+from web3 import Web3
+
+from snet.sdk import signer
+from snet.sdk.signer import CoincurveSigner, EthKeysSigner, create_signer
+
+PRIVATE_KEY = bytes.fromhex("4c0883a69102937d6231471b5dbb6204fe5129617082792ae468d01a3f362318")
+
+
+class TestSigner(unittest.TestCase):
+    def setUp(self):
+        self.message = Web3.solidity_keccak(["string", "uint256"], ["__MPE_claim_message", 42])
+        self.expected_signature = bytes(Web3().eth.account._sign_hash(
+            defunct_hash_message(self.message), PRIVATE_KEY
+        ).signature)
+
+    def test_eth_keys_signature_matches_eth_account(self):
+        self.assertEqual(EthKeysSigner(PRIVATE_KEY).sign_message(self.message),
+                         self.expected_signature)
+
+    @unittest.skipIf(signer.coincurve is None, "coincurve is not installed")
+    def test_coincurve_signature_matches_eth_account(self):
+        self.assertEqual(CoincurveSigner(PRIVATE_KEY).sign_message(self.message),
+                         self.expected_signature)
+
+    def test_default_backend(self):
+        expected_backend = "eth_keys" if signer.coincurve is None else "coincurve"
+        self.assertEqual(create_signer(PRIVATE_KEY).backend, expected_backend)
+        self.assertEqual(create_signer(PRIVATE_KEY, "eth_keys").backend, "eth_keys")
+
+    def test_unsupported_backend(self):
+        with self.assertRaises(ValueError):
+            create_signer(PRIVATE_KEY, "openssl")
+
+
+if __name__ == "__main__":
+    unittest.main()